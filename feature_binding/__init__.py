@@ -0,0 +1,33 @@
+"""
+Feature binding is slow: temporal integration explains apparent ultrafast binding - experiment runtime.
+
+The experiments in paradigm/ are YAML configurations run by this package:
+
+- config:       loads, checks and compiles experiment configurations (no PsychoPy needed)
+- design:       trial design and counter-balancing (no PsychoPy needed)
+- staircase:    the staircase used by the adaptive experiments (no PsychoPy needed)
+- priors:       staircase start values and step sizes from earlier data (no PsychoPy needed)
+- allocation:   adaptive method of constant stimuli (no PsychoPy needed)
+- model:        temporal-integration observer model fitted to the data tables (no PsychoPy needed)
+- aggregate:    per-participant refresh rates, ms conversion and frame jitter of the raw data (no PsychoPy needed)
+- stats:        repeated-measures ANOVA, post hoc and resampling tests of the data tables (no PsychoPy needed)
+- power:        Monte-Carlo power analysis of the staircase experiments (no PsychoPy needed)
+- keys:         background keyboard collection
+- realtime:     garbage collection, priority and CPU pinning around the critical frames
+- idle:         idle-time scheduler for the bookkeeping between critical frames
+- stimuli:      stimulus bank with every visual component of the paradigm
+- procedural:   half-disc gratings computed in a fragment shader, and their check against the texture gratings
+- recorder:     columnar trial store saved in the ExperimentHandler's CSV layout (no PsychoPy needed)
+- sink:         data output
+- datafiles:    data folder, file names and trial recorder of a session (no PsychoPy needed)
+- telemetry:    flip times of every frame by trial and phase, in memory-mapped chunks (no PsychoPy needed)
+- engine:       trial engine running instructions, practice and experiment
+- virtual:      virtual display on a simulated vsync for checking the frame logic without a monitor (the module
+                needs no PsychoPy, the trial engine run on it does)
+- dryrun:       complete sessions on the virtual display with a simulated participant
+- channel:      shared-memory message channel between two processes (no PsychoPy needed)
+- split:        two-process mode with a separate render process
+- session:      GUI, data files, window and the run_experiment entry point
+
+Importing a module does not open a window; only session.run_experiment does.
+"""
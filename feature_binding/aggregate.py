@@ -0,0 +1,226 @@
+"""
+Aggregation of the raw data files with each participant's own refresh rate (no PsychoPy needed).
+
+Every raw file records the refresh rate measured at the start of the session (frame_rate_detected, e.g. 164.98),
+which is what durations in frames should be converted with rather than the nominal 120 or 165 Hz. All trials of an
+experiment are read into one array per column with the participant index of every trial, so conversions and
+per-participant summaries are single indexing and bincount operations over the whole data set.
+
+Where the files time a stretch of a known number of frames (mask_duration of experiment 3, 41 frames), its spread
+gives the frame-period jitter of the session; it is propagated to the threshold durations as the spread of the sum
+of that many frame periods. The tables keep the participants and conditions the analysis scripts keep (experiment 2
+without participant 7, file exp2_07, and the 6-cycle conditions); experiment 1 has no staircases and is not
+aggregated:
+
+    python -m feature_binding.aggregate exp3 -o data/exp3_ms.csv
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import csv
+import glob
+import os
+
+import numpy as np
+
+# Raw data folder of each experiment with staircases, the column timing a stretch of known length (column, frames)
+# and the exclusions of analysis/exp*_prep_and_plots.R: participants (participant column of the files) and cycles
+raw_data = {
+    'exp2': {'folder': 'experiment 2', 'timed': None, 'excluded_participants': [7], 'excluded_cycles': [6]},
+    'exp3': {'folder': 'experiment 3', 'timed': ('mask_duration', 41), 'excluded_participants': [],
+             'excluded_cycles': []},
+}
+table_levels = {'low': 'Low', 'med': 'Medium', 'high': 'High'}
+
+
+# ==============================================================================
+# TRIALS
+# ==============================================================================
+def to_float(values):
+    """Floats of an array of strings; empty, 'NA' and other text give nan. Only distinct strings are parsed."""
+    distinct, inverse = np.unique(values, return_inverse=True)
+    parsed = np.full(len(distinct), np.nan)
+    for i, value in enumerate(distinct):
+        try:
+            parsed[i] = float(value)
+        except ValueError:
+            pass
+    return parsed[inverse.reshape(-1)]
+
+
+def read_trials(paths):
+    """
+    Every row of the raw data files as one array per column.
+
+    :return: Dictionary column -> array of strings over all rows of all files, with 'participant_index' (position of
+             the file in paths) and 'row_index' added; columns a file lacks are empty strings.
+    """
+    files = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8-sig') as data_file:
+            files.append(list(csv.DictReader(data_file)))
+    columns = list(dict.fromkeys(column for rows in files for row in rows[:1] for column in row))
+    trials = {column: np.array([row.get(column) or '' for rows in files for row in rows]) for column in columns}
+    trials['participant_index'] = np.concatenate([np.full(len(rows), i) for i, rows in enumerate(files)])
+    trials['row_index'] = np.arange(len(trials['participant_index']))
+    return trials
+
+
+def per_participant(values, participant_index, n_participants):
+    """Mean and standard deviation of the valid values of every participant."""
+    valid = ~np.isnan(values)
+    index = participant_index[valid]
+    n = np.bincount(index, minlength=n_participants)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(index, values[valid], n_participants) / n
+        squares = np.bincount(index, (values[valid] - mean[index]) ** 2, n_participants)
+        sd = np.sqrt(squares / (n - 1))
+    return mean, sd
+
+
+def last_value(values, participant_index, n_participants):
+    """Last valid value of every participant (nan when there is none), e.g. the thresholds written at the end."""
+    valid = np.flatnonzero(~np.isnan(values))
+    last = np.full(n_participants, -1)
+    np.maximum.at(last, participant_index[valid], valid)
+    return np.where(last >= 0, values[np.maximum(last, 0)], np.nan)
+
+
+# ==============================================================================
+# FRAME TIMING
+# ==============================================================================
+def frame_periods(trials, n_participants):
+    """Frame period in ms of every participant from the detected refresh rate (the nominal rate when missing)."""
+    detected = last_value(to_float(trials['frame_rate_detected']), trials['participant_index'], n_participants)
+    nominal = last_value(to_float(trials['frame_rate']), trials['participant_index'], n_participants)
+    return 1000 / np.where(np.isnan(detected), nominal, detected)
+
+
+def frame_jitter(durations_s, frames, participant_index, n_participants):
+    """
+    Mean frame period and frame-period jitter of every participant from timed stretches of a known number of frames.
+
+    Frame periods are assumed to be independent, so the spread of a stretch is the jitter times sqrt(frames). Periods
+    that vary together (a display that drifts, or a late flip followed by an early one) break the assumption: the
+    jitter is then only the spread the stretch would have with independent periods, not that of a single period.
+
+    :param durations_s: Measured duration of each stretch in seconds (nan where not measured).
+    :return: Mean period and jitter (standard deviation of one period) in ms.
+    """
+    mean, sd = per_participant(durations_s * 1000, participant_index, n_participants)
+    return mean / frames, sd / np.sqrt(frames)
+
+
+def frames_to_ms(frames, periods, jitter=None):
+    """
+    Durations in ms of frame counts of every participant (participants x ...), with their spread from frame jitter.
+    The spread assumes independent frame periods, as frame_jitter does (sqrt(frames) times the jitter); with
+    correlated periods it grows up to frames times the jitter.
+
+    :return: Durations and their standard deviations (zero without jitter).
+    """
+    shape = (-1,) + (1,) * (np.ndim(frames) - 1)
+    ms = frames * periods.reshape(shape)
+    if jitter is None:
+        return ms, np.zeros_like(ms)
+    return ms, np.sqrt(frames) * jitter.reshape(shape)
+
+
+# ==============================================================================
+# AGGREGATION
+# ==============================================================================
+def threshold_cycles(threshold_column):
+    """Number of cycles of a threshold column, e.g. threshold_med2_mask_high -> 2."""
+    level = threshold_column.split('_')[1]
+    return int(level[len(level.rstrip('0123456789')):])
+
+
+def table_column(threshold_column):
+    """Data table column of a threshold column, e.g. threshold_med2_mask_high -> Medium_2_High."""
+    parts = threshold_column.split('_')
+    sf = parts[1].rstrip('0123456789')
+    column = f'{table_levels[sf]}_{threshold_cycles(threshold_column)}'
+    return column if len(parts) == 2 else f'{column}_{table_levels[parts[3]]}'
+
+
+def aggregate(experiment, raw_dir):
+    """
+    Per-participant frame timing and stimulus durations in ms of an experiment.
+
+    :param experiment: Key of raw_data; experiments without staircases (experiment 1) have no thresholds.
+    :return: Dictionary with 'participants' (file names), 'numbers' (participant numbers from the participant
+             column, as the analysis names them), 'frame_rate', 'period_ms' (from the detected rate),
+             'measured_period_ms' and 'jitter_ms' (from the timed stretches, nan without them), and 'columns'
+             (table column -> thresholds in frames, ms and the ms spread from jitter, per participant). Excluded
+             participants and cycles are left out.
+    """
+    settings = raw_data[experiment]
+    paths = sorted(glob.glob(os.path.join(raw_dir, settings['folder'], '*.csv')))
+    trials = read_trials(paths)
+    n = len(paths)
+    index = trials['participant_index']
+    periods = frame_periods(trials, n)
+
+    measured = jitter = np.full(n, np.nan)
+    if settings['timed'] is not None:
+        column, frames = settings['timed']
+        measured, jitter = frame_jitter(to_float(trials[column]), frames, index, n)
+
+    threshold_columns = [x for x in trials if x.startswith('threshold_')
+                         and threshold_cycles(x) not in settings['excluded_cycles']]
+    if not threshold_columns:
+        raise ValueError(f'The {experiment} data files have no threshold columns')
+    frames = np.stack([last_value(to_float(trials[x]), index, n) for x in threshold_columns], axis=1)
+    ms, spread = frames_to_ms(frames, periods, None if np.isnan(jitter).all() else jitter)
+
+    numbers = last_value(to_float(trials['participant']), index, n)
+    kept = ~np.isin(numbers, settings['excluded_participants'])
+    columns = {table_column(x): {'frames': frames[kept, i], 'ms': ms[kept, i], 'sd_ms': spread[kept, i]}
+               for i, x in enumerate(threshold_columns)}
+    return {'participants': [os.path.basename(x) for x, keep in zip(paths, kept) if keep],
+            'numbers': [int(x) for x in numbers[kept]], 'frame_rate': 1000 / periods[kept],
+            'period_ms': periods[kept], 'measured_period_ms': measured[kept], 'jitter_ms': jitter[kept],
+            'columns': columns}
+
+
+def write_table(result, path):
+    """Wide table of the durations in ms, one row per participant, as the tables in data/ (NA for missing values)."""
+    names = list(result['columns'])
+    jittered = not np.isnan(result['jitter_ms']).all()
+    with open(path, 'w', newline='') as table_file:
+        writer = csv.writer(table_file)
+        writer.writerow(['Participant', 'frame_rate_detected', 'jitter_ms'] + names +
+                        ([f'{x}_sd' for x in names] if jittered else []))
+        for i, number in enumerate(result['numbers']):
+            values = [result['columns'][x]['ms'][i] for x in names]
+            if jittered:
+                values += [result['columns'][x]['sd_ms'][i] for x in names]
+            jitter = result['jitter_ms'][i]
+            writer.writerow([f'P_{number}', round(result['frame_rate'][i], 4), 'NA' if np.isnan(jitter) else
+                             round(jitter, 4)] + ['NA' if np.isnan(x) else round(x, 3) for x in values])
+
+
+if __name__ == '__main__':
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description='Convert thresholds to ms with each participant\'s refresh rate.')
+    parser.add_argument('experiment', choices=list(raw_data))
+    parser.add_argument('--raw', default=os.path.join(repo, 'data', 'raw_data_anonimized'),
+                        help='Folder with the experiment folders of raw data files')
+    parser.add_argument('-o', '--output', default=None, help='CSV file to write the wide table to')
+    args = parser.parse_args()
+
+    aggregated = aggregate(args.experiment, args.raw)
+    for participant_number, name in enumerate(aggregated['participants']):
+        print(f'{name}: {aggregated["frame_rate"][participant_number]:.3f} Hz, '
+              f'{aggregated["period_ms"][participant_number]:.4f} ms per frame '
+              f'(timed {aggregated["measured_period_ms"][participant_number]:.4f} ms, '
+              f'jitter {aggregated["jitter_ms"][participant_number]:.4f} ms)')
+    nominal = round(np.median(aggregated['frame_rate']))
+    for column_name, column in aggregated['columns'].items():
+        difference = column['ms'] - column['frames'] * 1000 / nominal
+        print(f'{column_name:>16}: {np.nanmean(column["ms"]):8.2f} ms, {np.nanmax(np.abs(difference)):.3f} ms '
+              f'largest difference to {nominal} Hz')
+    if args.output:
+        write_table(aggregated, args.output)
@@ -0,0 +1,189 @@
+"""
+Adaptive method of constant stimuli (no PsychoPy needed).
+
+Conditions that only differ in one field (by default the cycle number) form a group, e.g. all masked cycle numbers
+of one SF. Every trial the psychometric function of each group is refit on the responses so far. The remaining
+trials of the group go to the levels that are most informative about the 75% point, and levels that are clearly at
+floor or ceiling stop getting trials. Conditions without a group (a single level, e.g. the attention checks) run all
+their planned trials.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import numpy as np
+
+# Two alternatives, so the psychometric function runs from chance to 1 - lapse_rate
+guess_rate = 0.5
+lapse_rate = 0.02
+target_performance = 0.75
+
+# Default settings of the adaptive section of a constant stimuli design
+adaptive_defaults = {'over': 'cycle_number',
+                     'min_trials': 10,  # Trials per level before it can be capped or reweighted
+                     'max_trials': None,  # Trials per group; None runs all planned trials of the group
+                     'floor': 0.6,  # Levels whose accuracy interval lies entirely below floor ...
+                     'ceiling': 0.85,  # ... or above ceiling are capped ...
+                     'max_ci_width': 0.25}  # ... once the interval is narrower than this
+
+# Grid of the psychometric fit: threshold location and slope on log2 of the level
+n_locations = 61
+slopes = np.concatenate([-np.logspace(1, -1.5, 20), np.logspace(-1.5, 1, 20)])
+
+
+def wilson_interval(hits, n, z=1.96):
+    """95% Wilson score interval of a proportion."""
+    if not n:
+        return 0.0, 1.0
+    p = hits / n
+    center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+    half_width = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / (1 + z ** 2 / n)
+    return center - half_width, center + half_width
+
+
+def psychometric(x, location, slope):
+    """Probability correct at x for a logistic function with the given location and slope."""
+    return guess_rate + (1 - guess_rate - lapse_rate) / (1 + np.exp(-slope * (x - location)))
+
+
+class PsychometricFit:
+    """Maximum likelihood logistic fit over a fixed grid of locations and slopes, refit after every response."""
+
+    def __init__(self, levels):
+        self.x = np.log2(np.asarray(levels, dtype=float))
+        span = self.x.max() - self.x.min()
+        locations = np.linspace(self.x.min() - span / 4, self.x.max() + span / 4, n_locations)
+        self.location_grid, self.slope_grid = np.meshgrid(locations, slopes, indexing='ij')
+        # Probability correct of every grid point at every level: locations x slopes x levels
+        p = psychometric(self.x, self.location_grid[..., None], self.slope_grid[..., None])
+        self.log_p = np.log(p)
+        self.log_q = np.log(1 - p)
+        self.log_likelihood = np.zeros(self.location_grid.shape)
+        self.location = locations[n_locations // 2]
+        self.slope = 0.0
+
+    def add(self, level_index, correct):
+        self.log_likelihood += self.log_p[..., level_index] if correct else self.log_q[..., level_index]
+        best = np.unravel_index(np.argmax(self.log_likelihood), self.log_likelihood.shape)
+        self.location = self.location_grid[best]
+        self.slope = self.slope_grid[best]
+
+    def information(self):
+        """Fisher information about the location of the fitted function at every level."""
+        p = psychometric(self.x, self.location, self.slope)
+        slope_p = (p - guess_rate) * (1 - guess_rate - lapse_rate - (p - guess_rate)) / (1 - guess_rate - lapse_rate)
+        return (self.slope * slope_p) ** 2 / (p * (1 - p))
+
+    def threshold(self):
+        """Level at which target_performance is reached, or None when the fit is flat."""
+        if not self.slope:
+            return None
+        scaled = (target_performance - guess_rate) / (1 - guess_rate - lapse_rate)
+        return 2 ** (self.location + np.log(scaled / (1 - scaled)) / self.slope)
+
+
+class AdaptiveAllocator:
+    """Hand out the trials of a constant stimuli design, reallocating the trials of every group as responses come in."""
+
+    def __init__(self, fields, trial_plan, settings):
+        """
+
+        :param fields: Fields of the design conditions.
+        :param trial_plan: Planned trials (see config.make_trial_plan). Every condition gets at most its planned
+                           trials, in plan order.
+        :param settings: Adaptive settings, see adaptive_defaults.
+        """
+        self.settings = dict(adaptive_defaults, **settings)
+        over = fields.index(self.settings['over'])
+
+        self.queues = {}  # Condition cell -> planned trials left
+        for trial in trial_plan:
+            self.queues.setdefault(tuple(trial['condition']), []).append(trial)
+        self.hits = dict.fromkeys(self.queues, 0)
+        self.n = dict.fromkeys(self.queues, 0)
+        self.capped = set()
+
+        # Group cells that only differ in the adaptive field
+        members = {}
+        for cell in self.queues:
+            members.setdefault(cell[:over] + cell[over + 1:], []).append(cell)
+        self.groups = {}  # Group key -> {'cells', 'fit', 'budget', 'used'}
+        self.group_of = {}
+        for key, cells in members.items():
+            if len(cells) < 3:
+                continue
+            cells = sorted(cells, key=lambda x: x[over])
+            planned = sum(len(self.queues[x]) for x in cells)
+            budget = planned if self.settings['max_trials'] is None else min(planned, self.settings['max_trials'])
+            self.groups[key] = {'cells': cells, 'fit': PsychometricFit([x[over] for x in cells]),
+                                'budget': budget, 'used': 0}
+            for cell in cells:
+                self.group_of[cell] = key
+
+    def open_cells(self, group):
+        return [x for x in group['cells'] if self.queues[x] and x not in self.capped]
+
+    def trials_left_in_group(self, group):
+        if group['used'] >= group['budget']:
+            return 0
+        return min(group['budget'] - group['used'], sum(len(self.queues[x]) for x in self.open_cells(group)))
+
+    def streams(self):
+        """Groups and ungrouped cells with trials left, with their number of trials left."""
+        streams = [(group, self.trials_left_in_group(group)) for group in self.groups.values()]
+        streams += [(cell, len(queue)) for cell, queue in self.queues.items() if cell not in self.group_of]
+        return [(x, n) for x, n in streams if n]
+
+    def pick_cell(self, group):
+        """Cell of a group for the next trial: first min_trials per cell, then weighted by information."""
+        cells = self.open_cells(group)
+        deficits = np.array([max(self.settings['min_trials'] - self.n[x], 0) for x in cells], dtype=float)
+        if deficits.sum():
+            weights = deficits
+        else:
+            information = group['fit'].information()
+            weights = np.array([information[group['cells'].index(x)] for x in cells])
+            # Keep some trials on every open level in case the fit is off
+            weights = weights / weights.max() + 0.1 if weights.max() > 0 else np.ones(len(cells))
+        return cells[np.random.choice(len(cells), p=weights / weights.sum())]
+
+    def next_trial(self):
+        """Planned trial for the next trial, or None when every condition is done."""
+        streams = self.streams()
+        if not streams:
+            return None
+        # Interleave groups and ungrouped cells in proportion to their trials left
+        weights = np.array([n for x, n in streams], dtype=float)
+        stream = streams[np.random.choice(len(streams), p=weights / weights.sum())][0]
+        if isinstance(stream, dict):
+            stream['used'] += 1
+            cell = self.pick_cell(stream)
+        else:
+            cell = stream
+        return self.queues[cell].pop()
+
+    def record(self, condition, correct):
+        """Update the counts, caps and fit with the response to a trial of condition."""
+        cell = tuple(condition)
+        self.n[cell] += 1
+        self.hits[cell] += int(correct)
+        if cell not in self.group_of:
+            return
+        group = self.groups[self.group_of[cell]]
+        group['fit'].add(group['cells'].index(cell), correct)
+
+        # Cap levels that are clearly at floor or ceiling
+        if self.n[cell] >= self.settings['min_trials']:
+            lower, upper = wilson_interval(self.hits[cell], self.n[cell])
+            if upper - lower <= self.settings['max_ci_width'] and \
+                    (lower >= self.settings['ceiling'] or upper <= self.settings['floor']):
+                self.capped.add(cell)
+
+    def max_trials(self):
+        """Most trials the design can take."""
+        return sum(x['budget'] for x in self.groups.values()) + \
+            sum(len(x) for cell, x in self.queues.items() if cell not in self.group_of)
+
+    def thresholds(self):
+        """Current 75% point of every group."""
+        return {key: group['fit'].threshold() for key, group in self.groups.items()}
@@ -0,0 +1,121 @@
+"""
+Shared-memory message channel between two processes (no PsychoPy needed).
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import json
+import struct
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Header of the shared block: the counters, then the geometry the other end attaches with; the slots follow
+counters = struct.Struct('<QQ')  # Messages written, messages read
+written_index, read_index = 0, 1
+geometry = struct.Struct('<II')  # Slots, slot size
+header_size = counters.size + geometry.size
+length = struct.Struct('<I')
+
+
+class ChannelClosed(EOFError):
+    """The process on the other end of the channel is gone."""
+
+
+def _plain(value):
+    """JSON form of the numpy values in trial specs and data rows."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} cannot be sent over a channel')
+
+
+class Channel:
+    """
+    One-way queue of JSON messages in a ring of fixed-size slots in shared memory, for one writing and one reading
+    process. As in the KeyCollector ring buffer, the writer fills a slot before it moves the write counter on and
+    only the reader moves the read counter, so no lock is needed.
+    """
+
+    def __init__(self, name=None, slots=64, slot_size=65536, poll_interval=0.0002):
+        """
+
+        :param name: Name of the shared memory of an existing channel (the other end); None creates a new one.
+        :param slots: Messages that can wait in the channel. The other end reads slots and slot_size from the
+                      shared block, so only the end that creates the channel sets them.
+        :param slot_size: Largest message in bytes.
+        :param poll_interval: Seconds to sleep between two looks at the channel while waiting.
+        """
+        self.poll_interval = poll_interval
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=header_size + slots * slot_size)
+            counters.pack_into(self.memory.buf, 0, 0, 0)
+            geometry.pack_into(self.memory.buf, counters.size, slots, slot_size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            slots, slot_size = geometry.unpack_from(self.memory.buf, counters.size)
+        self.slots = slots
+        self.slot_size = slot_size
+        # The counters are moved on through a uint64 view, so each update is a single aligned store: pack_into zeroes
+        # a field before it writes it, and the other process could read that zero as a count
+        self.counts = np.ndarray(2, dtype='<u8', buffer=self.memory.buf)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def _counts(self):
+        return int(self.counts[written_index]), int(self.counts[read_index])
+
+    def send(self, message, alive=None):
+        """Put a message in the channel, waiting while the channel is full."""
+        payload = json.dumps(message, default=_plain).encode()
+        if length.size + len(payload) > self.slot_size:
+            raise ValueError(f'Message of {len(payload)} bytes does not fit a slot of {self.slot_size} bytes')
+        written, read = self._counts()
+        while written - read >= self.slots:
+            self._wait(alive)
+            written, read = self._counts()
+        offset = header_size + (written % self.slots) * self.slot_size
+        length.pack_into(self.memory.buf, offset, len(payload))
+        self.memory.buf[offset + length.size:offset + length.size + len(payload)] = payload
+        self.counts[written_index] = written + 1  # Publish the message only once its slot is filled
+
+    def poll(self):
+        """Next message, or None when the channel is empty."""
+        written, read = self._counts()
+        if written == read:
+            return None
+        offset = header_size + (read % self.slots) * self.slot_size
+        size = length.unpack_from(self.memory.buf, offset)[0]
+        message = json.loads(bytes(self.memory.buf[offset + length.size:offset + length.size + size]))
+        self.counts[read_index] = read + 1
+        return message
+
+    def receive(self, alive=None):
+        """
+        Wait for the next message.
+
+        :param alive: Optional function telling whether the other process still runs; ChannelClosed is raised
+                      when it does not.
+        """
+        while True:
+            message = self.poll()
+            if message is not None:
+                return message
+            self._wait(alive)
+
+    def _wait(self, alive):
+        if alive is not None and not alive():
+            raise ChannelClosed('The other process has stopped')
+        time.sleep(self.poll_interval)
+
+    def close(self):
+        del self.counts  # Release the view, the shared block cannot be closed while it exists
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,414 @@
+"""
+Declarative experiment configuration.
+
+An experiment is described in a YAML file with durations in milliseconds. compile_config turns it into the
+runtime configuration the TrialEngine runs: durations become frame counts for the refresh rate of the session,
+the design is checked (staircase cells, counter-balancing, break schedule and session length) and the trial
+plan of the experiment proper is drawn up front.
+
+Check a configuration without running it:
+
+    python -m feature_binding.config "paradigm/experiment 2/exp2.yaml" --frame-rate 165
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import itertools
+import os
+import sys
+
+import numpy as np
+import yaml
+
+from feature_binding import design, instructions
+from feature_binding.allocation import AdaptiveAllocator, adaptive_defaults
+from feature_binding.priors import load_prior
+
+# Fields a condition can set; stimulus durations are given in ms and compiled to stimulus_frame_duration
+condition_fields = ['spatial_frequency', 'cycle_number', 'stimulus_ms', 'mask_present', 'mask_type']
+design_kinds = ['constant_stimuli', 'staircase']
+mask_kinds = ['noise', 'image']
+practice_criteria = [None, 'streak', 'accuracy']
+
+# A duration is reported when it is further than this fraction of a frame from a whole number of frames
+max_quantisation_error = 0.25
+
+# Defaults of the optional sections
+timing_defaults = {'fixation_ms': [1000, 2000],
+                   'fixation_column': 'fixation_duration',  # Data column of the fixation duration of a trial
+                   'idle_budget': 0.5}  # Share of a non-critical frame given to deferred bookkeeping
+breaks_defaults = {'refresh_noise': False}  # New noise for the noise masks in every break
+session_defaults = {'response_s': 1.0, 'max_minutes': 120,
+                    'processes': 1,  # 2 presents the trials in a separate render process
+                    'telemetry': True}  # Record every flip to <data file>.telemetry (see telemetry)
+realtime_defaults = {'enabled': False,
+                     'gc': True,  # No automatic garbage collection during the stimulus alternation and mask
+                     'priority': True,  # Raise the process priority with core.rush
+                     'cpu': None}  # Core the render (main) thread is pinned to; None leaves it to the OS
+
+
+class ConfigError(ValueError):
+    """The experiment configuration is invalid."""
+
+
+# ==============================================================================
+# LOADING
+# ==============================================================================
+class UniqueKeyLoader(yaml.SafeLoader):
+    """YAML loader that refuses duplicated keys instead of silently keeping the last one."""
+
+    def construct_mapping(self, node, deep=False):
+        keys = []
+        for key_node, value_node in node.value:
+            key = self.construct_object(key_node, deep=deep)
+            if key in keys:
+                raise ConfigError(f'Duplicated key {key!r} {key_node.start_mark}')
+            keys.append(key)
+        return super().construct_mapping(node, deep=deep)
+
+
+def load_config(path):
+    """Read an experiment configuration from a YAML file; files it names are relative to its folder."""
+    with open(path, encoding='utf-8') as config_file:
+        raw = yaml.load(config_file, Loader=UniqueKeyLoader)
+    raw['config_dir'] = os.path.dirname(os.path.abspath(path))
+    return raw
+
+
+# ==============================================================================
+# COMPILER
+# ==============================================================================
+def ms_to_frames(duration_ms, frame_rate, what, warnings):
+    """Convert a duration to a whole number of frames, reporting durations that do not fit the refresh rate."""
+    exact = duration_ms * frame_rate / 1000
+    frames = int(round(exact))
+    if frames < 1:
+        raise ConfigError(f'{what}: {duration_ms} ms is shorter than one frame at {frame_rate:g} Hz')
+    if abs(exact - frames) > max_quantisation_error:
+        warnings.append(f'{what}: {duration_ms} ms is {exact:.2f} frames at {frame_rate:g} Hz, '
+                        f'shown as {frames} frames ({frames * 1000 / frame_rate:.2f} ms)')
+    return frames
+
+
+def compile_conditions(fields, condition_sets, frame_rate, stimuli, mask, what, warnings):
+    """Check condition sets and convert their stimulus durations to frames."""
+    for field in fields:
+        if field not in condition_fields:
+            raise ConfigError(f'{what}: unknown field {field!r}, expected one of {condition_fields}')
+    if len(set(fields)) != len(fields):
+        raise ConfigError(f'{what}: duplicated fields {fields}')
+
+    compiled_sets = []
+    for index, condition_set in enumerate(condition_sets):
+        set_name = f'{what} condition set {index}'
+        levels = condition_set['levels']
+        if len(levels) != len(fields):
+            raise ConfigError(f'{set_name}: {len(levels)} lists of levels for {len(fields)} fields')
+        compiled_levels = []
+        for field, field_levels in zip(fields, levels):
+            if field == 'spatial_frequency':
+                for sf in field_levels:
+                    if sf not in stimuli['spatial_frequencies']:
+                        raise ConfigError(f'{set_name}: spatial frequency {sf!r} has no grating')
+            if field == 'mask_type':
+                if mask['kind'] != 'image':
+                    raise ConfigError(f'{set_name}: mask_type needs image masks')
+                for mask_type in field_levels:
+                    if mask_type not in mask['images']:
+                        raise ConfigError(f'{set_name}: mask type {mask_type!r} has no images')
+            if field == 'cycle_number':
+                if any(int(x) != x or x < 1 for x in field_levels):
+                    raise ConfigError(f'{set_name}: cycle numbers must be positive integers')
+            if field == 'stimulus_ms':
+                field_levels = [ms_to_frames(x, frame_rate, f'{set_name} stimulus', warnings) for x in field_levels]
+            compiled_levels.append(list(field_levels))
+        compiled_sets.append({'levels': compiled_levels, 'repetitions': condition_set.get('repetitions', 1)})
+
+    runtime_fields = ['stimulus_frame_duration' if x == 'stimulus_ms' else x for x in fields]
+    return runtime_fields, compiled_sets
+
+
+def check_counterbalancing(condition_sets, what, warnings):
+    """
+    Every condition should be repeated equally often, and a multiple of the color x orientation combinations and
+    visual fields so that make_trial_plan can balance them within the condition.
+    """
+    combinations = len(design.colors) * len(design.orientations)
+    counts = {}
+    for condition in design.build_conditions(condition_sets):
+        counts[tuple(condition)] = counts.get(tuple(condition), 0) + 1
+    unbalanced = [list(x) for x, count in counts.items()
+                  if count % combinations or count % len(design.visual_fields)]
+    if unbalanced:
+        warnings.append(f'{what}: {len(unbalanced)} conditions (e.g. {unbalanced[0]}) are not repeated a multiple of '
+                        f'{combinations} times; their color x orientation combinations cannot be fully balanced')
+    if len(set(counts.values())) > 1:
+        warnings.append(f'{what}: conditions are not repeated equally often ({sorted(set(counts.values()))} times)')
+
+
+def balanced_draw(options, repetitions):
+    """Every option equally often, topped up with a random subset for repetitions that do not divide evenly."""
+    draw = options * (repetitions // len(options))
+    draw += [options[x] for x in np.random.permutation(len(options))[:repetitions % len(options)]]
+    np.random.shuffle(draw)
+    return draw
+
+
+def compile_staircase(settings, fields, conditions, frame_rate, config_dir, what, warnings):
+    """
+    Check that there is exactly one staircase, with a start value and its own names, per condition cell, and
+    collect the start value and step sizes of every staircase in 'schedules': from the prior file named by
+    settings['prior'] (see priors.build_prior) where it has the staircase, from settings['start_values'] otherwise.
+    """
+    if 'spatial_frequency' not in fields or 'cycle_number' not in fields:
+        raise ConfigError(f'{what}: staircase conditions need spatial_frequency and cycle_number')
+    if 'stimulus_frame_duration' in fields:
+        raise ConfigError(f'{what}: the staircase sets the stimulus duration, remove stimulus_ms from the fields')
+
+    max_repeats = settings.get('max_repeats', 3)
+    if int(max_repeats) != max_repeats or max_repeats < 1:
+        raise ConfigError(f'{what}: max_repeats must be a positive integer, got {max_repeats!r}')
+
+    names = {}
+    columns = {}
+    for condition in conditions:
+        trial = design.as_trial(fields, condition)
+        start_values = settings['start_values'].get(trial['spatial_frequency'], {})
+        if trial['cycle_number'] not in start_values:
+            raise ConfigError(f'{what}: no start value for {condition}')
+        name = settings['name'].format(**trial)
+        column = settings['threshold_column'].format(**trial)
+        if name in names:
+            raise ConfigError(f'{what}: conditions {names[name]} and {condition} share the staircase {name!r}')
+        if column in columns:
+            raise ConfigError(f'{what}: conditions {columns[column]} and {condition} share the threshold '
+                              f'column {column!r}')
+        names[name] = condition
+        columns[column] = condition
+
+    # Start values that no condition uses are most likely a typo
+    used = {(design.as_trial(fields, x)['spatial_frequency'], design.as_trial(fields, x)['cycle_number'])
+            for x in conditions}
+    for sf, start_values in settings['start_values'].items():
+        for cycle_number in start_values:
+            if (sf, cycle_number) not in used:
+                raise ConfigError(f'{what}: start value for {sf} {cycle_number} does not belong to any condition')
+
+    schedules = {}
+    for condition in conditions:
+        trial = design.as_trial(fields, condition)
+        schedules[settings['name'].format(**trial)] = \
+            {'start_value': settings['start_values'][trial['spatial_frequency']][trial['cycle_number']]}
+    if settings.get('prior'):
+        prior_path = os.path.join(config_dir, settings['prior'])
+        if not os.path.isfile(prior_path):
+            raise ConfigError(f'{what}: prior file {prior_path} does not exist')
+        prior = load_prior(prior_path, frame_rate)
+        for name in schedules:
+            if name in prior:
+                schedules[name] = prior[name]
+            else:
+                warnings.append(f'{what}: the prior has no staircase {name!r}, it starts from its start value')
+    return dict(settings, max_repeats=max_repeats, schedules=schedules)
+
+
+def compile_adaptive(experiment, fields, what):
+    """Check the adaptive settings of a constant stimuli design; None when the design is not adaptive."""
+    if 'adaptive' not in experiment:
+        return None
+    if experiment['kind'] != 'constant_stimuli':
+        raise ConfigError(f'{what}: only constant stimuli designs can be adaptive')
+    settings = dict(adaptive_defaults, **experiment['adaptive'])
+    unknown = set(settings) - set(adaptive_defaults)
+    if unknown:
+        raise ConfigError(f'{what}: unknown adaptive settings {sorted(unknown)}')
+    if settings['over'] not in fields or settings['over'] in ['spatial_frequency', 'mask_type']:
+        raise ConfigError(f'{what}: adaptive over {settings["over"]!r} needs a numeric field of the conditions')
+    if not 0 < settings['floor'] < settings['ceiling'] < 1:
+        raise ConfigError(f'{what}: adaptive floor and ceiling must satisfy 0 < floor < ceiling < 1')
+    if settings['min_trials'] < 1 or (settings['max_trials'] is not None and settings['max_trials'] < 1):
+        raise ConfigError(f'{what}: adaptive min_trials and max_trials must be positive')
+    return settings
+
+
+def make_trial_plan(fields, condition_sets, fixation_ms, randomize_phase):
+    """
+    Draw the trials of the experiment proper in running order. Within every condition the color x orientation
+    combinations and the visual fields are balanced; the fixation duration and grating phase are drawn per trial.
+    """
+    combinations = list(itertools.product(design.colors, design.orientations))
+    plan = []
+    for condition_set in condition_sets:
+        repetitions = condition_set.get('repetitions', 1)
+        for condition in itertools.product(*condition_set['levels']):
+            stimuli = balanced_draw(combinations, repetitions)
+            visual_fields = balanced_draw(list(design.visual_fields), repetitions)
+            for (first_color, first_orientation), visual_field in zip(stimuli, visual_fields):
+                trial = design.as_trial(fields, condition)
+                trial['condition'] = list(condition)
+                trial['first_color'] = first_color
+                trial['first_orientation'] = first_orientation
+                trial['visual_field'] = visual_field
+                trial['fixation_duration'] = np.random.uniform(fixation_ms[0], fixation_ms[1]) / 1000
+                if randomize_phase:
+                    trial['phase'] = np.random.random()
+                plan.append(trial)
+    np.random.shuffle(plan)
+    return plan
+
+
+def estimate_trial_seconds(trial, config, response_s):
+    """Expected duration of a trial: blanks, fixation, stimulus alternation, mask and response."""
+    frame = 1 / config['frame_rate']
+    frames = 2 * config['blank_frames'] + 2 * trial['cycle_number'] * trial.get('stimulus_frame_duration', 0)
+    if trial['mask_present']:
+        frames += config['mask']['frames']
+    return frames * frame + trial['fixation_duration'] + response_s
+
+
+def compile_config(raw, frame_rate):
+    """
+    Compile a configuration read by load_config for a refresh rate.
+
+    :param raw: Configuration with durations in ms.
+    :param frame_rate: Refresh rate of the session in Hz.
+    :return: Runtime configuration for the TrialEngine. Its 'warnings' list holds everything that is allowed
+             but suspicious, its 'trial_plan' the trials of the experiment proper in running order.
+    :raises ConfigError: When the configuration cannot be run.
+    """
+    warnings = []
+    for key in ['exp_name', 'exp_info', 'monitor', 'stimuli', 'timing', 'mask', 'design', 'breaks']:
+        if key not in raw:
+            raise ConfigError(f'Missing section {key!r}')
+    stimuli = raw['stimuli']
+    timing = dict(timing_defaults, **raw['timing'])
+    mask = dict(raw['mask'])
+    session = dict(session_defaults, **raw.get('session', {}))
+    if mask['kind'] not in mask_kinds:
+        raise ConfigError(f'Unknown mask kind {mask["kind"]!r}, expected one of {mask_kinds}')
+    if not 0 <= timing['idle_budget'] < 1:
+        raise ConfigError(f'timing: idle_budget is a share of a frame, got {timing["idle_budget"]!r}')
+
+    config = {
+        'exp_name': raw['exp_name'],
+        'origin_path': raw.get('origin_path', raw['exp_name'] + '.py'),
+        'exp_info': dict(raw['exp_info']),
+        'monitor': dict(raw['monitor']),
+        'frame_rate': frame_rate,
+        'grating_res': stimuli['grating_res'],
+        'fit_grating_res': stimuli.get('fit_grating_res', False),
+        'spatial_frequencies': dict(stimuli['spatial_frequencies']),
+        'randomize_phase': stimuli.get('randomize_phase', False),
+        'prebake': stimuli.get('prebake', False),
+        'procedural': stimuli.get('procedural', False),
+        'blank_frames': ms_to_frames(timing['blank_ms'], frame_rate, 'blank', warnings),
+        'fixation_ms': list(timing['fixation_ms']),
+        'fixation_column': timing['fixation_column'],
+        'idle_budget_s': timing['idle_budget'] / frame_rate,
+        'mask': dict(mask, frames=ms_to_frames(timing['mask_ms'], frame_rate, 'mask', warnings)),
+        'breaks': list(raw['breaks']['after_trials']),
+        'break_duration': raw['breaks']['duration_s'],
+        'refresh_noise': dict(breaks_defaults, **raw['breaks'])['refresh_noise'],
+        'realtime': dict(realtime_defaults, **raw.get('realtime', {})),
+        'processes': session['processes'],
+        'telemetry': session['telemetry'],
+        'warnings': warnings,
+    }
+    config['mask'].pop('ms', None)
+    if config['processes'] not in (1, 2):
+        raise ConfigError(f'session: processes must be 1 or 2, got {config["processes"]!r}')
+    cpu = config['realtime']['cpu']
+    if cpu is not None and not (isinstance(cpu, int) and 0 <= cpu < (os.cpu_count() or 1)):
+        raise ConfigError(f'realtime: cpu must be a core number below {os.cpu_count()}, got {cpu!r}')
+
+    # Practice
+    practice = raw.get('practice', {'enabled': False, 'blocks': []})
+    config['practice'] = practice.get('enabled', True)
+    config['practice_blocks'] = []
+    for index, block in enumerate(practice.get('blocks', [])):
+        what = f'practice block {index + 1}'
+        if block.get('texts') not in instructions.practice_texts:
+            raise ConfigError(f'{what}: unknown texts {block.get("texts")!r}')
+        if block.get('criterion') not in practice_criteria:
+            raise ConfigError(f'{what}: unknown criterion {block.get("criterion")!r}')
+        fields, condition_sets = compile_conditions(block['fields'], block['conditions'], frame_rate, stimuli,
+                                                    mask, what, warnings)
+        if 'stimulus_frame_duration' not in fields:
+            raise ConfigError(f'{what}: practice conditions need stimulus_ms')
+        if block['max_trials'] > len(design.build_conditions(condition_sets)):
+            warnings.append(f'{what}: max_trials is larger than the number of practice trials')
+        config['practice_blocks'].append(dict(block, fields=fields, conditions=condition_sets))
+
+    # Experiment proper
+    experiment = raw['design']
+    what = 'design'
+    if experiment.get('kind') not in design_kinds:
+        raise ConfigError(f'Unknown design kind {experiment.get("kind")!r}, expected one of {design_kinds}')
+    fields, condition_sets = compile_conditions(experiment['fields'], experiment['conditions'], frame_rate,
+                                                stimuli, mask, what, warnings)
+    config['design'] = experiment['kind']
+    config['fields'] = fields
+    config['conditions'] = condition_sets
+    if experiment['kind'] == 'staircase':
+        config['staircase'] = compile_staircase(experiment['staircase'], fields,
+                                                design.unique_conditions(condition_sets), frame_rate,
+                                                raw.get('config_dir', os.getcwd()), what, warnings)
+    elif 'stimulus_frame_duration' not in fields:
+        raise ConfigError(f'{what}: constant stimuli conditions need stimulus_ms')
+    config['adaptive'] = compile_adaptive(experiment, fields, what)
+    check_counterbalancing(condition_sets, what, warnings)
+
+    config['trial_plan'] = make_trial_plan(fields, condition_sets, config['fixation_ms'], config['randomize_phase'])
+    n_trials = len(config['trial_plan'])
+    if config['adaptive'] is not None:
+        n_trials = AdaptiveAllocator(fields, config['trial_plan'], config['adaptive']).max_trials()
+    config['max_trials'] = n_trials
+
+    # Break schedule
+    if config['breaks'] != sorted(set(config['breaks'])):
+        raise ConfigError(f'Breaks must be increasing trial numbers, got {config["breaks"]}')
+    for trial_number in config['breaks']:
+        if not 0 <= trial_number < n_trials - 1:
+            raise ConfigError(f'Break after trial {trial_number} does not fall within the {n_trials} trials')
+
+    # Session length; staircase and adaptive sessions can stop early, so this is their longest session
+    seconds = sum(estimate_trial_seconds(x, config, session['response_s']) for x in config['trial_plan'])
+    seconds *= n_trials / len(config['trial_plan'])
+    seconds += len(config['breaks']) * config['break_duration']
+    config['estimated_minutes'] = seconds / 60
+    if config['estimated_minutes'] > session['max_minutes']:
+        raise ConfigError(f'The session takes about {config["estimated_minutes"]:.0f} minutes, more than '
+                          f'the {session["max_minutes"]} minutes allowed')
+    return config
+
+
+def summary(config):
+    """Text summary of a compiled configuration."""
+    lines = [f'{config["exp_name"]} at {config["frame_rate"]:g} Hz',
+             f'  design:    {config["design"]}{", adaptive" if config.get("adaptive") else ""}, '
+             f'{config["max_trials"]} trials at most',
+             f'  blank:     {config["blank_frames"]} frames, mask: {config["mask"]["frames"]} frames',
+             f'  breaks:    after trials {config["breaks"]}',
+             f'  realtime:  {"on" if config["realtime"]["enabled"] else "off"}',
+             f'  session:   about {config["estimated_minutes"]:.0f} minutes']
+    if config['design'] == 'staircase':
+        lines.append(f'  staircases: {len(design.unique_conditions(config["conditions"]))}')
+    for warning in config['warnings']:
+        lines.append(f'  warning:   {warning}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile and check an experiment configuration.')
+    parser.add_argument('config', help='YAML configuration file')
+    parser.add_argument('--frame-rate', type=float, default=None,
+                        help='Refresh rate in Hz (default: frame_rate of the session info)')
+    args = parser.parse_args()
+    try:
+        raw_config = load_config(args.config)
+        compiled = compile_config(raw_config, args.frame_rate or raw_config['exp_info']['frame_rate'])
+    except ConfigError as error:
+        sys.exit(f'{args.config}: {error}')
+    print(summary(compiled))
@@ -0,0 +1,65 @@
+"""
+Data files of a session: data folder, file names and the trial recorder (no PsychoPy needed).
+
+A real session asks for the session info in PsychoPy's GUI and opens its log file (see session.open_data); a dry
+run gives the session info itself. Both open their data files here, so a dry run needs no GUI and no window.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import datetime
+import os
+from importlib import metadata
+
+from feature_binding.recorder import TrialRecorder
+
+
+def date_string(now=None):
+    """Time stamp of the data files, as psychopy.data.getDateStr writes it (e.g. 2024-05-01_14h03.22.123)."""
+    now = now or datetime.datetime.now()
+    return now.strftime('%Y-%m-%d_%Hh%M.%S.%f')[:-3]
+
+
+def psychopy_version():
+    """Version of the installed PsychoPy, read from its package metadata without importing it."""
+    try:
+        return metadata.version('psychopy')
+    except metadata.PackageNotFoundError:
+        return ''
+
+
+def open_data(config, exp_dir, exp_info):
+    """
+    Open the data files of a session.
+
+    :param config: Experiment configuration; only its 'exp_name' is used.
+    :param exp_dir: Folder of the experiment script; data is saved in its 'data' subfolder.
+    :param exp_info: Session info with at least 'participant'; the date, experiment name and PsychoPy version are
+                     added to it.
+    :return: Dictionary with 'exp_info', 'filename' and the TrialRecorder 'recorder'.
+    """
+    # Ensure that relative paths start from the same directory as the script
+    os.chdir(exp_dir)
+
+    # Create data folder if it does not exist
+    if not os.path.isdir('data'):
+        os.mkdir('data')
+
+    # Store info about the experiment session
+    exp_name = config['exp_name']
+    exp_info['date'] = date_string()  # Add a simple timestamp
+    exp_info['expName'] = exp_name
+    exp_info['psychopyVersion'] = psychopy_version()
+
+    # Data file name stem = absolute path + name; later add .csv, .log, etc
+    filename = exp_dir + os.sep + u'data/%s_%s_%s' % (exp_info['participant'], exp_name, exp_info['date'])
+
+    # Trial data in column arrays, saved as the wide text file of PsychoPy's ExperimentHandler
+    recorder = TrialRecorder(filename, exp_info)
+    return {'exp_info': exp_info, 'filename': filename, 'recorder': recorder}
+
+
+def journal_names(bank, config):
+    """Stimulus, mask and key names of the event journal."""
+    return list(bank.stimuli) + ['noise'] + list(config['mask'].get('images', {})) + ['left', 'right', 'escape']
@@ -0,0 +1,82 @@
+"""
+Trial design helpers shared by the experiments. Nothing in here needs a window, so the design of an
+experiment can be built and inspected without PsychoPy.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import itertools
+
+import numpy as np
+
+# ==============================================================================
+# COUNTER-BALANCING
+# ==============================================================================
+# Colors, orientations and visual fields drawn on every trial
+colors = ['black', 'white']
+orientations = ['135', '45']
+visual_fields = ['up', 'down']
+
+# Answer to "Was black paired with left or right?" given the color and orientation of the first stimulus.
+# The second stimulus always has the other color and the other orientation.
+correct_responses = {('black', '45'): 'right',
+                     ('black', '135'): 'left',
+                     ('white', '45'): 'left',
+                     ('white', '135'): 'right'}
+
+# Default trial parameters for fields an experiment does not vary
+trial_defaults = {'mask_present': True, 'mask_type': None}
+
+
+def build_conditions(condition_sets):
+    """
+    Expand condition sets into the list of conditions, one list per condition.
+
+    :param condition_sets: List of dictionaries with 'levels' (one list of levels per field, crossed with each other)
+                            and 'repetitions' (how often each of the crossed conditions is repeated).
+    :return: List of conditions, each condition a list with one level per field.
+    """
+    conditions = []
+    for condition_set in condition_sets:
+        crossed = [list(x) for x in itertools.product(*condition_set['levels'])]
+        conditions = conditions + crossed * condition_set.get('repetitions', 1)
+    return conditions
+
+
+def build_trial_list(condition_sets):
+    """Expand condition sets and shuffle them; trials are taken from the end with pop()."""
+    trial_list = build_conditions(condition_sets)
+    np.random.shuffle(trial_list)
+    return trial_list
+
+
+def unique_conditions(condition_sets):
+    """Conditions of the condition sets without repetitions, in order of appearance."""
+    conditions = []
+    for condition in build_conditions([dict(x, repetitions=1) for x in condition_sets]):
+        if condition not in conditions:
+            conditions.append(condition)
+    return conditions
+
+
+def as_trial(fields, condition):
+    """Turn a condition list into a dictionary of trial parameters."""
+    trial = dict(trial_defaults)
+    trial.update(zip(fields, condition))
+    return trial
+
+
+def second_stimulus(first_color, first_orientation):
+    """Color and orientation of the stimulus that alternates with the first one."""
+    second_color = 'white' if first_color == 'black' else 'black'
+    second_orientation = '45' if first_orientation == '135' else '135'
+    return second_color, second_orientation
+
+
+def stimulus_pair(first_color, first_orientation, visual_field, spatial_frequency):
+    """Names of the first and second stimulus of a trial in the stimulus bank."""
+    second_color, second_orientation = second_stimulus(first_color, first_orientation)
+    first_name = f'{first_color}_{spatial_frequency}_{first_orientation}_{visual_field}'
+    second_name = f'{second_color}_{spatial_frequency}_{second_orientation}_{visual_field}'
+    return first_name, second_name
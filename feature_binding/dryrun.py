@@ -0,0 +1,202 @@
+"""
+Dry run: a complete session on a virtual display with a simulated participant.
+
+The whole session logic runs as in a real session (instructions, practice blocks until their criteria are met,
+breaks, the staircases or constant stimuli until they end, the goodbye screen), but on a VirtualWindow: there is
+no window and no GUI, and every wait passes on simulated time, so a session of 1800 trials takes seconds.
+Instruction screens are answered with space and the trial questions by a responder. ScriptedResponder is
+correct with a fixed probability; ModelResponder with the probability the temporal-integration observer (see
+model) predicts for the frames of the trial, so staircases converge to plausible thresholds. The data file, log
+and event journal are written as in a real session, for participant 'dryrun', so the analysis can be run on them.
+
+    python "paradigm/experiment 2/exp2.py" --dry-run
+    python -m feature_binding.dryrun "paradigm/experiment 3/exp3.yaml" --responder scripted --accuracy 0.9
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import time
+
+import numpy as np
+from psychopy import logging
+
+from feature_binding.config import compile_config, load_config, summary
+from feature_binding.datafiles import journal_names, open_data
+from feature_binding.engine import TrialEngine
+from feature_binding.idle import IdleScheduler
+from feature_binding.journal import EventJournal, journal_capacity
+from feature_binding.model import ObserverModel, lapse_rate, normal_cdf, persistences_ms, taus_ms
+from feature_binding.realtime import RealtimeMode
+from feature_binding.sink import DataSink
+from feature_binding.telemetry import FrameTelemetry
+from feature_binding.virtual import VirtualBank, VirtualKeys, VirtualWindow
+
+
+# ==============================================================================
+# SIMULATED PARTICIPANTS
+# ==============================================================================
+class ScriptedResponder:
+    """Simulated participant answering correctly with a fixed probability after a fixed response time."""
+
+    def __init__(self, accuracy=0.8, rt=0.6, seed=None):
+        self.accuracy = accuracy
+        self.rt = rt
+        self.rng = np.random.default_rng(seed)
+
+    def p_correct(self, trial):
+        return self.accuracy
+
+    def __call__(self, key_list, trial, correct_response):
+        if correct_response is None:
+            return key_list[0], self.rt
+        wrong = 'left' if correct_response == 'right' else 'right'
+        return (correct_response if self.rng.random() < self.p_correct(trial) else wrong), self.rt
+
+
+class ModelResponder(ScriptedResponder):
+    """Simulated participant answering correctly with the probability the observer model predicts for a trial."""
+
+    def __init__(self, frame_rate, mask_frames, blank_frames, tau_ms=50, persistence_ms=25, sigma=0.01, rt=0.6,
+                 seed=None):
+        """
+
+        :param frame_rate: Refresh rate of the session in Hz.
+        :param mask_frames: Frames of the mask.
+        :param blank_frames: Frames of the blank after the mask.
+        :param tau_ms: Time constant of the integrator (the nearest of model.taus_ms is used).
+        :param persistence_ms: Read-out persistence after mask onset (the nearest of model.persistences_ms).
+        :param sigma: Noise of the evidence.
+        :param rt: Response time in s.
+        :param seed: Seed of the answers.
+        """
+        super().__init__(rt=rt, seed=seed)
+        self.model = ObserverModel(frame_rate, mask_frames, blank_frames)
+        self.tau = int(np.argmin(np.abs(taus_ms - tau_ms)))
+        self.persistence = int(np.argmin(np.abs(persistences_ms - persistence_ms)))
+        self.sigma = sigma
+        self.p_cache = {}
+
+    def p_correct(self, trial):
+        schedule = (int(trial['cycle_number']), max(int(round(trial['stimulus_frame_duration'])), 1),
+                    bool(trial['mask_present']))
+        if schedule not in self.p_cache:
+            evidence = self.model.evidence([schedule])[self.tau, self.persistence, 0]
+            self.p_cache[schedule] = lapse_rate / 2 + (1 - lapse_rate) * normal_cdf(evidence / self.sigma)
+        return self.p_cache[schedule]
+
+
+class DryRunEngine(TrialEngine):
+    """TrialEngine telling the simulated participant what each trial showed."""
+
+    def run_trial(self, trial, record=True, feedback=False, randomize_phase=False, blank=True):
+        self.key_collector.expect(trial=trial)
+        return super().run_trial(trial, record=record, feedback=feedback, randomize_phase=randomize_phase,
+                                 blank=blank)
+
+    def display_question(self, correct_response, record=True, feedback=False):
+        self.key_collector.expect(correct_response=correct_response)
+        return super().display_question(correct_response, record=record, feedback=feedback)
+
+
+# ==============================================================================
+# SESSION
+# ==============================================================================
+def dry_run_info(raw_config, participant='dryrun', frame_rate=None):
+    """Session info of a dry run: the first choice of every GUI field."""
+    exp_info = {name: value[0] if isinstance(value, list) else value
+                for name, value in raw_config['exp_info'].items()}
+    exp_info['participant'] = participant
+    if frame_rate is not None:
+        exp_info['frame_rate'] = frame_rate
+    return exp_info
+
+
+def run_dry_run(raw_config, exp_dir, responder=None, frame_rate=None, drop_rate=0.0, seed=None,
+                participant='dryrun'):
+    """
+    Run a complete session on a virtual display with a simulated participant and write its data files.
+
+    :param raw_config: Configuration read by config.load_config.
+    :param exp_dir: Folder of the experiment script; data is saved in its 'data' subfolder.
+    :param responder: Function answering the trial questions (see VirtualKeys); a ModelResponder by default.
+    :param frame_rate: Refresh rate of the virtual display; the frame_rate of the session info by default.
+    :param drop_rate: Chance that a flip misses its vsync.
+    :param seed: Seed of the dropped frames and of the default responder.
+    :param participant: Participant name in the data files.
+    :return: Dictionary with the data 'filename', the number of 'frames', the 'simulated_s' and the 'elapsed_s'.
+    """
+    session = open_data(raw_config, exp_dir, dry_run_info(raw_config, participant, frame_rate))
+    logging.LogFile(session['filename'] + '.log', level=logging.DATA)
+    win = VirtualWindow(float(session['exp_info']['frame_rate']), drop_rate=drop_rate, seed=seed)
+    # A virtual display always measures its refresh rate
+    session['exp_info']['frame_rate_detected'] = win.getActualFrameRate()
+    config = compile_config(raw_config, session['exp_info']['frame_rate_detected'])
+    session['exp_info']['frame_rate_compiled'] = config['frame_rate']
+    logging.data('Dry run on a virtual display with a simulated participant')
+    logging.data(summary(config))
+    for warning in config['warnings']:
+        logging.warning(warning)
+
+    if responder is None:
+        responder = ModelResponder(config['frame_rate'], config['mask']['frames'], config['blank_frames'],
+                                   seed=seed)
+    idle = IdleScheduler(config['idle_budget_s'])
+    session['recorder'].reserve(config['max_trials'] + 1)
+    sink = DataSink(session['recorder'], idle=idle)
+    bank = VirtualBank(win, config['spatial_frequencies'], config['mask'])
+    journal = EventJournal(session['filename'] + '.journal', capacity=journal_capacity(config),
+                           clock=win.frame_clock.getTime)
+    journal.register(journal_names(bank, config))
+    telemetry = FrameTelemetry(session['filename'] + '.telemetry', config['frame_rate'],
+                               clock=win.frame_clock.getTime) if config['telemetry'] else None
+    realtime = RealtimeMode(dict(config['realtime'], enabled=False))  # Nothing is timed for real
+    realtime.start()
+    engine = DryRunEngine(win, bank, VirtualKeys(win, responder), sink, config, idle, realtime, journal,
+                          telemetry)
+
+    start = time.perf_counter()
+    engine.run()
+    elapsed = time.perf_counter() - start
+
+    sink.close()
+    realtime.stop()
+    journal.close()
+    if telemetry is not None:
+        telemetry.close()
+    logging.data(idle.summary())
+    logging.data(f'Dry run: {len(win.frames)} frames, {win.time / 60:.1f} simulated minutes in {elapsed:.1f} s, '
+                 f'{len(win.dropped())} dropped')
+    return {'filename': session['filename'], 'frames': len(win.frames), 'simulated_s': win.time,
+            'elapsed_s': elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a complete session on a virtual display with a simulated '
+                                                 'participant.')
+    parser.add_argument('config', help='YAML configuration file')
+    parser.add_argument('--responder', choices=['model', 'scripted'], default='model',
+                        help='Observer model or fixed accuracy (default: model)')
+    parser.add_argument('--accuracy', type=float, default=0.8, help='Accuracy of the scripted responder')
+    parser.add_argument('--tau', type=float, default=50, help='Time constant of the model responder in ms')
+    parser.add_argument('--persistence', type=float, default=25, help='Persistence of the model responder in ms')
+    parser.add_argument('--sigma', type=float, default=0.01, help='Noise of the model responder')
+    parser.add_argument('--frame-rate', type=float, default=None,
+                        help='Refresh rate in Hz (default: frame_rate of the session info)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Chance that a flip misses its vsync')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the answers and dropped frames')
+    parser.add_argument('--participant', default='dryrun', help='Participant name in the data files')
+    args = parser.parse_args()
+
+    raw = load_config(args.config)
+    if args.responder == 'scripted':
+        simulated = ScriptedResponder(args.accuracy, seed=args.seed)
+    else:
+        compiled = compile_config(raw, args.frame_rate or raw['exp_info']['frame_rate'])
+        simulated = ModelResponder(compiled['frame_rate'], compiled['mask']['frames'], compiled['blank_frames'],
+                                   args.tau, args.persistence, args.sigma, seed=args.seed)
+    result = run_dry_run(raw, raw['config_dir'], simulated, args.frame_rate, args.drop_rate, args.seed,
+                         args.participant)
+    print(f'{result["frames"]} frames, {result["simulated_s"] / 60:.1f} simulated minutes in '
+          f'{result["elapsed_s"]:.1f} s; data in {result["filename"]}.csv')
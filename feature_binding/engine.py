@@ -0,0 +1,594 @@
+"""
+Trial engine: runs instructions, practice blocks and the experiment proper from an experiment configuration.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import random
+import time
+
+import numpy as np
+from psychopy import core, event
+
+from feature_binding import design, instructions
+from feature_binding.allocation import AdaptiveAllocator
+from feature_binding.journal import codes
+from feature_binding.staircase import staircaseHandle, StaircaseRegistry, ConditionScheduler, log_staircase_info
+from feature_binding.telemetry import phase_codes
+
+# The break screen is flipped once; while it stays up the engine sleeps and checks for escape this often (seconds)
+break_poll_s = 0.1
+
+
+class TrialLoops:
+    """
+    Practice blocks and trial loops of a session: which trial runs next, the staircase and allocator updates and
+    the breaks. The screens themselves (run_trial, pre_trial_blank, show_blank, run_break, number_trial,
+    display_instr and run_instructions) are shown by the subclass, in this process (TrialEngine) or in a render
+    process (split.ControlEngine).
+    """
+
+    def __init__(self, sink, config, idle):
+        """
+
+        :param sink: DataSink of the session.
+        :param config: Experiment configuration compiled by config.compile_config.
+        :param idle: IdleScheduler for the bookkeeping between the critical frames.
+        """
+        self.sink = sink
+        self.config = config
+        self.idle = idle
+
+    # ==============================================================================
+    # PRACTICE
+    # ==============================================================================
+    def run_practice_block(self, block):
+        """
+        Run a practice block with feedback until its criterion is reached.
+
+        :param block: Practice block configuration with 'texts' (key of instructions.practice_texts), 'fields',
+                      'conditions' and 'criterion': 'streak' (block['streak'] correct trials in a row),
+                      'accuracy' (more than block['min_trials'] trials with at least block['accuracy'] correct)
+                      or None (run block['max_trials'] trials). A block that fails its criterion within
+                      block['max_trials'] trials starts over.
+        """
+        texts = instructions.practice_texts[block['texts']]
+        criterion = block.get('criterion')
+        randomize_phase = block.get('randomize_phase', self.config['randomize_phase'])
+        self.display_instr(texts['intro'])
+
+        while True:
+            practice_trial_list = design.build_trial_list(block['conditions'])
+            hit_counter = 0
+            streak = 0
+            passed = criterion is None
+            for practice_trial_count in range(min(block['max_trials'], len(practice_trial_list))):
+                trial = design.as_trial(block['fields'], practice_trial_list.pop())
+                accuracy = self.run_trial(trial, record=False, feedback=True, randomize_phase=randomize_phase)
+                hit_counter += accuracy
+                streak = streak + 1 if accuracy else 0
+                n_trials = practice_trial_count + 1
+
+                if criterion == 'streak' and streak >= block['streak']:
+                    passed = True
+                elif criterion == 'accuracy' and n_trials > block['min_trials'] and \
+                        hit_counter / n_trials >= block['accuracy']:
+                    passed = True
+                if passed and criterion is not None:
+                    break
+
+            if passed:
+                break
+            self.display_instr(texts['fail'])
+
+        self.display_instr(texts['outro'].format(breaks=len(self.config['breaks'])))
+
+    # ==============================================================================
+    # EXPERIMENT
+    # ==============================================================================
+    def run_constant_stimuli(self):
+        """
+        Run every condition the configured number of times (method of constant stimuli). Adaptive designs let an
+        AdaptiveAllocator decide which planned trials to run.
+        """
+        if self.config['adaptive'] is not None:
+            allocator = AdaptiveAllocator(self.config['fields'], self.config['trial_plan'], self.config['adaptive'])
+            next_trial = allocator.next_trial
+        else:
+            allocator = None
+            next_trial = iter(self.config['trial_plan'] + [None]).__next__
+
+        trial_count = -1
+        while True:
+            # The allocator is updated during the blank, so the next trial is chosen after it
+            self.pre_trial_blank()
+            trial = next_trial()
+            # When all trials are done break loop
+            if trial is None:
+                break
+            if trial_count in self.config['breaks']:
+                self.run_break()
+                self.show_blank()
+
+            trial_count += 1
+            self.number_trial(trial_count)
+            self.sink.add('trial_number', trial_count)
+            self.sink.add('trial_type', trial['condition'])
+            accuracy = self.run_trial(trial, randomize_phase=self.config['randomize_phase'], blank=False)
+            if allocator is not None:
+                self.idle.defer(allocator.record, trial['condition'], accuracy)
+
+            # Proceed to next line of the output file
+            self.sink.next_entry()
+
+    def make_staircases(self):
+        """StaircaseRegistry with one staircase per condition of the experiment, started as the config schedules."""
+        settings = self.config['staircase']
+        fields = self.config['fields']
+        conditions = design.unique_conditions(self.config['conditions'])
+        stairs = StaircaseRegistry()
+        for condition in conditions:
+            trial = design.as_trial(fields, condition)
+            name = settings['name'].format(**trial)
+            stairs.add(condition, staircaseHandle(name=name, **settings['schedules'][name]))
+        stairs.require(conditions)
+        return stairs
+
+    def log_thresholds(self, stairs, row):
+        fields = self.config['fields']
+        for condition, stair in stairs.items():
+            trial = design.as_trial(fields, condition)
+            row.add(self.config['staircase']['threshold_column'].format(**trial), stair.get_threshold())
+
+    def update_staircase(self, stairs, scheduler, condition, accuracy, row):
+        """Log and update the staircase of condition after a trial (idle work); row is the sink row of the trial."""
+        current_staircase = stairs[condition]
+        # Reversals are saved after the update because the staircase lags a trial
+        log_staircase_info(row, current_staircase)
+        stairs.update(condition, is_correct=accuracy, stim=True)
+        row.add('staircase_reversal', current_staircase.isRev)
+        row.add('staircase_reversal_num', current_staircase.revn)
+        if not scheduler.trials_left(condition):
+            stairs.end(condition)
+        row.add_many(stairs.summary())
+
+        # If all staircases are over log their thresholds on this trial
+        if stairs.all_over:
+            self.log_thresholds(stairs, row)
+
+    def run_staircases(self):
+        """
+        Interleave one staircase per condition until all staircases are over. The ConditionScheduler only draws
+        conditions whose staircase is still running; a staircase ends early when its planned trials run out.
+        """
+        stairs = self.make_staircases()
+        scheduler = ConditionScheduler(stairs, self.config['trial_plan'],
+                                       max_repeats=self.config['staircase']['max_repeats'])
+
+        trial_count = -1
+        while True:
+            # The staircases are updated during the blank, so the next condition is drawn after it
+            self.pre_trial_blank()
+            if stairs.all_over:
+                break
+            if trial_count in self.config['breaks']:
+                # The first condition after the break is drawn behind the break screen
+                planned_trial = self.run_break(scheduler.next_trial)
+                self.show_blank()
+            else:
+                planned_trial = scheduler.next_trial()
+            trial_count += 1
+            self.number_trial(trial_count)
+            self.sink.add('trial_number', trial_count)
+            self.sink.add('trial_type', planned_trial['condition'])
+
+            # Get number of frames with staircase; staircase object.dv will be stimulus_frame_duration input
+            current_staircase = stairs[planned_trial['condition']]
+            trial = dict(planned_trial, stimulus_frame_duration=current_staircase.dv)
+            accuracy = self.run_trial(trial, randomize_phase=self.config['randomize_phase'], blank=False)
+
+            # Proceed to next line of the output file; the staircase bookkeeping still goes into this trial's row
+            self.idle.defer(self.update_staircase, stairs, scheduler, planned_trial['condition'], accuracy,
+                            self.sink.row)
+            self.sink.next_entry()
+
+    def run(self):
+        """Run the whole session: instructions, practice blocks, experiment and goodbye screen."""
+        if self.config['practice']:
+            self.run_instructions()
+            for block in self.config['practice_blocks']:
+                self.run_practice_block(block)
+
+        if self.config['design'] == 'staircase':
+            self.run_staircases()
+        else:
+            self.run_constant_stimuli()
+
+        self.display_instr(instructions.end_text)
+
+
+class TrialEngine(TrialLoops):
+    """Present trials with the components of a StimulusBank and write their data to a DataSink."""
+
+    def __init__(self, win, bank, key_collector, sink, config, idle, realtime, journal, telemetry=None):
+        """
+
+        :param win: PsychoPy window.
+        :param bank: StimulusBank created for win.
+        :param key_collector: Started KeyCollector listening to 'left', 'right' and 'escape'.
+        :param sink: DataSink of the session.
+        :param config: Experiment configuration compiled by config.compile_config.
+        :param idle: IdleScheduler for the bookkeeping; it only runs during blanks, fixation and the response wait.
+        :param realtime: Started RealtimeMode; the stimulus alternation and mask are its critical window.
+        :param journal: EventJournal the onsets of every trial are logged to, timed on their flips.
+        :param telemetry: FrameTelemetry every flip is recorded to, or None.
+        """
+        super().__init__(sink, config, idle)
+        self.win = win
+        self.bank = bank
+        self.key_collector = key_collector
+        self.realtime = realtime
+        self.journal = journal
+        self.telemetry = telemetry
+        self.blank_frames = config['blank_frames']
+        self.mask_frames = config['mask']['frames']
+        # A VirtualWindow runs the waits, clocks and instruction keys on simulated time
+        self.timer = getattr(win, 'timer', core)
+        self.events = getattr(win, 'events', event)
+        self.my_clock = self.timer.Clock()
+        self.trial_key_mark = key_collector.mark()  # Presses after this mark belong to the current trial
+        self.bake_s = 0.0  # Longest bake of a composite in the last trial (config['prebake'])
+
+    def flip(self, phase):
+        """Flip the window; with telemetry the frame is recorded under phase (a telemetry.phases name)."""
+        if self.telemetry is None:
+            return self.win.flip()
+        return self.telemetry.flip(self.win, phase_codes[phase])
+
+    def number_trial(self, trial_count):
+        """Start trial trial_count in the event journal and the frame telemetry."""
+        self.journal.log(codes['trial_start'], 0, trial_count)
+        if self.telemetry is not None:
+            self.telemetry.trial = trial_count
+
+    # ==============================================================================
+    # INSTRUCTIONS AND BREAK FUNCTIONS
+    # ==============================================================================
+    def display_instr(self, text):
+        """Show text-only instructions and wait for SPACE."""
+        self.bank.instructions.text = text
+        self.bank.instructions.pos = (0, 0)
+        self.bank.instructions.draw()
+        self.flip('instructions')
+        self.events.clearEvents(eventType="keyboard")
+        keys = self.events.waitKeys(keyList=['space', 'escape'])
+        if 'escape' in keys:
+            core.quit()
+
+    def display_example_instructions(self, text, left_image, right_image, position=(0, 0)):
+        """Display instructions with example stimuli."""
+        self.bank.instructions.text = text
+        self.bank.instructions.pos = position
+        self.bank.instructions.draw()
+        left_image.draw()
+        right_image.draw()
+        self.flip('instructions')
+        self.events.clearEvents(eventType="keyboard")
+        keys = self.events.waitKeys(keyList=['right', 'left', 'space', 'escape'])
+        if 'escape' in keys:
+            core.quit()
+
+    def display_break(self, text):
+        self.bank.instructions.text = text
+        self.bank.instructions.draw()
+        self.flip('break')
+
+    def run_break(self, prepare=None):
+        """
+        Break screen for config['break_duration'] seconds, then wait until the participant continues. The screen is
+        drawn and flipped once and stays up without further flips; the break maintenance runs behind it and the
+        rest of the break is slept.
+
+        :param prepare: Function preparing the next block (e.g. drawing its first trial), run behind the break
+                        screen.
+        :return: What prepare returned (None without it).
+        """
+        self.journal.log(codes['break_start'])
+        # Wait up to a fixed end time: the last wait ends exactly on it, while waits for the rest of the duration
+        # could shrink below the resolution of a virtual display's simulated clock and never end the break
+        break_end = self.timer.getTime() + self.config['break_duration']
+        escape_mark = self.key_collector.mark()
+        self.display_break(instructions.break_text)
+        prepared = self.break_maintenance(prepare)
+        while self.timer.getTime() < break_end:
+            self.timer.wait(min(break_poll_s, break_end - self.timer.getTime()), hogCPUperiod=0)
+            if self.key_collector.presses(escape_mark, key_list=['escape']):
+                core.quit()
+        self.display_instr(instructions.continue_text)
+        self.journal.log(codes['break_end'])
+        return prepared
+
+    def break_maintenance(self, prepare=None):
+        """
+        Work too heavy for the idle frames of the trials, done while the break screen is up: the pending bookkeeping,
+        a checkpoint of the data, the journal and telemetry synced to disk, a full garbage collection, new noise
+        masks (config['refresh_noise']) and the preparation of the next block.
+
+        :return: What prepare returned (None without it).
+        """
+        self.idle.flush()
+        self.sink.checkpoint()
+        self.journal.sync()
+        if self.telemetry is not None:
+            self.telemetry.sync()
+        self.realtime.collect(generation=2)
+        if self.config['refresh_noise']:
+            self.bank.refresh_noise()
+        return prepare() if prepare is not None else None
+
+    def run_instructions(self):
+        """Show the instruction pages before the first practice block."""
+        for text, left_image, right_image in instructions.instruction_pages:
+            if left_image is None:
+                self.display_instr(text)
+            else:
+                self.display_example_instructions(text, self.bank.examples[left_image],
+                                                  self.bank.examples[right_image])
+
+    # ==============================================================================
+    # STIMULUS PRESENTATION SEQUENCE
+    # ==============================================================================
+    def show_stim(self, stim, cycle_duration, stimulus_id=0, baked=False):
+        """
+        Show one stimulus of the alternation for cycle_duration frames, the last one with only the fixation cross.
+
+        :param stim: Components of the stimulus, or a composite of the stimulus and fixation cross (baked).
+        """
+        # Frame loop first gabor
+        frame_number = -2
+        while True:
+            frame_number = frame_number + 1  # number of completed frames (so 0 is the first frame)
+
+            if frame_number == cycle_duration:
+                self.bank.fix.setAutoDraw(False)
+                break
+            if frame_number == -1:
+                for component in stim:
+                    component.setAutoDraw(True)
+                if not baked:
+                    self.bank.fix.setAutoDraw(True)
+                self.win.callOnFlip(self.journal.log, codes['stimulus_on'], stimulus_id, cycle_duration)
+            elif frame_number == (cycle_duration - 1):
+                for component in stim:
+                    component.setAutoDraw(False)
+                if baked:
+                    self.bank.fix.setAutoDraw(True)
+                self.win.callOnFlip(self.journal.log, codes['stimulus_off'], stimulus_id)
+
+            self.flip('stimulus')
+
+    def show_blank(self):
+        self.win.callOnFlip(self.journal.log, codes['blank_on'])
+        for i in range(self.blank_frames):
+            self.bank.blank.draw()
+            self.flip('blank')
+            self.idle.run()
+
+    def pre_trial_blank(self):
+        """Blank before a trial; the bookkeeping of the previous trial runs in its frames and is done after it."""
+        self.show_blank()
+        self.idle.flush()
+
+    def show_fixation(self, flength):
+        self.trial_key_mark = self.key_collector.mark()
+        self.win.callOnFlip(self.journal.log, codes['fixation_on'], 0, flength)
+        self.my_clock.reset()
+        while self.my_clock.getTime() < flength:
+            self.bank.fix.draw()
+            self.flip('fixation')
+            self.idle.run()
+        # Nothing deferred may run during the stimulus alternation and mask
+        self.idle.flush()
+
+    def show_mask(self, mask_type=None):
+        """
+        Show the mask after the alternation. Noise masks are drawn with the fixation cross; image masks
+        show one image of the mask type per frame.
+
+        :return: Dictionary with 'mask_images' and the 'mask_start' flip time. 'mask_end' is filled in on the
+                 flip after the last mask frame.
+        """
+        time_mask = {'mask_start': None, 'mask_end': None, 'mask_images': None}
+        self.win.timeOnFlip(time_mask, 'mask_start')
+        self.win.callOnFlip(self.journal.log, codes['mask_on'], self.journal.stimulus_id(mask_type or 'noise'),
+                            self.mask_frames)
+        if mask_type is None:
+            for i in range(self.mask_frames):
+                self.bank.fix.draw()
+                for noise_mask in self.bank.noise_masks:
+                    noise_mask.draw()
+                self.flip('mask')
+        else:
+            this_mask = self.bank.image_masks[mask_type]
+            random.shuffle(this_mask)
+            time_mask['mask_images'] = '-'.join([x.name for x in this_mask])
+            # Loop over the images and present each one for one frame
+            for i in range(self.mask_frames):
+                this_mask[i % len(this_mask)].draw()
+                self.flip('mask')
+        self.win.timeOnFlip(time_mask, 'mask_end')
+        self.win.callOnFlip(self.journal.log, codes['mask_off'])
+        return time_mask
+
+    def bake_composites(self, composites, first_stim, second_stim, rect):
+        """
+        Job rendering the first and second stimulus with the fixation cross into composites in rect, one per step.
+        The longest of the two bakes is kept in bake_s.
+        """
+        self.bake_s = 0.0
+        for key, stim in [('first', first_stim), ('second', second_stim)]:
+            start = time.perf_counter()
+            composites[key] = self.bank.bake(stim + [self.bank.fix], rect)
+            self.bake_s = max(self.bake_s, time.perf_counter() - start)
+            if key == 'first':
+                yield
+
+    # ==============================================================================
+    # RESPONSE
+    # ==============================================================================
+    def display_question(self, correct_response, record=True, feedback=False):
+        """
+        Display the question and collect the response.
+
+        :param correct_response: 'left' or 'right'.
+        :param record: Write the response to the data sink.
+        :param feedback: Show CORRECT!/INCORRECT! for a second (practice).
+        :return: Accuracy (1 or 0).
+        """
+        self.bank.question.draw()
+        question_mark = self.key_collector.mark()
+        question_time = self.key_collector.now()
+        # Time the question onset on the flip itself, the flip can come up to one frame after question_time
+        question_onset = {'question_onset': None}
+        self.win.timeOnFlip(question_onset, 'question_onset')
+        self.win.callOnFlip(self.journal.log, codes['question_on'])
+        self.flip('question')
+        answer, press_time = self.key_collector.wait_for(['left', 'right', 'escape'], question_mark,
+                                                         idle=self.idle.run)
+        self.journal.log(codes['response'], self.journal.stimulus_id(answer), press_time - question_time,
+                         t=press_time)
+        # Presses made before the question appeared
+        premature = self.key_collector.presses(self.trial_key_mark, question_mark)
+        if answer == 'escape' or 'escape' in [x[0] for x in premature]:
+            core.quit()
+        accuracy = int(answer == correct_response)
+
+        if record:
+            # rt counts from the flip request, rt_flip from the flip that showed the question
+            self.sink.add('premature_presses', len(premature))
+            self.sink.add('premature_keys', '-'.join([x[0] for x in premature]))
+            self.sink.add('answer', answer)
+            self.sink.add('rt', press_time - question_time)
+            self.sink.add('rt_flip', press_time - question_onset['question_onset'])
+            self.sink.add('question_onset', question_onset['question_onset'])
+            self.sink.add('accuracy', accuracy)
+
+        if feedback:
+            self.win.callOnFlip(self.journal.log, codes['feedback_on'], 0, accuracy)
+            if accuracy:
+                self.bank.correct_feedback.draw()
+            else:
+                self.bank.incorrect_feedback.draw()
+            self.flip('feedback')
+            self.timer.wait(1)
+        return accuracy
+
+    # ==============================================================================
+    # TRIAL
+    # ==============================================================================
+    def run_trial(self, trial, record=True, feedback=False, randomize_phase=False, blank=True):
+        """
+        Run one trial: blank, fixation, stimulus alternation, mask, blank and question.
+
+        :param trial: Trial parameters (see design.as_trial) with 'spatial_frequency', 'cycle_number',
+                      'stimulus_frame_duration', 'mask_present' and 'mask_type'. Planned trials (see
+                      config.make_trial_plan) also fix 'first_color', 'first_orientation', 'visual_field',
+                      'fixation_duration' and 'phase'; otherwise these are drawn at random.
+        :param record: Write the trial to the data sink.
+        :param feedback: Give feedback after the response.
+        :param randomize_phase: Draw a new grating phase for this trial.
+        :param blank: Show the blank before the trial. The experiment loops show it themselves (pre_trial_blank),
+                      so that the next condition is chosen after the bookkeeping of the previous trial.
+        :return: Accuracy (1 or 0).
+        """
+        data = {'mask_present': trial['mask_present'],
+                'cycle_number': trial['cycle_number']}
+
+        # Color and orientation of the first stimulus
+        first_color = trial.get('first_color') or np.random.choice(design.colors)
+        first_orientation = trial.get('first_orientation') or np.random.choice(design.orientations)
+        correct_response = design.correct_responses[(first_color, first_orientation)]
+        data['first_color'] = first_color
+        data['first_orientation'] = first_orientation
+        data['correct_response'] = correct_response
+
+        # Visual field and spatial frequency
+        visual_field = trial.get('visual_field') or np.random.choice(design.visual_fields)
+        data['visual_field'] = visual_field
+        data['spatial_frequency'] = trial['spatial_frequency']
+        if trial['mask_type'] is not None:
+            data['mask_type'] = trial['mask_type']
+
+        # Prepare stimulus sequence from the bank of all possible stimuli
+        first_stim_name, second_stim_name = self.bank.stimulus_pair(first_color, first_orientation, visual_field,
+                                                                    trial['spatial_frequency'])
+        first_stim = self.bank.stimuli[first_stim_name]
+        second_stim = self.bank.stimuli[second_stim_name]
+        if randomize_phase:
+            phase = trial.get('phase', random.random())
+            first_stim[0].phase = phase
+            second_stim[0].phase = phase
+            data['phase'] = phase
+        data['first_stim'] = first_stim_name
+        data['second_stim'] = second_stim_name
+
+        # Duration of individual stimulus
+        stimulus_frame_duration = trial['stimulus_frame_duration']
+        data['stimulus_frame_duration'] = stimulus_frame_duration
+
+        # Blank screen
+        if blank:
+            self.show_blank()
+
+        # Fixation cross
+        flength = trial.get('fixation_duration')
+        if flength is None:
+            fixation_ms = self.config['fixation_ms']
+            flength = random.uniform(fixation_ms[0], fixation_ms[1]) / 1000
+        data[self.config['fixation_column']] = flength
+        baked = self.config['prebake']
+        if baked:
+            composites = {}
+            rect = self.bank.composite_rect(visual_field)
+            if self.bake_s > self.idle.budget_s:
+                # Bakes of the last trial did not fit the slack of a frame: both are rendered now, while the blank
+                # before the trial is still up, so no fixation frame is held up by them
+                for step in self.bake_composites(composites, first_stim, second_stim, rect):
+                    pass
+            else:
+                # The two composites of the alternation are rendered in the idle frames of the fixation
+                self.idle.defer(self.bake_composites, composites, first_stim, second_stim, rect)
+        self.show_fixation(flength)
+        if baked:
+            first_stim, second_stim = [composites['first']], [composites['second']]
+
+        # Draw stimuli in rapid alternation
+        first_id = self.journal.stimulus_id(first_stim_name)
+        second_id = self.journal.stimulus_id(second_stim_name)
+        self.realtime.enter_critical()
+        for c in range(trial['cycle_number']):
+            self.show_stim(first_stim, stimulus_frame_duration, first_id, baked)
+            self.show_stim(second_stim, stimulus_frame_duration, second_id, baked)
+
+        # Mask, if the trial is masked
+        time_mask = None
+        if trial['mask_present']:
+            time_mask = self.show_mask(trial['mask_type'])
+        # Number of garbage collections during the alternation and mask
+        data['gc_critical'] = self.realtime.leave_critical()
+        self.journal.log(codes['gc_critical'], 0, data['gc_critical'])
+        self.idle.defer(self.realtime.collect)
+
+        # Blank screen
+        self.show_blank()
+
+        if record:
+            if time_mask is not None:
+                if time_mask['mask_images'] is not None:
+                    data['mask_images'] = time_mask['mask_images']
+                data['mask_duration'] = time_mask['mask_end'] - time_mask['mask_start']
+            self.sink.add_many(data)
+
+        # Was black paired with left or right?
+        return self.display_question(correct_response, record=record, feedback=feedback)
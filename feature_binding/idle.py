@@ -0,0 +1,80 @@
+"""
+Idle-time scheduler: bookkeeping deferred to frames where nothing has to happen on time.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import collections
+import functools
+import inspect
+import time
+
+
+class IdleScheduler:
+    """
+    Queue of non-urgent jobs (writing data rows, staircase updates, ...) run in the slack of non-critical frames:
+    the blank screens, the fixation cross and the wait for the response. The trial engine calls run() right after
+    the flips of those frames only, so the stimulus alternation and the mask are never interrupted.
+
+    Jobs run in the order they were deferred. A job that is a generator function runs one step per call of next(),
+    so jobs larger than the slack of one frame yield between steps and are spread over several frames.
+    """
+
+    def __init__(self, budget_s, clock=time.perf_counter):
+        """
+
+        :param budget_s: Seconds of work allowed after the flip of a non-critical frame.
+        :param clock: Clock the budget is measured with.
+        """
+        self.budget_s = budget_s
+        self.clock = clock
+        self.jobs = collections.deque()  # Deferred calls, or the generators of started generator jobs
+        self.stats = {'jobs': 0, 'idle_steps': 0, 'flushed_steps': 0, 'frames_used': 0}
+
+    @property
+    def pending(self):
+        return len(self.jobs)
+
+    def defer(self, job, *args, **kwargs):
+        """Queue job(*args, **kwargs) to run in idle time."""
+        self.jobs.append(functools.partial(job, *args, **kwargs))
+        self.stats['jobs'] += 1
+
+    def step(self):
+        """Run the next step of the first job in the queue."""
+        job = self.jobs[0]
+        if inspect.isgenerator(job):
+            try:
+                next(job)
+            except StopIteration:
+                self.jobs.popleft()
+            return
+        result = job()
+        if inspect.isgenerator(result):
+            self.jobs[0] = result  # Continue the job on the next step
+        else:
+            self.jobs.popleft()
+
+    def run(self, budget_s=None):
+        """
+        Run deferred work for at most budget_s seconds (the per-frame budget by default). A step that has started
+        always finishes, so steps should be well below the budget.
+        """
+        if not self.jobs:
+            return
+        deadline = self.clock() + (self.budget_s if budget_s is None else budget_s)
+        self.stats['frames_used'] += 1
+        while self.jobs and self.clock() < deadline:
+            self.step()
+            self.stats['idle_steps'] += 1
+
+    def flush(self):
+        """Run every deferred job to the end, e.g. when its results are needed now."""
+        while self.jobs:
+            self.step()
+            self.stats['flushed_steps'] += 1
+
+    def summary(self):
+        return (f'Idle scheduler: {self.stats["jobs"]} jobs, {self.stats["idle_steps"]} steps in '
+                f'{self.stats["frames_used"]} idle frames, {self.stats["flushed_steps"]} steps flushed')
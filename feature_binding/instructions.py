@@ -0,0 +1,133 @@
+"""
+Instruction, practice and break texts shared by all experiments.
+"""
+
+# ==============================================================================
+# INSTRUCTIONS
+# ==============================================================================
+# Pages shown before the first practice block: (text, left example image, right example image).
+# Pages without images are text-only and continue with SPACE.
+instruction_pages = [
+    ('Welcome to the experiment! \n\n\n\n Press SPACE to start the instructions.', None, None),
+
+    ('In this experiment, you will be presented with semicircles made of black or white stripes. '
+     'They will be presented at the center of the screen in a sequence. So, in every trial you will see black '
+     'and white stripes alternating. These stripes will be pointing either to the left or to the right. To figure out '
+     'if '
+     'stripes are pointing to the left or to the right, you should figure out in which corner of the screen is '
+     'the upper end of the shape pointing. '
+     'Below you see and example of black semicircle pointing to the left and white semicircle orientated '
+     'to the right.'
+     '\n\n\n\n\n\n\n\n\n\n\n\nPress SPACE to continue.', 'black_left_down', 'white_right_down'),
+
+    ('On every trial, each color will always be paired with only one orientation. For example, '
+     'in one trial you can see black leftward-pointing stripes alternating with white '
+     'rightward-pointing '
+     'stripes, as illustrated bellow.'
+     '\n\n\n\n\n\n\n\n\n\n\n\nPress SPACE to continue.', 'black_left_up', 'white_right_up'),
+
+    ('In another trial, this can be reversed and you could see white leftward-pointing stripes '
+     'alternating with black-rightward pointing stripes. Whether black is paired with left or '
+     'right will '
+     'change from trial to trial. '
+     '\n\n\n\n\n\n\n\n\n\n\n\nPress SPACE to continue.', 'white_left_up', 'black_right_up'),
+
+    ('The number of times black and white stripes are presented will change from trial to trial. '
+     'Regardless of how many times black and white semicircles are presented, '
+     'each color will always be pointing either to the left or to the right. Your task is to '
+     'detect the orientation of BLACK stripes. '
+     '\n\n\n\nPress SPACE to continue.', None, None),
+
+    ('At the beginning of a trial, you should look at the fixation cross (+) at the center of the screen. '
+     'At the end of each trial, you will be asked "Was black paired with leftward or rightward orientation?" '
+     'This will not always be easy; Sometimes stripes will be presented so briefly that you will barely see '
+     'them. '
+     'You should not think too much about your response, but respond according to your first impression. '
+     '\n\nTo respond, you should use left and right arrow keys located at the bottom right of the keyboard. '
+     'If you think BLACK stripes were pointing to the LEFT, you should press the LEFT arrow key. Likewise, '
+     'if you think BLACK stripes were pointing to the RIGHT, you should press the RIGHT arrow key. '
+     '\n\n\n\nPress SPACE to continue.', None, None),
+
+    ('This is an example of one trial. Bellow you see BLACK stripes that are pointing to the right '
+     'and WHITE stripes that are pointing to the left. These two stimuli will be alternating on the screen. '
+     'Because your task is to detect in which direction are '
+     'BLACK stripes pointing, the correct response here would be RIGHT, and you would, thus, press the '
+     'RIGHT arrow key.'
+     '\n\n\n\n\n\n\n\n\n\nPress RIGHT arrow key to continue.', 'black_right_up', 'white_left_up'),
+
+    ('In another trial, you can see BLACK stripes pointing to the LEFT and WHITE stripes '
+     'pointing to the RIGHT. '
+     'Again, because you will be asked "Was black paired with left or right?", the correct '
+     'response in this '
+     'would be LEFT, and you should press the LEFT arrow key. '
+     '\n\n\n\n\n\n\n\n\n\n\n\nPress LEFT arrow key to continue.', 'black_left_up', 'white_right_up'),
+
+    ('Stimuli could also appear below the fixation cross. '
+     'Again, you should focus on where are black stripes pointing. '
+     'This is the example of the trial where BLACK stripes are pointing to the RIGHT and WHITE stripes pointing to '
+     'the LEFT. The correct response to "Was black paired with left or right?" in '
+     'this trial would be RIGHT, and you should press the RIGHT arrow key. '
+     '\n\n\n\n\n\n\n\n\n\nPress RIGHT arrow key to continue.', 'black_right_down', 'white_left_down'),
+
+    ('In another trial in which stimuli appear below the fixation cross, as illustrated here, '
+     'BLACK stripes could be pointing to the LEFT and '
+     'WHITE stripes to the RIGHT. The correct response in this trial would be LEFT, '
+     'and you should press the LEFT arrow key. '
+     '\n\n\n\n\n\n\n\n\n\n\n\nPress LEFT arrow key to continue.', 'black_left_down', 'white_right_down'),
+]
+
+# ==============================================================================
+# PRACTICE BLOCKS
+# ==============================================================================
+# Texts shown before ('intro') and after ('outro') each practice block, and when a practice
+# criterion was not reached ('fail'). '{breaks}' is replaced by the number of breaks in the experiment.
+practice_texts = {
+    'practice_1': {
+        'intro': 'To familiarize yourself with the task, you will first go through the practice session. In the '
+                 'first block of the practice session stimuli will be shown way slower than in the actual experiment. '
+                 'The purpose of this practice block is to ensure that you understand what is the RIGHT and what is '
+                 'the LEFT '
+                 'orientation. If you will be needing a reminder, please check the guide you see on your desk. '
+                 '\n\n To be able to continue with the experiment, you need to have 10 correct trials in a row. You '
+                 'will receive a feedback after each trial. Remember to respond using LEFT or RIGHT arrow keys, '
+                 'according to the orientation of BLACK stripes. '
+                 '\n\n\n\nPress SPACE to start the first practice block.',
+        'fail': 'In the last 30 trials, you did not succeed to have 10 correct responses in a row. '
+                'Please call the experimentator. ',
+        'outro': 'This is the end of the first practice block. You responded correctly on 10 trials in a row.'
+                 '\n\n\n\nPress SPACE to continue.',
+    },
+    'practice_2': {
+        'intro': 'The next practice block will resemble the actual experiment more. Your task remains the same - '
+                 'You should detect the orientation of black stripes and respond with the LEFT or RIGHT arrow key '
+                 'accordingly. You will still receive feedback. You will be able to continue with the experiment '
+                 'only if you perform well enough on this practice block.'
+                 '\n\n\n\nPress SPACE to start the second practice block.',
+        'fail': 'In the last 30 trials, you did not succeed to have 80% correct responses. '
+                'Please call the experimentator. ',
+        'outro': 'This is the end of the second practice block. You performed well enough to continue with the '
+                 'experiment.'
+                 '\n\n\n\nPress SPACE to continue.',
+    },
+    'practice_3': {
+        'intro': 'In the final practice block you will see examples from the actual experiment. As you will see,'
+                 ' stimuli are sometimes shown very quickly and, thus, the orientation might be difficult to detect. '
+                 'You should respond as accurately as possible, but try not thinking too much about your response. '
+                 '\n\n\n\nPress SPACE to start the third practice block.',
+        'outro': "This is the end of the last practice session."
+                 " Now you will start with the actual experiment. You will not receive the feedback anymore. "
+                 "You will have {breaks} breaks throughout the task. "
+                 "\n\n\nRemember to "
+                 "respond using LEFT or RIGHT arrow keys, according to the orientation of BLACK stripes. "
+                 'You should respond as accurately as possible, but try not thinking too much about your response. '
+                 "\n\n\n\nPRESS SPACE TO START THE EXPERIMENT.",
+    },
+}
+
+# ==============================================================================
+# BREAKS AND END
+# ==============================================================================
+break_text = 'You reached a 1-minute break.'
+continue_text = 'Press SPACE when you are ready to continue with the experiment.'
+end_text = ('This is the END of the experiment.'
+            '\n\n\n\n Press SPACE to close the experiment.')
@@ -0,0 +1,186 @@
+"""
+Binary event journal (no PsychoPy needed).
+
+Events of the trials (onsets and offsets of fixation, stimuli, mask and question, responses, breaks) are written as
+fixed-size records (time, event code, stimulus id, value) to a preallocated memory-mapped ring file. Logging an
+event packs 16 bytes into the mapped file, with no text formatting and no system call, so it can be done inside
+the frame loops. The names of the event codes and stimulus ids are kept in a JSON file next to the journal.
+
+Convert a journal to CSV:
+
+    python -m feature_binding.journal data/P1_exp2_2024.journal -o data/P1_exp2_2024_events.csv
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+# File layout: a 32-byte header, then the ring of 16-byte records. Writing packs with struct, reading uses the
+# matching numpy dtypes.
+magic = b'FBJ1'
+header_struct = struct.Struct('<4sIQQ8x')  # magic, record size, capacity, records written
+count_struct = struct.Struct('<Q')
+count_offset = 16
+record_struct = struct.Struct('<dHHf')  # time, event code, stimulus id, value
+header_dtype = np.dtype([('magic', 'S4'), ('record_size', '<u4'), ('capacity', '<u8'), ('count', '<u8'),
+                         ('padding', 'V8')])
+record_dtype = np.dtype([('time', '<f8'), ('code', '<u2'), ('stimulus', '<u2'), ('value', '<f4')])
+
+# Event codes; the value of an event is given in the comment
+events = ['trial_start',  # trial number
+          'blank_on',
+          'fixation_on',  # fixation duration in s
+          'stimulus_on',  # frames of the presentation
+          'stimulus_off',
+          'mask_on',  # mask frames
+          'mask_off',
+          'question_on',
+          'response',  # rt in s; stimulus is the key
+          'feedback_on',  # accuracy
+          'break_start',
+          'break_end',
+          'gc_critical']  # garbage collections during the alternation and mask
+codes = {name: code for code, name in enumerate(events)}
+
+# Events of a trial besides the onsets and offsets of its stimuli (4 per cycle): trial start, two blanks,
+# fixation, mask on and off, gc_critical, question, feedback and the responses, premature presses included
+trial_events = 16
+
+
+def journal_capacity(config, headroom=2):
+    """
+    Records for a session of config['max_trials'] trials of the longest alternation of the trial plan, times
+    headroom for the practice blocks, the breaks and extra key presses.
+    """
+    cycles = max(trial['cycle_number'] for trial in config['trial_plan'])
+    return int(headroom * config['max_trials'] * (trial_events + 4 * cycles))
+
+
+class EventJournal:
+    """Ring of fixed-size event records in a memory-mapped file; the oldest records are overwritten when full."""
+
+    def __init__(self, path, capacity=2 ** 20, clock=time.perf_counter):
+        """
+
+        :param path: Journal file; its names are saved in path + '.json'.
+        :param capacity: Number of records kept (16 bytes each), e.g. journal_capacity of the configuration. A
+                         session that logs more wraps the ring and loses its earliest trials.
+        :param clock: Time of an event when none is given, e.g. logging.defaultClock.getTime for the flip clock.
+        """
+        self.path = path
+        self.clock = clock
+        self.capacity = capacity
+        self.count = 0
+        self.stimulus_ids = {'': 0}
+        self.file = open(path, 'w+b')
+        self.file.truncate(header_struct.size + capacity * record_struct.size)  # Preallocate
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        header_struct.pack_into(self.map, 0, magic, record_struct.size, capacity, 0)
+
+    def stimulus_id(self, name):
+        """Id of a stimulus, key or mask name; names met for the first time get the next id."""
+        if name not in self.stimulus_ids:
+            self.stimulus_ids[name] = len(self.stimulus_ids)
+        return self.stimulus_ids[name]
+
+    def register(self, names):
+        """Give names ids up front and save the names, so the journal can be read even if the session crashes."""
+        for name in names:
+            self.stimulus_id(name)
+        self.save_names()
+
+    def log(self, code, stimulus=0, value=0.0, t=None):
+        """
+        Write an event: one record and the record count are packed straight into the mapped file.
+
+        :param code: Event code (see events and codes).
+        :param stimulus: Stimulus id (see stimulus_id).
+        :param value: Value of the event.
+        :param t: Time of the event; the journal clock when None.
+        """
+        record_struct.pack_into(self.map, header_struct.size + (self.count % self.capacity) * record_struct.size,
+                                self.clock() if t is None else t, code, stimulus, value)
+        self.count += 1
+        count_struct.pack_into(self.map, count_offset, self.count)
+
+    def sync(self):
+        """Write the mapped records to disk."""
+        self.map.flush()
+
+    def save_names(self):
+        with open(self.path + '.json', 'w', encoding='utf-8') as names_file:
+            json.dump({'events': events, 'stimuli': sorted(self.stimulus_ids, key=self.stimulus_ids.get)},
+                      names_file, indent=1)
+
+    def close(self):
+        self.save_names()
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+# ==============================================================================
+# READING
+# ==============================================================================
+def read_journal(path):
+    """
+    Records of a journal in the order they were written.
+
+    :return: Structured array of the records, list of event names and list of stimulus names.
+    """
+    header = np.fromfile(path, dtype=header_dtype, count=1)[0]
+    if header['magic'] != magic or header['record_size'] != record_dtype.itemsize:
+        raise ValueError(f'{path} is not an event journal')
+    capacity, count = int(header['capacity']), int(header['count'])
+    records = np.fromfile(path, dtype=record_dtype, offset=header_dtype.itemsize, count=capacity)
+    if count > capacity:  # The ring has wrapped; the oldest record is at the write position
+        records = np.roll(records, -(count % capacity))
+    else:
+        records = records[:count]
+    names_path = path + '.json'
+    names = {'events': events, 'stimuli': []}
+    if os.path.isfile(names_path):
+        with open(names_path, encoding='utf-8') as names_file:
+            names = json.load(names_file)
+    return records, names['events'], names['stimuli']
+
+
+def trial_numbers(records):
+    """Trial number of every record: the value of the last trial_start before it, -1 before the first (practice)."""
+    starts = np.flatnonzero(records['code'] == codes['trial_start'])
+    last_start = np.searchsorted(starts, np.arange(len(records)), side='right') - 1
+    numbers = np.append(records['value'][starts], -1).astype(int)
+    return numbers[last_start]  # Index -1 picks the appended -1
+
+
+def write_csv(records, event_names, stimulus_names, output):
+    writer = csv.writer(output)
+    writer.writerow(['trial', 'time', 'event', 'stimulus', 'value'])
+    for trial, record in zip(trial_numbers(records), records):
+        stimulus = int(record['stimulus'])
+        writer.writerow([trial, f'{record["time"]:.6f}', event_names[record['code']],
+                         stimulus_names[stimulus] if stimulus < len(stimulus_names) else stimulus,
+                         f'{record["value"]:g}'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert an event journal to CSV.')
+    parser.add_argument('journal', help='Journal file written by a session')
+    parser.add_argument('-o', '--output', default=None, help='CSV file (default: standard output)')
+    args = parser.parse_args()
+    journal_records, journal_events, journal_stimuli = read_journal(args.journal)
+    if args.output is None:
+        write_csv(journal_records, journal_events, journal_stimuli, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as csv_file:
+            write_csv(journal_records, journal_events, journal_stimuli, csv_file)
@@ -0,0 +1,102 @@
+"""
+Background keyboard input for the trial engine.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import threading
+import time
+
+import numpy as np
+from psychopy import logging
+
+
+# ==============================================================================
+# KEYBOARD INPUT COLLECTOR
+# ==============================================================================
+class KeyCollector:
+    """
+    Collect key presses in a background thread instead of polling the keyboard in the frame loop.
+    Every press is timestamped on the flip clock (logging.defaultClock, the clock used by win.timeOnFlip)
+    and stored in a ring buffer. Only the collector thread writes to the buffer and a slot is filled before
+    the write index moves on, so the trial logic can read it without any locking.
+    """
+
+    def __init__(self, kb, key_list, buffer_size=1024, poll_interval=0.0005):
+        """
+
+        :param kb: psychopy.hardware.keyboard.Keyboard to read the key presses from.
+        :param key_list: Keys to collect.
+        :param buffer_size: Number of key presses kept in the ring buffer.
+        :param poll_interval: Seconds to sleep between two reads of the keyboard.
+        """
+        self.kb = kb
+        self.key_list = list(key_list)
+        self.key_codes = {name: code for code, name in enumerate(self.key_list)}
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        # Ring buffer
+        self.codes = np.zeros(buffer_size, dtype=np.int8)  # Index of the key in key_list
+        self.times = np.zeros(buffer_size)  # Time of the press on the flip clock
+        self.write_index = 0  # Number of presses collected so far
+        # Keyboard timestamps are absolute, the flip clock counts from its own reset
+        self.clock_offset = logging.defaultClock.getLastResetTime()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.kb.clearEvents(eventType='keyboard')
+        self.running = True
+        self.thread = threading.Thread(target=self._collect, name='key_collector', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def _collect(self):
+        while self.running:
+            for key in self.kb.getKeys(keyList=self.key_list, waitRelease=False, clear=True):
+                slot = self.write_index % self.buffer_size
+                self.codes[slot] = self.key_codes[key.name]
+                self.times[slot] = key.tDown - self.clock_offset
+                self.write_index += 1  # Publish the press only once its slot is filled
+            time.sleep(self.poll_interval)
+
+    def now(self):
+        """Current time on the flip clock."""
+        return logging.defaultClock.getTime()
+
+    def mark(self):
+        """Position in the buffer; presses collected after this call have a higher index."""
+        return self.write_index
+
+    def presses(self, start, end=None, key_list=None):
+        """Return (key, time) of the presses between the marks start and end, optionally only keys in key_list."""
+        if end is None:
+            end = self.write_index
+        start = max(start, end - self.buffer_size)  # Older presses were overwritten
+        found = []
+        for index in range(start, end):
+            slot = index % self.buffer_size
+            key = self.key_list[self.codes[slot]]
+            if key_list is None or key in key_list:
+                found.append((key, self.times[slot]))
+        return found
+
+    def wait_for(self, key_list, start, idle=None):
+        """
+        Wait for the first press of a key in key_list after the mark start and return it as (key, time).
+        The press time comes from the collector thread, so idle work done while waiting does not change it.
+
+        :param idle: Optional function called between two looks at the buffer, e.g. IdleScheduler.run.
+        """
+        while True:
+            found = self.presses(start, key_list=key_list)
+            if found:
+                return found[0]
+            if idle is not None:
+                idle()
+            time.sleep(self.poll_interval)
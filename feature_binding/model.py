@@ -0,0 +1,310 @@
+"""
+Temporal-integration observer model (no PsychoPy needed).
+
+The observer sees the exact frame sequence of a trial (see TrialEngine.show_stim): the first and second stimulus
+alternate for cycle_number cycles, each shown for stimulus_frame_duration frames followed by one frame with only
+the fixation cross, then the mask (if any) and the blank. Color (black +1, white -1) and orientation (45 +1,
+135 -1) are each passed through a leaky integrator with time constant tau. The evidence that black is paired
+with 45 is the product of the integrated color and orientation, summed over time: when the alternation is faster
+than tau both integrated features average out and the pairing is lost. A mask ends the read-out persistence ms
+after its onset; without mask the read-out runs to the end of the blank. With evidence D and noise sigma the
+observer reports the pairing correctly with probability Phi(D / sigma), i.e. d' = 2 D / sigma for the yes/no d'
+of data/exp1.csv.
+
+Parameters fitted per participant: tau per SF, persistence per mask type and sigma. All predictions for the
+parameter grid are computed once with FFT convolution; the grid search per participant runs in parallel. A parameter
+that ends on the edge of its grid is listed in the at_bound column of the fit: its value is only a limit. Three edges
+are limits of the model itself: a tau of 1 ms already integrates nothing across frames at 120-165 Hz (shorter ones
+predict the same), a persistence of 0 reads out at mask onset, and 500 ms reaches the end of the blank in every
+experiment. The edges of sigma and of the longer taus are far outside the fits of the data tables:
+
+    python -m feature_binding.model --processes 4 -o data/model_fits.csv
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+# ==============================================================================
+# EXPERIMENTS
+# ==============================================================================
+# Frame timing of each experiment, its data tables and what they hold ('d_prime' per condition at
+# stimulus_frames, or the 'threshold' stimulus duration in frames for 75% correct)
+experiments = {
+    'exp1': {'frame_rate': 120, 'mask_frames': 30, 'blank_frames': 30, 'stimulus_frames': 2,
+             'measure': 'd_prime', 'tables': ['exp1.csv', 'exp1_mask.csv']},
+    'exp2': {'frame_rate': 165, 'mask_frames': 41, 'blank_frames': 41,
+             'measure': 'threshold', 'tables': ['exp2.csv']},
+    'exp3': {'frame_rate': 165, 'mask_frames': 41, 'blank_frames': 41,
+             'measure': 'threshold', 'tables': ['exp3.csv']},
+}
+table_levels = {'Low': 'low', 'Medium': 'med', 'High': 'high'}
+
+# Parameter grid
+taus_ms = np.geomspace(1, 2000, 56)
+persistences_ms = np.array([0, 6, 12, 25, 50, 75, 100, 150, 200, 300, 400, 500])
+sigmas = np.geomspace(1e-5, 10, 61)
+threshold_durations = np.arange(1, 61)  # Stimulus durations (frames) searched for the 75% point
+lapse_rate = 0.02
+# d' of 25 signal trials all correct and 25 noise trials all correct after the 1 / (2n) correction of the analysis
+max_d_prime = 4.107
+
+
+def parse_column(column):
+    """
+    Condition cell of a data column: (sf, cycle_number, mask), mask is 'noise' for the noise masks, the SF of an
+    image mask, or None without mask. Columns that are not conditions or duplicate another column give None.
+    """
+    parts = column.split('_')
+    if parts[0] not in table_levels:
+        return None
+    sf = table_levels[parts[0]]
+    if parts[1] == 'FALSE':
+        return sf, 1, None
+    if parts[1] == 'TRUE':
+        return None  # Same condition as <SF>_1 of exp1.csv
+    if len(parts) > 2:
+        return sf, int(parts[1]), table_levels[parts[2]]
+    return sf, int(parts[1]), 'noise'
+
+
+def read_participants(data_dir, tables):
+    """One dictionary cell -> value per participant; the tables of an experiment have one row per participant."""
+    participants = None
+    for table in tables:
+        with open(os.path.join(data_dir, table), newline='', encoding='utf-8-sig') as table_file:
+            rows = list(csv.DictReader(table_file))
+        if participants is None:
+            participants = [{} for x in rows]
+        for participant, row in zip(participants, rows):
+            for column, value in row.items():
+                cell = parse_column(column)
+                if cell is not None:
+                    participant[cell] = float(value) if value not in ('', 'NA') else np.nan
+    return participants
+
+
+# ==============================================================================
+# MODEL
+# ==============================================================================
+def normal_cdf(x):
+    """Standard normal CDF (Abramowitz and Stegun 7.1.26, error below 1e-7), vectorised over arrays."""
+    z = np.abs(x) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-z ** 2)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+
+def frame_schedule(cycle_number, stimulus_frames, mask_frames, blank_frames, masked):
+    """
+    Color and orientation signals of a trial, one value per frame, as drawn by show_stim.
+
+    :return: Color signal, orientation signal and the frame of mask onset (None without mask).
+    """
+    presentation = np.r_[np.ones(stimulus_frames), 0.0]  # Stimulus frames and the fixation-only frame
+    cycle = np.r_[presentation, -presentation]  # First stimulus (black 45) then second stimulus (white 135)
+    stimulus = np.tile(cycle, cycle_number)
+    onset = len(stimulus) if masked else None
+    signal = np.r_[stimulus, np.zeros((mask_frames if masked else 0) + blank_frames)]
+    return signal, signal.copy(), onset
+
+
+class ObserverModel:
+    """Predictions of the temporal-integration observer for a set of trial schedules over the parameter grid."""
+
+    def __init__(self, frame_rate, mask_frames, blank_frames, tau_chunk=7):
+        """
+
+        :param frame_rate: Refresh rate of the experiment in Hz.
+        :param mask_frames: Frames of the mask.
+        :param blank_frames: Frames of the blank after the mask.
+        :param tau_chunk: Time constants convolved at once; trades memory for speed.
+        """
+        self.frame_rate = frame_rate
+        self.mask_frames = mask_frames
+        self.blank_frames = blank_frames
+        self.tau_chunk = tau_chunk
+        self.persistence_frames = np.round(persistences_ms * frame_rate / 1000).astype(int)
+
+    def evidence(self, schedules):
+        """
+        Evidence read out at every persistence for every schedule.
+
+        :param schedules: List of (cycle_number, stimulus_frames, masked).
+        :return: Array of evidence (s), time constants x persistences x schedules.
+        """
+        built = [frame_schedule(c, d, self.mask_frames, self.blank_frames, m) for c, d, m in schedules]
+        length = max(len(x[0]) for x in built)
+        color = np.zeros((len(built), length))
+        orientation = np.zeros((len(built), length))
+        for i, (c, o, onset) in enumerate(built):
+            color[i, :len(c)] = c
+            orientation[i, :len(o)] = o
+
+        # Read-out frame of every schedule and persistence: mask onset + persistence, or the end of the blank
+        ends = np.array([len(x[0]) - 1 for x in built])
+        onsets = np.array([-1 if x[2] is None else x[2] for x in built])
+        readout = np.where(onsets[None, :] >= 0, onsets[None, :] + self.persistence_frames[:, None], ends[None, :])
+        readout = np.minimum(readout, ends[None, :])
+
+        # Leaky integrator y[t] = a y[t - 1] + (1 - a) x[t] as a causal FFT convolution
+        n_fft = 2 * length
+        color_f = np.fft.rfft(color, n_fft)
+        orientation_f = np.fft.rfft(orientation, n_fft)
+        t = np.arange(length)
+        evidence = np.empty((len(taus_ms), len(persistences_ms), len(built)))
+        for start in range(0, len(taus_ms), self.tau_chunk):
+            taus = taus_ms[start:start + self.tau_chunk]
+            leak = np.exp(-1000 / (taus * self.frame_rate))
+            kernels = np.fft.rfft((1 - leak[:, None]) * leak[:, None] ** t[None, :], n_fft)  # taus x freqs
+            integrated_color = np.fft.irfft(kernels[:, None] * color_f[None], n_fft)[..., :length]
+            integrated_orientation = np.fft.irfft(kernels[:, None] * orientation_f[None], n_fft)[..., :length]
+            cumulative = np.cumsum(integrated_color * integrated_orientation, axis=-1) / self.frame_rate
+            evidence[start:start + len(taus)] = np.take_along_axis(cumulative[:, None], readout[None, :, :, None],
+                                                                   axis=-1)[..., 0]
+        return evidence
+
+    def d_prime(self, cells, stimulus_frames):
+        """Predicted d' of cells (sf, cycle_number, mask): time constants x persistences x sigmas x cells."""
+        evidence = self.evidence([(c, stimulus_frames, m is not None) for sf, c, m in cells])
+        return np.minimum(2 * evidence[:, :, None, :] / sigmas[None, None, :, None], max_d_prime)
+
+    def thresholds(self, cells):
+        """Predicted stimulus duration (frames) for 75% correct of cells: time constants x persistences x sigmas x cells."""
+        schedules = [(c, d, m is not None) for sf, c, m in cells for d in threshold_durations]
+        evidence = self.evidence(schedules).reshape(len(taus_ms), len(persistences_ms), len(cells), -1)
+        p = lapse_rate / 2 + (1 - lapse_rate) * normal_cdf(evidence[:, :, None] / sigmas[None, None, :, None, None])
+
+        # First duration reaching 75%, interpolated with the duration before; durations that never reach it count
+        # as the longest duration searched
+        above = p >= 0.75
+        first = np.where(above.any(axis=-1), np.argmax(above, axis=-1), len(threshold_durations) - 1)
+        previous = np.maximum(first - 1, 0)
+        p_first = np.take_along_axis(p, first[..., None], axis=-1)[..., 0]
+        p_previous = np.take_along_axis(p, previous[..., None], axis=-1)[..., 0]
+        fraction = np.where(p_first > p_previous, (0.75 - p_previous) / np.maximum(p_first - p_previous, 1e-12), 1)
+        fraction = np.clip(np.where(first == 0, 1, fraction), 0, 1)
+        return threshold_durations[previous] + fraction * (threshold_durations[first] - threshold_durations[previous])
+
+
+# ==============================================================================
+# FITTING
+# ==============================================================================
+def predict(experiment, cells):
+    """
+    Predictions of an experiment for every SF over the parameter grid.
+
+    :return: Dictionary with 'masks' (mask types with a persistence), 'combinations' (persistence index per mask
+             type) and per SF the 'cells' and 'predictions' (time constants x persistence combinations x sigmas x
+             cells), on the scale the fit compares: d' or log thresholds.
+    """
+    settings = experiments[experiment]
+    model = ObserverModel(settings['frame_rate'], settings['mask_frames'], settings['blank_frames'])
+    masks = sorted({x[2] for x in cells if x[2] is not None})
+    combinations = list(itertools.product(range(len(persistences_ms)), repeat=len(masks)))
+    prediction = {'masks': masks, 'combinations': combinations, 'sfs': {}}
+    for sf in sorted({x[0] for x in cells}):
+        sf_cells = [x for x in cells if x[0] == sf]
+        if settings['measure'] == 'd_prime':
+            grid = model.d_prime(sf_cells, settings['stimulus_frames'])
+        else:
+            grid = np.log(model.thresholds(sf_cells))
+        # Persistence of every cell under every combination; cells without mask do not depend on it
+        index = np.array([[x[masks.index(cell[2])] if cell[2] is not None else 0 for cell in sf_cells]
+                          for x in combinations])  # combinations x cells
+        per_combination = grid[:, index, :, np.arange(len(sf_cells))[None, :]]  # combinations x cells x taus x sigmas
+        prediction['sfs'][sf] = {'cells': sf_cells, 'predictions': per_combination.transpose(2, 0, 3, 1)}
+    return prediction
+
+
+_prediction = None
+
+
+def _share_prediction(prediction):
+    global _prediction
+    _prediction = prediction
+
+
+def fit_participant(args):
+    """Least-squares grid fit of one participant; runs in a worker process with the shared predictions."""
+    experiment, participant_number, data = args
+    prediction = _prediction
+    measure = experiments[experiment]['measure']
+    total = 0
+    best_taus = {}
+    n = 0
+    for sf, sf_prediction in prediction['sfs'].items():
+        observed = np.array([data.get(x, np.nan) for x in sf_prediction['cells']])
+        if measure == 'threshold':
+            observed = np.log(observed)
+        valid = np.isfinite(observed)
+        n += valid.sum()
+        errors = (sf_prediction['predictions'][..., valid] - observed[valid]) ** 2
+        cost = errors.sum(axis=-1)  # time constants x combinations x sigmas
+        best_taus[sf] = np.argmin(cost, axis=0)
+        total = total + cost.min(axis=0)
+    combination, sigma = np.unravel_index(np.argmin(total), total.shape)
+
+    fit = {'experiment': experiment, 'participant': participant_number, 'sigma': sigmas[sigma],
+           'rmse': float(np.sqrt(total[combination, sigma] / max(n, 1))), 'measure': measure}
+    at_bound = ['sigma'] if sigma in (0, len(sigmas) - 1) else []
+    for sf, tau in best_taus.items():
+        fit[f'tau_{sf}_ms'] = float(taus_ms[tau[combination, sigma]])
+        if tau[combination, sigma] in (0, len(taus_ms) - 1):
+            at_bound.append(f'tau_{sf}_ms')
+    for mask, persistence in zip(prediction['masks'], prediction['combinations'][combination]):
+        fit[f'persistence_{mask}_ms'] = int(persistences_ms[persistence])
+        if persistence in (0, len(persistences_ms) - 1):
+            at_bound.append(f'persistence_{mask}_ms')
+    fit['at_bound'] = ' '.join(at_bound)  # Parameters on the edge of their grid
+    return fit
+
+
+def fit_experiment(experiment, data_dir, processes=None):
+    """Fit every participant of an experiment; processes=1 fits in this process."""
+    participants = read_participants(data_dir, experiments[experiment]['tables'])
+    cells = sorted({cell for x in participants for cell in x}, key=str)
+    prediction = predict(experiment, cells)
+    jobs = [(experiment, i + 1, x) for i, x in enumerate(participants)]
+    if processes == 1:
+        _share_prediction(prediction)
+        return [fit_participant(x) for x in jobs]
+    with multiprocessing.Pool(processes, initializer=_share_prediction, initargs=(prediction,)) as pool:
+        return pool.map(fit_participant, jobs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fit the temporal-integration observer to the experiments.')
+    parser.add_argument('experiments', nargs='*', default=list(experiments), help='Experiments to fit')
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(__file__), '..', 'data'),
+                        help='Folder with the data tables')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('-o', '--output', default=None, help='CSV file to write the fits to')
+    args = parser.parse_args()
+
+    fits = []
+    for name in args.experiments:
+        started = time.time()
+        experiment_fits = fit_experiment(name, args.data, processes=args.processes)
+        print(f'{name}: {len(experiment_fits)} participants in {time.time() - started:.1f} s')
+        for fit in experiment_fits:
+            print('  ' + ', '.join(f'{k}={v:.3g}' if isinstance(v, float) else f'{k}={v}' for k, v in fit.items()
+                                   if k not in ['experiment', 'measure', 'at_bound']))
+            if fit['at_bound']:
+                print(f'    at the edge of the grid: {fit["at_bound"]}')
+        fits += experiment_fits
+    if args.output:
+        columns = list(dict.fromkeys(k for x in fits for k in x))
+        with open(args.output, 'w', newline='') as output:
+            writer = csv.DictWriter(output, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(fits)
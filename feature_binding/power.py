@@ -0,0 +1,219 @@
+"""
+Monte-Carlo power analysis of the staircase experiments (no PsychoPy needed).
+
+The cell means, the spread between participants and the residual spread are estimated from the threshold tables
+(data/exp2.csv, data/exp3.csv). A simulated study draws true thresholds for every participant and cell, measures
+each with the real staircaseHandle run against a simulated observer, and tests the measured thresholds with the
+repeated-measures ANOVA of the JASP analyses (stats.rm_anova). Power is the share of studies with p < alpha, by
+default the p-value with the Greenhouse-Geisser correction for sphericity.
+
+Staircase measurements come from a bank of staircase runs per true threshold, so a study costs a few array
+operations and tens of thousands of studies are cheap. Studies run in chunks on all cores; the p-values of every
+parameter set are cached by the hash of the parameters, so asking for more studies only simulates the extra ones:
+
+    python -m feature_binding.power exp2 --participants 6 8 10 12 --studies 20000
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from feature_binding.staircase import staircaseHandle
+from feature_binding.stats import read_table, rm_anova, tables
+
+# Threshold tables of the staircase experiments
+designs = {x: tables[x] for x in ('exp2', 'exp3')}
+
+chunk_size = 500  # Studies per job; also the unit the cache grows by
+bank_runs = 400  # Staircase runs per true threshold in the bank
+bank_thresholds = np.arange(1, 81)  # True thresholds (frames) in the bank
+
+
+# ==============================================================================
+# ESTIMATES FROM THE DATA
+# ==============================================================================
+def estimate(experiment, data_dir):
+    """
+    Cell means and variance components of an experiment.
+
+    :return: Dictionary with 'cell_means' (levels of every factor), 'participant_sd' (spread of participant
+             averages) and 'residual_sd' (spread of participant x cell deviations, staircase noise included).
+    """
+    data = read_table(experiment, data_dir)
+    n = len(data)
+    flat = data.reshape(n, -1)
+    cell_means = flat.mean(axis=0)
+    participant_means = flat.mean(axis=1)
+    residuals = flat - cell_means[None] - participant_means[:, None] + flat.mean()
+    residual_var = (residuals ** 2).sum() / ((n - 1) * (flat.shape[1] - 1))
+    participant_var = max(participant_means.var(ddof=1) - residual_var / flat.shape[1], 0)
+    return {'experiment': experiment, 'n': n, 'cell_means': cell_means.reshape(data.shape[1:]),
+            'participant_sd': float(np.sqrt(participant_var)), 'residual_sd': float(np.sqrt(residual_var))}
+
+
+# ==============================================================================
+# STAIRCASE BANK
+# ==============================================================================
+def observer_correct(rng, dv, threshold, slope):
+    """Simulated response: 75% correct at threshold frames, from chance to perfect over +-slope x threshold."""
+    p = 0.5 + 0.5 / (1 + np.exp(-(dv - threshold) / (slope * threshold)))
+    return rng.random() < p
+
+
+def run_staircase(rng, threshold, start_value, max_trials, slope):
+    """Measured threshold of one staircase run, ended after max_trials trials if it has not converged."""
+    stair = staircaseHandle(start_value=start_value)
+    for trial in range(max_trials):
+        stair.new_trial(is_correct=observer_correct(rng, stair.dv, threshold, slope), stim=True)
+        if stair.staircase_over:
+            break
+    stair.staircase_over = True
+    return stair.get_threshold() if len(stair.dvs_on_rev) else stair.dv
+
+
+def staircase_bank(max_trials, slope, seed=0):
+    """Measured thresholds of bank_runs staircase runs at every true threshold: thresholds x runs."""
+    rng = np.random.default_rng(seed)
+    bank = np.empty((len(bank_thresholds), bank_runs))
+    for i, threshold in enumerate(bank_thresholds):
+        for run in range(bank_runs):
+            # Staircases start near threshold, as with the priors
+            start_value = max(1, int(round(threshold * np.exp(rng.normal(0, 0.3)))))
+            bank[i, run] = run_staircase(rng, threshold, start_value, max_trials, slope)
+    return bank
+
+
+# ==============================================================================
+# STUDIES
+# ==============================================================================
+def simulate_studies(params, estimates, bank, n_studies, seed):
+    """
+    P-values (params['p_value'] of stats.rm_anova) of simulated studies.
+
+    :return: Dictionary effect -> array of p-values (n_studies).
+    """
+    rng = np.random.default_rng(seed)
+    cell_means = estimates['cell_means']
+    grand_mean = cell_means.mean()
+    means = grand_mean + params['effect_scale'] * (cell_means - grand_mean)
+
+    # Staircase noise is in the residual spread of the data; only the rest is true variation
+    staircase_sd = np.mean([bank[np.clip(int(round(x)), 1, bank_thresholds[-1]) - 1].std() for x in cell_means.flat])
+    true_residual_sd = np.sqrt(max(estimates['residual_sd'] ** 2 - staircase_sd ** 2,
+                                   0.1 * estimates['residual_sd'] ** 2))
+
+    shape = (n_studies, params['participants']) + cell_means.shape
+    participant = rng.normal(0, estimates['participant_sd'], shape[:2])
+    true = means + participant.reshape(shape[:2] + (1,) * cell_means.ndim) + rng.normal(0, true_residual_sd, shape)
+    true = np.clip(np.round(true), 1, bank_thresholds[-1]).astype(int)
+    # Measure every true threshold with a random staircase run of the bank
+    measured = bank[true - 1, rng.integers(0, bank_runs, shape)]
+
+    results = rm_anova(measured, designs[params['experiment']]['factors'])
+    return {effect: result[params['p_value']] for effect, result in results.items()}
+
+
+def parameter_key(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+_worker = {}
+
+
+def _init_worker(estimates, bank):
+    _worker['estimates'] = estimates
+    _worker['bank'] = bank
+
+
+def _run_chunk(args):
+    params, chunk = args
+    seed = int(parameter_key(params), 16) % 2 ** 32 + chunk
+    return chunk, simulate_studies(params, _worker['estimates'], _worker['bank'], chunk_size, seed)
+
+
+def power(experiment, participants, n_studies, data_dir, cache_dir, effect_scale=1.0, max_trials=100, slope=0.25,
+          alpha=0.05, p_value='p_gg', processes=None):
+    """
+    Power of every effect for every number of participants.
+
+    :param participants: Numbers of participants to simulate.
+    :param n_studies: Simulated studies per number of participants (rounded up to whole chunks).
+    :param effect_scale: Multiplies the differences between cell means (1 is the effect in the data).
+    :param max_trials: Most trials per staircase.
+    :param slope: Spread of the simulated psychometric function relative to the threshold.
+    :param p_value: P-value of stats.rm_anova a study is tested with: 'p_gg' (Greenhouse-Geisser corrected), 'p_hf'
+                    (Huynh-Feldt corrected) or 'p' (uncorrected).
+    :param processes: Worker processes; None uses every core.
+    :return: Dictionary number of participants -> dictionary effect -> power.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    estimates = estimate(experiment, data_dir)
+
+    bank_params = {'max_trials': max_trials, 'slope': slope, 'runs': bank_runs}
+    bank_path = os.path.join(cache_dir, f'bank_{parameter_key(bank_params)}.npy')
+    if os.path.isfile(bank_path):
+        bank = np.load(bank_path)
+    else:
+        bank = staircase_bank(max_trials, slope)
+        np.save(bank_path, bank)
+
+    n_chunks = -(-n_studies // chunk_size)
+    cached = {}
+    jobs = []
+    for n in participants:
+        params = {'experiment': experiment, 'participants': n, 'effect_scale': effect_scale,
+                  'max_trials': max_trials, 'slope': slope, 'p_value': p_value, 'chunk_size': chunk_size}
+        path = os.path.join(cache_dir, f'studies_{parameter_key(params)}.npz')
+        cached[n] = dict(np.load(path)) if os.path.isfile(path) else {}
+        done = len(next(iter(cached[n].values()))) // chunk_size if cached[n] else 0
+        jobs += [(params, chunk) for chunk in range(done, n_chunks)]
+
+    if jobs:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(estimates, bank)) as pool:
+            results = pool.map(_run_chunk, jobs)
+        for (params, chunk), (_, p_values) in zip(jobs, results):
+            n = params['participants']
+            for effect, values in p_values.items():
+                cached[n][effect] = np.concatenate([cached[n].get(effect, np.empty(0)), values])
+        for n in participants:
+            params = {'experiment': experiment, 'participants': n, 'effect_scale': effect_scale,
+                      'max_trials': max_trials, 'slope': slope, 'p_value': p_value, 'chunk_size': chunk_size}
+            np.savez(os.path.join(cache_dir, f'studies_{parameter_key(params)}.npz'), **cached[n])
+
+    return {n: {effect: float((values[:n_chunks * chunk_size] < alpha).mean()) for effect, values in cached[n].items()}
+            for n in participants}
+
+
+if __name__ == '__main__':
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description='Monte-Carlo power of the staircase experiments.')
+    parser.add_argument('experiment', choices=list(designs))
+    parser.add_argument('--participants', type=int, nargs='+', default=[6, 8, 10, 12, 16, 20])
+    parser.add_argument('--studies', type=int, default=10000, help='Simulated studies per number of participants')
+    parser.add_argument('--effect-scale', type=float, default=1.0,
+                        help='Multiplies the differences between cell means of the data')
+    parser.add_argument('--max-trials', type=int, default=100, help='Most trials per staircase')
+    parser.add_argument('--slope', type=float, default=0.25, help='Relative spread of the psychometric function')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--p-value', choices=['p_gg', 'p_hf', 'p'], default='p_gg',
+                        help='Sphericity correction of the p-values (default: Greenhouse-Geisser)')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--data', default=os.path.join(repo, 'data'), help='Folder with the threshold tables')
+    parser.add_argument('--cache', default=os.path.join(repo, 'analysis', 'power_cache'),
+                        help='Folder of the cached studies')
+    args = parser.parse_args()
+
+    table = power(args.experiment, args.participants, args.studies, args.data, args.cache,
+                  effect_scale=args.effect_scale, max_trials=args.max_trials, slope=args.slope, alpha=args.alpha,
+                  p_value=args.p_value, processes=args.processes)
+    effects = list(next(iter(table.values())))
+    print('participants  ' + '  '.join(f'{x:>14}' for x in effects))
+    for n, row in table.items():
+        print(f'{n:>12}  ' + '  '.join(f'{row[x]:>14.3f}' for x in effects))
@@ -0,0 +1,184 @@
+"""
+Staircase priors built from earlier threshold data (no PsychoPy needed).
+
+The threshold tables in data/ (exp2.csv, exp3.csv) hold one threshold in frames per participant and condition.
+build_prior turns them into a start value and step-size schedule per staircase: the staircase starts at the
+population median, takes bigger first-phase steps when participants differ a lot, and needs fewer first-phase
+reversals because it already starts close to threshold. With the file of a participant's earlier session the
+staircases start from that participant's own thresholds instead.
+
+The prior is saved as JSON next to the experiment configuration and named in its staircase section:
+
+    python -m feature_binding.priors "paradigm/experiment 2/exp2.yaml" data/exp2.csv \
+        -o "paradigm/experiment 2/exp2_prior.json"
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+from feature_binding import design
+
+# Level names used in the threshold tables
+table_levels = {'Low': 'low', 'Medium': 'med', 'High': 'high'}
+
+# The second phase, whose reversals give the threshold, is the same as without a prior
+second_phase_reversals = 25
+second_phase_step_size = 1
+# First-phase reversals (5 without a prior) for a population prior with a small or large spread, and for a prior
+# from the participant's own earlier session
+first_phase_reversals = {'narrow': 2, 'wide': 3, 'participant': 2}
+narrow_spread = 2  # frames
+
+
+def read_threshold_table(path):
+    """
+    Read a threshold table with columns like 'Low_1' or 'Medium_2_High' (SF, cycle number and SF of the mask).
+
+    :return: Dictionary (sf, cycle_number, mask_type) -> list of thresholds; mask_type is None without mask.
+    """
+    thresholds = {}
+    with open(path, newline='', encoding='utf-8-sig') as table:
+        for row in csv.DictReader(table):
+            for column, value in row.items():
+                parts = column.split('_')
+                if parts[0] not in table_levels or value in ('', 'NA'):
+                    continue
+                mask_type = table_levels[parts[2]] if len(parts) > 2 else None
+                cell = (table_levels[parts[0]], int(parts[1]), mask_type)
+                thresholds.setdefault(cell, []).append(float(value))
+    return thresholds
+
+
+def read_session_thresholds(path, threshold_columns):
+    """
+    Thresholds of an earlier session from its PsychoPy data file.
+
+    :param threshold_columns: Dictionary threshold column -> staircase name.
+    :return: Dictionary staircase name -> threshold, from the last row that holds thresholds.
+    """
+    thresholds = {}
+    with open(path, newline='', encoding='utf-8-sig') as session_file:
+        for row in csv.DictReader(session_file):
+            for column, name in threshold_columns.items():
+                if row.get(column) not in (None, '', 'NA', 'Staircase is not over.'):
+                    thresholds[name] = float(row[column])
+    return thresholds
+
+
+def table_cell(trial):
+    return trial['spatial_frequency'], trial['cycle_number'], trial.get('mask_type')
+
+
+def table_column(cell):
+    """Column of the threshold table holding cell."""
+    names = {level: name for name, level in table_levels.items()}
+    column = f'{names[cell[0]]}_{cell[1]}'
+    return column if cell[2] is None else f'{column}_{names[cell[2]]}'
+
+
+def nearest_cell(cell, table):
+    """Cell of the table with the same SF and mask and the closest cycle number, for cells the table lacks."""
+    candidates = [x for x in table if x[0] == cell[0] and x[2] == cell[2]]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda x: abs(x[1] - cell[1]))
+
+
+def schedule(start_value, spread, kind):
+    """Start value, reversals and step sizes of a staircase."""
+    step_size = max(1, int(round(spread / 3)))
+    return {'start_value': max(1, int(round(start_value))),
+            'reversals': [first_phase_reversals[kind], second_phase_reversals],
+            'step_sizes': [step_size, second_phase_step_size]}
+
+
+def build_prior(config, table_path, frame_rate, session_path=None):
+    """
+    Build the staircase prior of an experiment.
+
+    :param config: Experiment configuration read by config.load_config.
+    :param table_path: Threshold table of earlier participants.
+    :param frame_rate: Refresh rate the thresholds of the table and session were measured at.
+    :param session_path: Optional data file of the participant's earlier session.
+    :return: Dictionary with 'frame_rate', 'sources' and 'staircases' (staircase name -> schedule).
+    """
+    experiment = config['design']
+    settings = experiment['staircase']
+    table = read_threshold_table(table_path)
+    conditions = design.unique_conditions(experiment['conditions'])
+    trials = [design.as_trial(experiment['fields'], x) for x in conditions]
+    names = [settings['name'].format(**x) for x in trials]
+
+    own = {}
+    if session_path is not None:
+        own = read_session_thresholds(session_path, {settings['threshold_column'].format(**x): name
+                                                     for x, name in zip(trials, names)})
+
+    staircases = {}
+    for trial, name in zip(trials, names):
+        cell = table_cell(trial)
+        source = cell if cell in table else nearest_cell(cell, table)
+        if source is None and name not in own:
+            continue
+        values = np.array(table.get(source, []))
+        spread = 0.0
+        if len(values) > 1:
+            quartiles = np.percentile(values, [25, 75])
+            spread = (quartiles[1] - quartiles[0]) / 1.349  # IQR as a standard deviation
+        if name in own:
+            entry = schedule(own[name], spread / 2, 'participant')
+            entry['source'] = 'participant'
+        else:
+            entry = schedule(np.median(values), spread, 'narrow' if spread <= narrow_spread else 'wide')
+            entry['source'] = table_column(source)
+        entry.update({'population_median': float(np.median(values)) if len(values) else None,
+                      'population_spread': round(float(spread), 2), 'n': int(len(values))})
+        staircases[name] = entry
+
+    sources = [os.path.basename(table_path)] + ([os.path.basename(session_path)] if session_path else [])
+    return {'frame_rate': frame_rate, 'sources': sources, 'staircases': staircases}
+
+
+def load_prior(path, frame_rate):
+    """
+    Load a prior saved by build_prior, scaled to the refresh rate of the session.
+
+    :return: Dictionary staircase name -> keyword arguments of staircaseHandle.
+    """
+    with open(path, encoding='utf-8') as prior_file:
+        prior = json.load(prior_file)
+    scale = frame_rate / prior['frame_rate']
+    schedules = {}
+    for name, entry in prior['staircases'].items():
+        schedules[name] = {'start_value': max(1, int(round(entry['start_value'] * scale))),
+                           'reversals': list(entry['reversals']),
+                           'step_sizes': [max(1, int(round(x * scale))) for x in entry['step_sizes']]}
+    return schedules
+
+
+if __name__ == '__main__':
+    from feature_binding.config import load_config
+
+    parser = argparse.ArgumentParser(description='Build staircase start values and step sizes from earlier data.')
+    parser.add_argument('config', help='YAML configuration of the experiment')
+    parser.add_argument('table', help='Threshold table of earlier participants, e.g. data/exp2.csv')
+    parser.add_argument('-o', '--output', required=True, help='JSON file to write the prior to')
+    parser.add_argument('--session', default=None, help='Data file of the participant\'s earlier session')
+    parser.add_argument('--frame-rate', type=float, default=None,
+                        help='Refresh rate of the thresholds in Hz (default: frame_rate of the configuration)')
+    args = parser.parse_args()
+    raw_config = load_config(args.config)
+    built = build_prior(raw_config, args.table, args.frame_rate or raw_config['exp_info']['frame_rate'],
+                        session_path=args.session)
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(built, output, indent=2)
+    for staircase_name, staircase in built['staircases'].items():
+        print(f'{staircase_name:>20}: start {staircase["start_value"]:>3}, reversals {staircase["reversals"]}, '
+              f'steps {staircase["step_sizes"]} ({staircase["source"]})')
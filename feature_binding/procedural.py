@@ -0,0 +1,218 @@
+"""
+Procedural gratings: the half-disc square-wave gratings computed per pixel in a fragment shader.
+
+The texture path builds one makeGrating texture per SF and polarity (grating_res² texels each) and hides half of
+the disc with a wedge cover. A ProceduralGrating has no texture: the shader computes the square wave, polarity,
+phase, circular aperture and the half-disc cut of every pixel from uniforms, so the stimulus costs no texture
+memory or build time, does not depend on a texture resolution, and changing its SF or phase is a uniform update.
+The shaders are GLSL 1.20 and only use what PsychoPy's legacy GL context offers, so they also run on Mesa's
+software renderer.
+
+Check that both paths render the same stimuli (offscreen, in the back buffer of a small window):
+
+    python -m feature_binding.procedural "paradigm/experiment 3/exp3.yaml"
+
+Set LIBGL_ALWAYS_SOFTWARE=1 to run the check on Mesa's software renderer. tests/test_procedural.py runs the same
+check for every experiment and is skipped where no window with a GL context can be opened.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import sys
+
+import numpy as np
+from psychopy.tools.monitorunittools import deg2pix
+from psychopy.visual import shaders
+from psychopy.visual.basevisual import MinimalStim
+from pyglet import gl
+
+# Corners of the quad in normalised device coordinates; the shader works in window pixels (gl_FragCoord)
+vertex_shader = """
+#version 120
+void main() {
+    gl_Position = vec4(gl_Vertex.xy, 0.0, 1.0);
+}
+"""
+
+fragment_shader = """
+#version 120
+uniform vec2 center;    // Window pixels
+uniform float size;     // Diameter in pixels
+uniform vec2 rotation;  // Cosine and sine of the orientation (clockwise)
+uniform float cycles;   // Grating cycles across the diameter
+uniform float phase;    // In diameters, as the phase of a GratingStim with one texture per stimulus
+uniform float polarity; // 1 for white bars on gray, -1 for black bars on gray
+uniform float field;    // 1 shows the upper half of the disc, -1 the lower half, 0 the whole disc
+
+void main() {
+    vec2 offset = gl_FragCoord.xy - center;
+    if (dot(offset, offset) > 0.25 * size * size || field * offset.y < 0.0) {
+        discard;
+    }
+    float x = offset.x * rotation.x - offset.y * rotation.y;
+    float bar = fract(cycles * (x / size + 0.5 - phase)) < 0.5 ? 1.0 : -1.0;
+    float rgb = 0.5 * (bar + polarity);  // PsychoPy rgb, -1 to 1
+    gl_FragColor = vec4(vec3(0.5 * (rgb + 1.0)), 1.0);
+}
+"""
+
+uniform_names = ['center', 'size', 'rotation', 'cycles', 'phase', 'polarity', 'field']
+polarities = {'white': 1.0, 'black': -1.0}
+fields = {'up': 1.0, 'down': -1.0, 'full': 0.0}
+
+
+def grating_program():
+    """Compile the grating shaders; one program serves every ProceduralGrating of a window."""
+    program = shaders.compileProgram(vertex_shader, fragment_shader)
+    uniforms = {name: gl.glGetUniformLocation(program, name.encode()) for name in uniform_names}
+    return program, uniforms
+
+
+class ProceduralGrating(MinimalStim):
+    """
+    Square-wave grating in a circular or half-disc aperture, drawn by the grating shader on a gray background.
+    Set cycles or phase before a draw to change the SF or phase; pos, size and ori are fixed when created.
+    """
+
+    def __init__(self, win, program, name=None, color='black', cycles=1, phase=0.0, ori=0.0, pos=(0, 0),
+                 size=2.178, field='full', auto_log=True):
+        """
+
+        :param win: PsychoPy window to draw in.
+        :param program: Shader program and uniform locations from grating_program.
+        :param name: Name of the stimulus.
+        :param color: 'black' or 'white' bars.
+        :param cycles: Grating cycles across the diameter of the aperture.
+        :param phase: Phase in diameters, as the phase of the texture path.
+        :param ori: Orientation in degrees, clockwise.
+        :param pos: Position of the center in deg.
+        :param size: Diameter in deg.
+        :param field: 'up' or 'down' for the upper or lower half of the disc, 'full' for the whole disc.
+        :param auto_log: Log attribute changes, as autoLog of PsychoPy stimuli.
+        """
+        self.win = win
+        super().__init__(name=name, autoLog=False)
+        self.program, self.uniforms = program
+        self.polarity = polarities[color]
+        self.cycles = cycles
+        self.phase = phase
+        self.ori = ori
+        self.field = fields[field]
+
+        # Geometry in window pixels; gl_FragCoord counts from the lower left corner of the window
+        width, height = win.size
+        self.size_pix = deg2pix(size, win.monitor)
+        self.center = (width / 2 + deg2pix(pos[0], win.monitor), height / 2 + deg2pix(pos[1], win.monitor))
+        self.rotation = (np.cos(np.radians(ori)), np.sin(np.radians(ori)))
+        radius = self.size_pix / 2 + 1  # Cover the edge pixels of the aperture
+        self.corners = [(2 * (self.center[0] + dx * radius) / width - 1,
+                         2 * (self.center[1] + dy * radius) / height - 1)
+                        for dx, dy in [(-1, -1), (1, -1), (1, 1), (-1, 1)]]
+        self.autoLog = auto_log
+
+    def draw(self, win=None):
+        """Draw the grating: one quad and the uniforms of this grating, with no texture bound."""
+        uniforms = self.uniforms
+        gl.glUseProgram(self.program)
+        gl.glUniform2f(uniforms['center'], *self.center)
+        gl.glUniform1f(uniforms['size'], self.size_pix)
+        gl.glUniform2f(uniforms['rotation'], *self.rotation)
+        gl.glUniform1f(uniforms['cycles'], self.cycles)
+        gl.glUniform1f(uniforms['phase'], self.phase)
+        gl.glUniform1f(uniforms['polarity'], self.polarity)
+        gl.glUniform1f(uniforms['field'], self.field)
+        gl.glBegin(gl.GL_QUADS)
+        for x, y in self.corners:
+            gl.glVertex2f(x, y)
+        gl.glEnd()
+        gl.glUseProgram(0)
+
+
+# ==============================================================================
+# COMPARISON WITH THE TEXTURE PATH
+# ==============================================================================
+def render(win, components):
+    """Pixels of components drawn on the cleared back buffer, which is cleared again and never flipped."""
+    win.clearBuffer()
+    for component in components:
+        component.draw()
+    frame = np.asarray(win.getMovieFrame(buffer='back'), dtype=int)[..., :3]
+    win.movieFrames.pop()
+    win.clearBuffer()
+    return frame
+
+
+def compare_pixels(reference, test, tolerance=1):
+    """
+    Compare two renderings of a stimulus. A pixel of test that differs from reference by more than tolerance is
+    explained when its value occurs among the 3 x 3 neighbours of the reference pixel: a bar or aperture edge that
+    moved by less than a pixel, e.g. because the texture path samples the grating at grating_res.
+
+    :return: Dictionary with 'differing' (share of the pixels that differ), 'unexplained' (number of differing
+             pixels not explained by a moved edge) and 'max_difference' (in 8-bit levels).
+    """
+    difference = np.abs(test - reference).max(axis=-1)
+    height, width = reference.shape[:2]
+    padded = np.pad(reference, ((1, 1), (1, 1), (0, 0)), mode='edge')
+    neighbours = np.stack([padded[dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3)])
+    explained = ((neighbours - tolerance <= test) & (test <= neighbours + tolerance)).all(axis=-1).any(axis=0)
+    return {'differing': float(np.mean(difference > tolerance)),
+            'unexplained': int(np.sum((difference > tolerance) & ~explained)),
+            'max_difference': int(difference.max())}
+
+
+def compare_banks(win, texture_bank, procedural_bank, phases=(0.0, 0.25, 0.61), tolerance=1):
+    """
+    Render every stimulus of a texture bank and a procedural bank at several phases and compare the pixels.
+
+    :return: Dictionary of stimulus name -> compare_pixels result of its worst phase.
+    """
+    results = {}
+    for name, texture_stim in texture_bank.stimuli.items():
+        procedural_stim = procedural_bank.stimuli[name]
+        worst = None
+        for phase in phases:
+            texture_stim[0].phase = phase
+            procedural_stim[0].phase = phase
+            result = compare_pixels(render(win, texture_stim), render(win, procedural_stim), tolerance)
+            if worst is None or (result['unexplained'], result['differing']) > \
+                    (worst['unexplained'], worst['differing']):
+                worst = result
+        results[name] = worst
+    return results
+
+
+if __name__ == '__main__':
+    from psychopy import visual
+
+    from feature_binding.config import load_config
+    from feature_binding.session import make_monitor
+    from feature_binding.stimuli import StimulusBank
+
+    parser = argparse.ArgumentParser(description='Compare the procedural gratings with the texture gratings.')
+    parser.add_argument('config', help='YAML configuration file')
+    parser.add_argument('--size', type=int, nargs=2, default=[400, 400], help='Window size in pixels')
+    parser.add_argument('--tolerance', type=int, default=1, help='Allowed difference in 8-bit levels')
+    args = parser.parse_args()
+
+    raw_config = load_config(args.config)
+    stimuli = raw_config['stimuli']
+    window = visual.Window(size=args.size, fullscr=False, monitor=make_monitor(raw_config['monitor']),
+                           color=[0, 0, 0], units='deg', allowGUI=False)
+    banks = [StimulusBank(window, raw_config['config_dir'], stimuli['spatial_frequencies'],
+                          grating_res=stimuli['grating_res'], procedural=procedural,
+                          fit_grating_res=stimuli.get('fit_grating_res', False))
+             for procedural in [False, True]]
+    comparison = compare_banks(window, *banks, tolerance=args.tolerance)
+    window.close()
+
+    print(f'{"stimulus":<24} {"differing":>9} {"unexplained":>11} {"max":>4}')
+    for stim_name, stim_result in comparison.items():
+        print(f'{stim_name:<24} {stim_result["differing"]:>9.2%} {stim_result["unexplained"]:>11} '
+              f'{stim_result["max_difference"]:>4}')
+    failed = [x for x, stim_result in comparison.items() if stim_result['unexplained']]
+    if failed:
+        sys.exit(f'{len(failed)} of {len(comparison)} stimuli do not match the texture path')
+    print(f'All {len(comparison)} stimuli match the texture path')
@@ -0,0 +1,121 @@
+"""
+Real-time mode: garbage collection, process priority and CPU pinning around the critical frames of a trial.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import ctypes
+import gc
+import os
+import sys
+import threading
+
+from psychopy import core, logging
+
+from feature_binding.config import realtime_defaults
+
+
+class RealtimeMode:
+    """
+    Keep the garbage collector out of the critical frames and give the render thread a core of its own.
+
+    The collector is disabled from the end of fixation to the end of the mask and the young generations are
+    collected as idle work instead; the objects of the setup (stimulus bank, trial plan) are frozen so that full
+    collections do not have to walk them. Collections are counted with gc.callbacks in every mode, so each trial
+    records whether one ran during its critical window even when the mode is off.
+    """
+
+    def __init__(self, settings):
+        """
+
+        :param settings: Realtime settings, see config.realtime_defaults.
+        """
+        self.settings = dict(realtime_defaults, **settings)
+        self.enabled = self.settings['enabled']
+        self.critical = False
+        self.collections = 0  # Collections started since start()
+        self.critical_collections = 0  # Collections started during the current critical window
+        self.affinity = None  # Cores of the render thread before pinning
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self.collections += 1
+            if self.critical:
+                self.critical_collections += 1
+
+    def start(self):
+        """Call once the window and stimuli exist."""
+        gc.callbacks.append(self._on_gc)
+        if not self.enabled:
+            return
+        if self.settings['gc']:
+            gc.collect()
+            gc.freeze()  # The setup objects live for the whole session
+        if self.settings['priority']:
+            core.rush(True)
+        if self.settings['cpu'] is not None:
+            self.pin(self.settings['cpu'])
+
+    def stop(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        if not self.enabled:
+            return
+        gc.enable()
+        gc.unfreeze()
+        if self.settings['priority']:
+            core.rush(False)
+        if self.affinity is not None:
+            self.pin(self.affinity)
+
+    def pin(self, cpus):
+        """
+        Pin the calling (render) thread to a core, or to a set of cores. Only the thread is pinned, so the key
+        collector thread stays free to run on the other cores. Pinning needs a per-thread affinity (Linux and
+        Windows); elsewhere the thread is left to the OS.
+        """
+        cpus = {cpus} if isinstance(cpus, int) else set(cpus)
+        try:
+            if hasattr(os, 'sched_setaffinity'):
+                # On Linux the affinity of a thread id only applies to that thread
+                thread_id = threading.get_native_id()
+                self.affinity = self.affinity or os.sched_getaffinity(thread_id)
+                os.sched_setaffinity(thread_id, cpus)
+            elif sys.platform == 'win32':
+                kernel32 = ctypes.windll.kernel32
+                kernel32.GetCurrentThread.restype = ctypes.c_void_p
+                kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+                kernel32.SetThreadAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+                # Returns the previous mask of the thread, 0 when it failed
+                previous = kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), sum(1 << x for x in cpus))
+                if not previous:
+                    raise ctypes.WinError()
+                self.affinity = self.affinity or {x for x in range(previous.bit_length()) if previous >> x & 1}
+            else:
+                logging.warning('Realtime mode: CPU pinning of a thread is not available on this platform')
+        except (OSError, ValueError) as error:
+            logging.warning(f'Realtime mode: could not pin the render thread to {sorted(cpus)}: {error}')
+
+    def enter_critical(self):
+        """Start of the stimulus alternation."""
+        self.critical = True
+        self.critical_collections = 0
+        if self.enabled and self.settings['gc']:
+            gc.disable()
+
+    def leave_critical(self):
+        """
+        End of the mask.
+
+        :return: Number of collections that started during the critical window.
+        """
+        self.critical = False
+        if self.enabled and self.settings['gc']:
+            gc.enable()
+        return self.critical_collections
+
+    def collect(self, generation=1):
+        """Collect in idle time (blanks and breaks), so the collector has nothing to do during the next trial."""
+        if self.enabled and self.settings['gc']:
+            gc.collect(generation)
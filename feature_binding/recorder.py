@@ -0,0 +1,209 @@
+"""
+Columnar trial store (no PsychoPy needed).
+
+TrialRecorder takes the place of PsychoPy's ExperimentHandler for the trial data: addData, nextEntry and close work
+the same way, but instead of a dictionary of Python objects per row, every column is one preallocated array. The
+numeric and boolean columns of trial_columns are typed arrays; other columns hold object references. addData is an
+index lookup and one array store. The CSV file has the layout the ExperimentHandler wrote: columns in the order
+they were first added, then the session info, every field followed by the delimiter.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import atexit
+import os
+
+import numpy as np
+
+# Column kinds: array type and the value types stored as is; other values turn the column into an object column
+kinds = {'int': (np.int64, (int, np.int64, np.int32)),
+         'float': (np.float64, (float, np.float64)),
+         'bool': (np.bool_, (bool, np.bool_)),
+         'object': (object, None)}
+
+# Columns the trial engine writes with a fixed type; undeclared columns are object columns (stimulus_frame_duration
+# is one: staircases give whole frames as int or float, and the file keeps '7' and '7.0' apart)
+trial_columns = {'trial_number': 'int', 'mask_present': 'bool', 'cycle_number': 'int', 'phase': 'float',
+                 'fixation': 'float', 'fixation_duration': 'float', 'gc_critical': 'int', 'mask_duration': 'float',
+                 'premature_presses': 'int', 'rt': 'float', 'rt_flip': 'float', 'question_onset': 'float',
+                 'accuracy': 'int', 'staircase_trial_num': 'int', 'staircase_reversal': 'bool',
+                 'staircase_reversal_num': 'int', 'staircases_running': 'int', 'reversals_left': 'int',
+                 'trials_left_estimate': 'float'}
+
+
+class Column:
+    """Values of one column and which rows have one."""
+
+    __slots__ = ('name', 'kind', 'accepted', 'values', 'present')
+
+    def __init__(self, name, kind, capacity):
+        self.name = name
+        self.kind = kind
+        dtype, self.accepted = kinds[kind]
+        self.values = np.zeros(capacity, dtype=dtype) if dtype is not object else np.empty(capacity, dtype=object)
+        self.present = np.zeros(capacity, dtype=bool)
+
+    def set(self, row, value):
+        if self.accepted is not None and type(value) not in self.accepted:
+            # Stored as is, so the value is written exactly as it was given
+            self.values = self.values.astype(object)
+            self.kind = 'object'
+            self.accepted = None
+        self.values[row] = value
+        self.present[row] = True
+
+    def grow(self, capacity):
+        values = np.zeros(capacity, dtype=self.values.dtype)
+        values[:len(self.values)] = self.values
+        present = np.zeros(capacity, dtype=bool)
+        present[:len(self.present)] = self.present
+        self.values, self.present = values, present
+
+    def cells(self, n):
+        """Text of the first n rows, quoted as the ExperimentHandler did; empty where a row has no value."""
+        return [cell(value) if present else '' for value, present in
+                zip(self.values[:n].tolist(), self.present[:n].tolist())]
+
+
+def cell(value):
+    text = str(value)
+    if ',' in text or '\n' in text:
+        return f'"{text}"'
+    return text
+
+
+class RecordedRow:
+    """Read-only view of one row of a TrialRecorder."""
+
+    __slots__ = ('recorder', 'row')
+
+    def __init__(self, recorder, row):
+        self.recorder = recorder
+        self.row = row
+
+    def __getitem__(self, name):
+        column = self.recorder.columns[name]
+        if not column.present[self.row]:
+            raise KeyError(name)
+        return column.values[self.row]
+
+    def __contains__(self, name):
+        column = self.recorder.columns.get(name)
+        return column is not None and bool(column.present[self.row])
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def items(self):
+        return [(name, column.values[self.row]) for name, column in self.recorder.columns.items()
+                if column.present[self.row]]
+
+
+class TrialRecorder:
+    """Trial data in typed column arrays, saved as the wide CSV file of a PsychoPy ExperimentHandler."""
+
+    def __init__(self, filename, extra_info, columns=None, capacity=1024, delimiter=','):
+        """
+
+        :param filename: Data file name stem; the data is saved to filename + '.csv'.
+        :param extra_info: Session info added to every finished row; later changes to the dictionary are saved.
+        :param columns: Dictionary of column name -> kind (see kinds); trial_columns by default.
+        :param capacity: Rows allocated up front; the arrays double when they are full.
+        :param delimiter: Field delimiter of the CSV file.
+        """
+        self.filename = filename
+        self.extra_info = extra_info
+        self.schema = dict(trial_columns if columns is None else columns)
+        self.capacity = capacity
+        self.delimiter = delimiter
+        self.columns = {}  # In the order they were first added, the order of the CSV file
+        self.row = 0  # Row addData writes to
+        self.finished = np.zeros(capacity, dtype=bool)  # Rows ended with nextEntry; they get the session info
+        self.closed = False
+        # Save an interrupted session (escape) at exit, as the ExperimentHandler did
+        atexit.register(self.close)
+
+    def reserve(self, rows):
+        """Allocate at least rows rows."""
+        if rows > self.capacity:
+            self.capacity = rows
+            for column in self.columns.values():
+                column.grow(rows)
+            finished = np.zeros(rows, dtype=bool)
+            finished[:len(self.finished)] = self.finished
+            self.finished = finished
+
+    def addData(self, name, value):
+        self.set(self.row, name, value)
+
+    def set(self, row, name, value):
+        """Store the value of column name in row, also in a finished row (addData stores in the current row)."""
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = Column(name, self.schema.get(name, 'object'), self.capacity)
+        column.set(row, value)
+
+    def nextEntry(self):
+        self.finished[self.row] = True
+        self.row += 1
+        if self.row == self.capacity:
+            self.reserve(2 * self.capacity)
+
+    def __len__(self):
+        """Finished rows, and the last row if it has values."""
+        return self.row + any(column.present[self.row] for column in self.columns.values())
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return RecordedRow(self, row)
+
+    def column(self, name):
+        """Values of a column (as stored, whether rows have one or not) and a mask of the rows that have one."""
+        n = len(self)
+        return self.columns[name].values[:n], self.columns[name].present[:n]
+
+    def memory(self):
+        """Bytes of the column arrays (object columns count their references, not the objects)."""
+        return sum(x.values.nbytes + x.present.nbytes for x in self.columns.values()) + self.finished.nbytes
+
+    def save(self, path, sync=False):
+        """Write the CSV file to path; with sync it is on disk when save returns."""
+        n = len(self)
+        names = list(self.columns) + list(self.extra_info)
+        columns = [x.cells(n) for x in self.columns.values()]
+        info = [cell(x) for x in self.extra_info.values()]
+        no_info = [''] * len(info)
+        with open(path, 'w', encoding='utf-8-sig') as data_file:
+            data_file.write(''.join(x + self.delimiter for x in names) + '\n')
+            for row in range(n):
+                fields = [x[row] for x in columns] + (info if self.finished[row] else no_info)
+                data_file.write(''.join(x + self.delimiter for x in fields) + '\n')
+            if sync:
+                data_file.flush()
+                os.fsync(data_file.fileno())
+
+    def checkpoint(self):
+        """
+        Save the rows so far to filename + '.checkpoint' (CSV), replaced in one step, so a session that crashes keeps
+        its data up to the last checkpoint. The checkpoint is removed when the data file is saved.
+        """
+        path = self.filename + '.checkpoint'
+        self.save(path + '.tmp', sync=True)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        """Save the data file once; a file of the same name is kept and the new one gets a number."""
+        if self.closed:
+            return
+        self.closed = True
+        atexit.unregister(self.close)
+        path = self.filename + '.csv'
+        number = 0
+        while os.path.exists(path):
+            number += 1
+            path = f'{self.filename}_{number}.csv'
+        self.save(path)
+        if os.path.exists(self.filename + '.checkpoint'):
+            os.remove(self.filename + '.checkpoint')
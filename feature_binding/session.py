@@ -0,0 +1,184 @@
+"""
+Session setup: monitor, GUI, data files and window, and the entry point the experiment scripts call.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+from psychopy import visual, core, gui, logging, monitors
+from psychopy.hardware import keyboard
+
+from feature_binding import datafiles
+from feature_binding.config import load_config, compile_config, summary
+from feature_binding.datafiles import journal_names
+from feature_binding.engine import TrialEngine
+from feature_binding.idle import IdleScheduler
+from feature_binding.journal import EventJournal, journal_capacity
+from feature_binding.keys import KeyCollector
+from feature_binding.realtime import RealtimeMode
+from feature_binding.sink import DataSink
+from feature_binding.stimuli import StimulusBank
+from feature_binding.telemetry import FrameTelemetry
+
+
+def make_monitor(settings):
+    """Create the monitor object from the monitor settings of the configuration."""
+    mon = monitors.Monitor(settings['name'])
+    mon.setWidth(settings['width_cm'])  # Width of the monitor in cm
+    mon.setSizePix(settings['resolution'])  # Screen resolution in pixels
+    mon.setDistance(settings['distance_cm'])  # Viewing distance in cm
+    return mon
+
+
+def open_data(config, exp_dir):
+    """
+    Ask for the session info, open the data files (see datafiles.open_data) and the log file.
+
+    :param config: Experiment configuration; only its 'exp_name' and 'exp_info' are used.
+    :param exp_dir: Folder of the experiment script; data is saved in its 'data' subfolder.
+    :return: Dictionary with 'exp_info', 'filename' and the TrialRecorder 'recorder'.
+    """
+    exp_info = dict(config['exp_info'])
+    dlg = gui.DlgFromDict(dictionary=exp_info, sortKeys=False, title=config['exp_name'])
+    if not dlg.OK:
+        core.quit()  # user pressed cancel
+    session = datafiles.open_data(config, exp_dir, exp_info)
+
+    # Save a log file for the session summary and warnings; the trial events go to the event journal
+    logging.LogFile(session['filename'] + '.log', level=logging.DATA)
+    return session
+
+
+def open_window(config):
+    """
+    Open the window on the monitor of the configuration.
+
+    :return: Dictionary with 'mon', 'win' and the measured 'frame_rate_detected' (None if it could not be measured).
+    """
+    mon = make_monitor(config['monitor'])
+    win = visual.Window(size=config['monitor']['resolution'], fullscr=True, monitor=mon, screen=0,
+                        color=[0, 0, 0], units='deg')
+
+    # Store frame rate of monitor if we can measure it
+    frame_rate_detected = win.getActualFrameRate()
+
+    # Hide a mouse
+    win.mouseVisible = False
+    return {'mon': mon, 'win': win, 'frame_rate_detected': frame_rate_detected}
+
+
+def open_session(config, exp_dir):
+    """
+    Ask for the session info, open the data files and the window.
+
+    :param config: Experiment configuration; only its 'exp_name', 'exp_info' and 'monitor' are used.
+    :param exp_dir: Folder of the experiment script; data is saved in its 'data' subfolder.
+    :return: Dictionary with 'exp_info', 'filename', 'recorder', 'mon' and 'win'.
+    """
+    session = open_data(config, exp_dir)
+    window = open_window(config)
+    session['exp_info']['frame_rate_detected'] = window['frame_rate_detected']
+    session.update(mon=window['mon'], win=window['win'])
+    return session
+
+
+def session_frame_rate(exp_info):
+    """Refresh rate the configuration is compiled for: the measured one, or the one entered in the GUI."""
+    if exp_info['frame_rate_detected'] is not None:
+        return exp_info['frame_rate_detected']
+    logging.warning('Could not measure the frame rate, using the frame_rate of the session info')
+    return float(exp_info['frame_rate'])
+
+
+def start_presentation(win, config, exp_dir, filename, sink, engine_class=TrialEngine):
+    """
+    Create everything that presents trials in win: stimulus bank, event journal, frame telemetry, key collector,
+    idle scheduler, real-time mode and the trial engine.
+
+    :return: Dictionary with 'bank', 'journal', 'telemetry', 'key_collector', 'idle', 'realtime' and 'engine'.
+    """
+    bank = StimulusBank(win, exp_dir, config['spatial_frequencies'], grating_res=config['grating_res'],
+                        mask=config['mask'], auto_log=False, procedural=config['procedural'],
+                        fit_grating_res=config['fit_grating_res'])
+    textures = bank.texture_memory()
+    if textures['textures']:
+        saved = textures['configured_megabytes'] - textures['megabytes']
+        logging.data(f'Grating textures: {textures["textures"]} at {textures["resolution"]} px, '
+                     f'{textures["megabytes"]:.1f} MB ({saved:.1f} MB less than at grating_res {config["grating_res"]})')
+    warm_up = bank.warm_up(config['frame_rate'])
+    logging.data(f'Warm-up of {len(warm_up["draws"])} stimuli: '
+                 f'{sum(x[0] for x in warm_up["draws"].values()):.1f} ms first draws, '
+                 f'{sum(x[1] for x in warm_up["draws"].values()):.1f} ms second draws')
+    for name in warm_up['slow_first']:
+        logging.data(f'Warm-up: first draw of {name} took {warm_up["draws"][name][0]:.2f} ms')
+    for name in warm_up['outliers']:
+        logging.warning(f'Warm-up: {name} is still slow after warm-up ({warm_up["draws"][name][1]:.2f} ms)')
+
+    # Trial events, timed on the flip clock
+    journal = EventJournal(filename + '.journal', capacity=journal_capacity(config),
+                           clock=logging.defaultClock.getTime)
+    journal.register(journal_names(bank, config))
+    # Every flip, by trial and phase
+    telemetry = FrameTelemetry(filename + '.telemetry', config['frame_rate']) if config['telemetry'] else None
+
+    # Collect left/right/escape presses in the background
+    key_collector = KeyCollector(keyboard.Keyboard(), ['left', 'right', 'escape'])
+    key_collector.start()
+
+    # Bookkeeping only runs in the slack of blank, fixation and response frames
+    idle = sink.idle or IdleScheduler(config['idle_budget_s'])
+    realtime = RealtimeMode(config['realtime'])
+    realtime.start()
+    engine = engine_class(win, bank, key_collector, sink, config, idle, realtime, journal, telemetry)
+    return {'bank': bank, 'journal': journal, 'telemetry': telemetry, 'key_collector': key_collector, 'idle': idle,
+            'realtime': realtime, 'engine': engine}
+
+
+def stop_presentation(presentation):
+    presentation['realtime'].stop()
+    presentation['key_collector'].stop()
+    presentation['journal'].close()
+    if presentation['telemetry'] is not None:
+        presentation['telemetry'].close()
+        logging.data(f'Frame telemetry: {presentation["telemetry"].count} frames in {presentation["telemetry"].path}')
+    logging.data(presentation['idle'].summary())
+    logging.data(f'Garbage collections during the session: {presentation["realtime"].collections}')
+
+
+def run_experiment(config_path, exp_dir, dry_run=False):
+    """
+    Run a complete session of the experiment described by the YAML configuration at config_path. With
+    session.processes 2 the trials are presented by a separate render process (see split).
+
+    :param dry_run: Run the session on a virtual display with a simulated participant instead (see dryrun).
+    :return: The result of run_dry_run for a dry run, otherwise None.
+    """
+    raw_config = load_config(config_path)
+    if dry_run:
+        from feature_binding.dryrun import run_dry_run
+        result = run_dry_run(raw_config, exp_dir)
+        logging.data(f'Dry run data in {result["filename"]}.csv')
+        return result
+    # Fail before the window opens if the configuration cannot be compiled at all
+    if compile_config(raw_config, raw_config['exp_info']['frame_rate'])['processes'] == 2:
+        from feature_binding.split import run_split_experiment
+        run_split_experiment(raw_config, exp_dir)
+        return
+    session = open_session(raw_config, exp_dir)
+    win = session['win']
+
+    # Durations are compiled to frames for the refresh rate of this session
+    config = compile_config(raw_config, session_frame_rate(session['exp_info']))
+    session['exp_info']['frame_rate_compiled'] = config['frame_rate']
+    logging.data(summary(config))
+    for warning in config['warnings']:
+        logging.warning(warning)
+
+    session['recorder'].reserve(config['max_trials'] + 1)
+    sink = DataSink(session['recorder'], idle=IdleScheduler(config['idle_budget_s']))
+    presentation = start_presentation(win, config, exp_dir, session['filename'], sink)
+    presentation['engine'].run()
+
+    sink.close()
+    stop_presentation(presentation)
+    win.close()
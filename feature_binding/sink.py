@@ -0,0 +1,78 @@
+"""
+Data sink: where the trial engine writes its output.
+"""
+
+
+class DataRow:
+    """Column values of one row of the output file."""
+
+    def __init__(self):
+        self.values = {}
+
+    def add(self, name, value):
+        self.values[name] = value
+
+    def add_many(self, values):
+        self.values.update(values)
+
+
+class RecorderRow:
+    """One row of a TrialRecorder, written to like a DataRow."""
+
+    __slots__ = ('recorder', 'row')
+
+    def __init__(self, recorder, row):
+        self.recorder = recorder
+        self.row = row
+
+    def add(self, name, value):
+        self.recorder.set(self.row, name, value)
+
+    def add_many(self, values):
+        for name, value in values.items():
+            self.recorder.set(self.row, name, value)
+
+
+class DataSink:
+    """
+    Write trial data to a TrialRecorder, one row per trial. Values go straight into the current row of the recorder;
+    idle jobs deferred during a trial can still add to its row after the next row is started.
+    """
+
+    def __init__(self, recorder, idle=None):
+        """
+
+        :param recorder: TrialRecorder saving the wide text output.
+        :param idle: Optional IdleScheduler whose deferred jobs add to the rows; they are run before rows are saved.
+        """
+        self.recorder = recorder
+        self.idle = idle
+        self.row = RecorderRow(recorder, recorder.row)
+
+    def add(self, name, value):
+        """Add a column value to the current row."""
+        self.row.add(name, value)
+
+    def add_many(self, values):
+        """Add several column values (a dictionary) to the current row."""
+        self.row.add_many(values)
+
+    def next_entry(self):
+        """
+        Proceed to the next row of the output file. Jobs deferred before this call can still add to the finished
+        row through self.row as it was before the call.
+        """
+        self.recorder.nextEntry()
+        self.row = RecorderRow(self.recorder, self.recorder.row)
+
+    def checkpoint(self):
+        """Finish the deferred jobs and save the rows to the checkpoint file of the recorder."""
+        if self.idle is not None:
+            self.idle.flush()
+        self.recorder.checkpoint()
+
+    def close(self):
+        """Finish the deferred jobs and save the output file."""
+        if self.idle is not None:
+            self.idle.flush()
+        self.recorder.close()
@@ -0,0 +1,220 @@
+"""
+Two-process mode: a render process presents the trials, the control process does everything else.
+
+The render process owns the window, the stimulus bank, the key collector, the event journal and the frame
+telemetry, and only runs TrialEngine's presentation methods (trials, instruction and break screens) on request.
+The control process runs the trial loops (engine.TrialLoops) through ControlEngine: trial selection, staircase and
+allocator updates, the TrialRecorder and the data files. The two exchange trial specs and trial data over
+shared-memory channels.
+While the render process shows the pre-trial blank, the control process does the bookkeeping of the previous trial
+and queues the next trial, so the Python work per frame in the render process does not depend on it.
+
+Used when the session section of the configuration has processes: 2.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import multiprocessing
+import os
+
+from psychopy import core, logging
+
+from feature_binding.channel import Channel, ChannelClosed
+from feature_binding.config import compile_config, summary
+from feature_binding.engine import TrialLoops
+from feature_binding.idle import IdleScheduler
+from feature_binding.session import open_data, open_window, session_frame_rate, start_presentation, \
+    stop_presentation
+from feature_binding.sink import DataRow, DataSink
+
+
+# ==============================================================================
+# RENDER PROCESS
+# ==============================================================================
+class RowSink:
+    """Sink of the render process: collects the data of a trial to send it to the control process."""
+
+    def __init__(self, idle):
+        self.idle = idle
+        self.row = DataRow()
+
+    def add(self, name, value):
+        self.row.add(name, value)
+
+    def add_many(self, values):
+        self.row.add_many(values)
+
+    def checkpoint(self):
+        """The control process saves the rows."""
+
+    def take(self):
+        """Values of the trial so far; the next trial starts a new row."""
+        row, self.row = self.row, DataRow()
+        return row.values
+
+
+def serve(engine, sink, commands, results, control_alive):
+    """
+    Show the screens the control process asks for until it sends 'end'.
+
+    :param engine: TrialEngine of the render process.
+    :param sink: RowSink of engine.
+    :param commands: Channel from the control process.
+    :param results: Channel to the control process.
+    :param control_alive: Function telling whether the control process still runs.
+    """
+    while True:
+        command = commands.receive(control_alive)
+        if command['op'] == 'trial':
+            accuracy = engine.run_trial(command['trial'], record=command['record'], feedback=command['feedback'],
+                                        randomize_phase=command['randomize_phase'], blank=command['blank'])
+            results.send({'accuracy': accuracy, 'data': sink.take()})
+        elif command['op'] == 'blank':
+            engine.show_blank()
+        elif command['op'] == 'number_trial':
+            engine.number_trial(command['number'])
+        elif command['op'] == 'text':
+            engine.display_instr(command['text'])
+            results.send({})
+        elif command['op'] == 'instructions':
+            engine.run_instructions()
+            results.send({})
+        elif command['op'] == 'break':
+            engine.run_break()
+            results.send({})
+        elif command['op'] == 'end':
+            break
+
+
+def render_main(raw_config, exp_dir, filename, command_channel, result_channel):
+    """Entry point of the render process."""
+    os.chdir(exp_dir)
+    commands = Channel(command_channel)
+    results = Channel(result_channel)
+    control_alive = multiprocessing.parent_process().is_alive
+
+    window = open_window(raw_config)
+    results.send({'frame_rate_detected': window['frame_rate_detected']})
+    config = compile_config(raw_config, commands.receive(control_alive)['frame_rate'])
+
+    sink = RowSink(IdleScheduler(config['idle_budget_s']))
+    presentation = start_presentation(window['win'], config, exp_dir, filename, sink)
+    serve(presentation['engine'], sink, commands, results, control_alive)
+
+    stop_presentation(presentation)
+    window['win'].close()
+    commands.close()
+    results.close()
+
+
+# ==============================================================================
+# CONTROL PROCESS
+# ==============================================================================
+class ControlEngine(TrialLoops):
+    """Trial loops and bookkeeping of TrialLoops, with every screen shown by the render process on request."""
+
+    def __init__(self, commands, results, render, sink, config, idle):
+        """
+
+        :param commands: Channel to the render process.
+        :param results: Channel from the render process.
+        :param render: The render multiprocessing.Process.
+        :param sink: DataSink of the session.
+        :param config: Experiment configuration compiled by config.compile_config.
+        :param idle: IdleScheduler of the sink; its jobs run while the render process shows the pre-trial blank.
+        """
+        super().__init__(sink, config, idle)
+        self.commands = commands
+        self.results = results
+        self.render = render
+
+    def request(self, command, prepare=None):
+        """
+        Send a command to the render process and wait for its reply.
+
+        :param prepare: Function run here while the render process works on the command.
+        :return: The reply, and what prepare returned if it is given.
+        """
+        try:
+            self.commands.send(command, self.render.is_alive)
+            prepared = prepare() if prepare is not None else None
+            reply = self.results.receive(self.render.is_alive)
+        except ChannelClosed:
+            # The render process quits on escape
+            logging.warning('The render process has stopped, saving the data')
+            self.sink.close()
+            core.quit()
+        return reply if prepare is None else (reply, prepared)
+
+    def number_trial(self, trial_count):
+        """The render process starts the trial in its journal and telemetry when it gets to it."""
+        self.commands.send({'op': 'number_trial', 'number': trial_count}, self.render.is_alive)
+
+    def display_instr(self, text):
+        self.request({'op': 'text', 'text': text})
+
+    def run_instructions(self):
+        self.request({'op': 'instructions'})
+
+    def run_break(self, prepare=None):
+        """
+        Checkpoint the data here, then the render process shows the break and does its maintenance while the next
+        block is prepared here.
+        """
+        self.sink.checkpoint()
+        if prepare is None:
+            self.request({'op': 'break'})
+            return None
+        return self.request({'op': 'break'}, prepare)[1]
+
+    def show_blank(self):
+        self.commands.send({'op': 'blank'}, self.render.is_alive)
+
+    def pre_trial_blank(self):
+        """The render process shows the blank while the bookkeeping of the previous trial runs here."""
+        self.show_blank()
+        self.idle.flush()
+
+    def run_trial(self, trial, record=True, feedback=False, randomize_phase=False, blank=True):
+        reply = self.request({'op': 'trial', 'trial': trial, 'record': record, 'feedback': feedback,
+                              'randomize_phase': randomize_phase, 'blank': blank})
+        if record:
+            self.sink.add_many(reply['data'])
+        return reply['accuracy']
+
+    def stop(self):
+        self.commands.send({'op': 'end'}, self.render.is_alive)
+        self.render.join()
+
+
+def run_split_experiment(raw_config, exp_dir):
+    """Run a complete session with a render process and a control process (this one)."""
+    session = open_data(raw_config, exp_dir)
+    commands = Channel()
+    results = Channel()
+    render = multiprocessing.get_context('spawn').Process(
+        target=render_main, name='render', daemon=True,
+        args=(raw_config, exp_dir, session['filename'], commands.name, results.name))
+    render.start()
+
+    # Durations are compiled to frames for the refresh rate the render process measured
+    session['exp_info']['frame_rate_detected'] = results.receive(render.is_alive)['frame_rate_detected']
+    config = compile_config(raw_config, session_frame_rate(session['exp_info']))
+    session['exp_info']['frame_rate_compiled'] = config['frame_rate']
+    commands.send({'frame_rate': config['frame_rate']})
+    logging.data(summary(config))
+    for warning in config['warnings']:
+        logging.warning(warning)
+
+    idle = IdleScheduler(config['idle_budget_s'])
+    session['recorder'].reserve(config['max_trials'] + 1)
+    sink = DataSink(session['recorder'], idle=idle)
+    engine = ControlEngine(commands, results, render, sink, config, idle)
+    engine.run()
+    engine.stop()
+
+    sink.close()
+    logging.data(idle.summary())
+    commands.close()
+    results.close()
@@ -0,0 +1,414 @@
+"""
+Staircase used by the adaptive experiments (2 and 3).
+
+Acknowledgments: Special thanks to Nicolas Sanchez-Fuenzalida for sharing the staircase function.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import warnings
+
+import numpy as np
+
+
+# ==============================================================================
+# STAIRCASE
+# ==============================================================================
+class staircaseHandle:
+
+    # Initialize staircase
+    def __init__(self,
+                 start_value: float = 5,
+                 aimed_performance: float = .75,
+                 reversals: list = [5, 25],
+                 step_sizes: list = [1, 1],
+                 power_law: float = 1,
+                 perceived_space: int = None,
+                 min_value_correction: float = 1,
+                 max_value_correction: float = None,
+                 name: str = 'staircase',
+                 siam: bool = True,
+                 custom_payoff_matrix: dict = None) -> object:
+        """
+
+        :param start_value: Value for first trial.
+        :param aimed_performance: Expected hit-rate (0-1) for estimated threshold.
+        :param reversals: Number of reversals to run before staircase ends. First reversals are discarded
+                            when calculating the threshold.
+        :param step_sizes: Step sizes to use for each number of reversals.
+        :param power_law: Transformation to apply on staircased value (staircase_value ** power_law). Set to 1 when
+                            perceived and absolute value is equal.
+        :param perceived_space: Use this to make the step size a fraction of the current perceived staircase_value
+                            (step_size = (staircase_value**power_law) / perceived_space). Set to None to use step_sizes
+                            as absolute values.
+        :param min_value_correction: staircase_value cannot go below this value
+        :param max_value_correction: staircase_value cannot go above this value
+        :param name: Staircase name for logging or for when you run multiple staircases
+        :param siam: Use Kaernbach, C. (1990) single‐interval adjustment‐matrix (SIAM).
+        :param custom_payoff_matrix: Alternative any contignency table can be feeded to inform the step sizes. This
+                                        should be a dictionary (e.g. {'hit': -1, 'miss': 4, 'fa': 5, 'cr': 0})
+                                        indicating each step size. Feeding a custom payoff matrix will override
+                                        the siam argument.
+        """
+
+        # Set defaults
+        if reversals is None:
+            reversals = [5, 15]
+        if step_sizes is None:
+            step_sizes = [1, .5]
+
+        # Save inputs
+        self.name = name
+        self.dv = start_value  # Staircase start value
+        self.p = aimed_performance  # Goal hit-rate
+        self.reversals = reversals  # Total reversals
+        self.step_sizes = step_sizes  # Step sizes for first and second phase
+        self.current_step_size = self.step_sizes[0]  # Assign first step size
+        self.powers_law = power_law  # Power law to transform to perceived scale
+        self.perceived_space = perceived_space
+        self.min_corr = min_value_correction
+        self.max_corr = max_value_correction
+        self.siam = siam
+        # Trackers
+        self.phase = 0  # Only reversal values in phase 2 are used to get threshold
+        self.dvs = []  # Track all staircased values
+        self.dvs_on_rev = []  # Track staircased values on reversals
+        self.trial_number = 0  # Trial counter
+        self.revn = 0  # Reversal counter
+        self.reversal_on_trial = []  # Reversal trial
+        self.is_correct_track = []  # Track corr/incorr booleans
+        self.stim_track = []  # Track corr/incorr booleans
+        # Indicators
+        self.staircase_over = False  # Staircase over?
+        self.first_trial = True  # Is first trial?
+
+        # Last ans trackers
+        self.previous_is_correct = None
+        self.isRev = False
+
+        # SIAM Adjustment matrix =====================================
+        # These contingency tables (except for 85) are taken from Table 1 in Kaernbach, C. (1990).
+        # A single‐interval adjustment‐matrix (SIAM) procedure for unbiased adaptive testing. The
+        # Journal of the Acoustical Society of America, 88(6), 2645–2655. https://doi.org/10.1121/1.399985
+        self.payoff_matrices = {
+            '25': {'hit': -3, 'miss': 1, 'fa': 4, 'cr': 0},
+            '33': {'hit': -2, 'miss': 1, 'fa': 3, 'cr': 0},
+            '50': {'hit': -1, 'miss': 1, 'fa': 2, 'cr': 0},
+            '66': {'hit': -1, 'miss': 2, 'fa': 3, 'cr': 0},
+            '75': {'hit': -1, 'miss': 3, 'fa': 4, 'cr': 0},
+            '85': {'hit': -1, 'miss': 4, 'fa': 5, 'cr': 0}
+        }
+
+        # Either use SIAM payoff matrices defined above
+        if siam:
+            self.payoffs = self.payoff_matrices[str(int(aimed_performance * 100))]
+        else:
+            # In principle this gets you proportionally the same values as in the
+            # SIAM procedure above. The only difference seems to be that all values
+            # are increased until there are no decimal step sizes. So, for example,
+            # when the aimed hit-rate is .25 you multiply all values by 3 to get
+            # the step sizes in the SIAM procedure
+            self.payoffs = {'hit': -1, 'miss': aimed_performance / (1 - aimed_performance),
+                            'fa': 1 / (1 - aimed_performance), 'cr': 0}
+
+        # Set custom payoff matrix
+        if isinstance(custom_payoff_matrix, dict):
+            self.payoffs = custom_payoff_matrix
+            warnings.warn('custom_payoff_matrix detected, overriding SIAM argument.')
+
+    def new_trial(self, is_correct: bool, stim: bool):
+        """
+
+        :param is_correct: Was the current trial correct?
+        :param stim: Was the target present? Alternatively this can be used for category A
+                        and B in discrimination settings.
+        """
+        # If staircase not over -----------------------------
+        if not self.staircase_over:
+
+            # Update trial count and save current dv
+            self.trial_number += 1  # trial number
+            self.dvs.append(self.dv)  # track value of current trial
+
+            # track is correct
+            self.is_correct_track.append(is_correct)
+            self.stim_track.append(stim)
+
+            # Check if first trial -----------------------------
+
+            # In the first trial we can't check for reversals
+            # because there are no previous trials.
+            if not self.first_trial:
+
+                # Check if reversal -----------------------
+                if is_correct != self.previous_is_correct:
+                    self.isRev = True
+                    # reversal counter
+                    self.revn += 1
+                    # log trial with reversal
+                    self.reversal_on_trial.append(self.trial_number)
+                    # Only record values when in the second phase
+                    if self.phase == 1:
+                        # append dev value on reversal
+                        self.dvs_on_rev.append(self.dv)
+                else:
+                    self.isRev = False
+
+            # Confusion matrix label. This is used to get the step size
+            if is_correct:
+                if stim:
+                    conf_mat = 'hit'
+                else:
+                    conf_mat = 'cr'
+            else:
+                if stim:
+                    conf_mat = 'miss'
+                else:
+                    conf_mat = 'fa'
+
+            # Update dv -----------------------------------------
+
+            # Convert contrast to perceived contrast
+            perceived = self.dv ** self.powers_law
+
+            # When perceived_space is set the step_size is a fraction of the current
+            # perceived staircase value. This is handy when the perceived scale of
+            # the value being staircased is not linear. Otherwise, step_size is set to 1
+            # so step_sizes are use as absolute values.
+            if self.perceived_space is None:
+                # Add linear step size to perceived space dv
+                step_size = 1
+            else:
+                # Calculate step size based on current value
+                step_size = perceived / self.perceived_space
+
+            # Update value
+            perceived_new = perceived + (self.payoffs[conf_mat] * self.current_step_size) * step_size
+
+            # Convert new perceived to contrast space
+            self.dv = perceived_new ** (1 / self.powers_law)
+
+            # Min/max corrections
+            if self.min_corr or self.min_corr == 0:
+                if self.dv < self.min_corr: self.dv = self.min_corr
+            if self.max_corr:
+                if self.dv > self.max_corr: self.dv = self.max_corr
+
+            # if max. number of reversals end staircase
+            if self.revn >= sum(self.reversals):
+                self.staircase_over = True
+
+            # if first portion of reversals done continue to second phase
+            if self.revn >= self.reversals[0]:
+                self.phase = 1
+                self.current_step_size = self.step_sizes[self.phase]
+
+            # first trial over
+            self.first_trial = False
+            # store last correct/incorrect answer
+            self.previous_is_correct = is_correct
+
+    def get_threshold(self):
+        """
+        The staircase threshold can be calculated only when all the reversals are done. Alternatively, set
+        staircase.staircase_over = True and then call staircase.get_threshold().
+
+        :return: Staircase threshold.
+        """
+
+        if self.staircase_over:
+            return np.median(self.dvs_on_rev)
+        else:
+            return 'Staircase is not over.'
+
+    def print_staircase(self):
+        # Print staircase info to console, use after calling new_trial
+
+        print('\n###############################\n')
+        print(self.name)
+        print('Trial number: ' + str(self.trial_number))
+        print('Current trial is correct: ' + str(self.previous_is_correct))
+        print('Current dv value: ' + str(round(self.dv, 5)))
+        print('Reversal count: ' + str(self.revn))
+        print('Phase: ' + str(self.phase))
+        print('Staircase over? ' + str(self.staircase_over))
+        print('\n###############################\n')
+
+
+# ==============================================================================
+# STAIRCASE REGISTRY
+# ==============================================================================
+class StaircaseRegistry:
+    """
+    Exactly one staircase per condition cell, with a convergence summary that is updated on every trial instead
+    of being recomputed over all staircases.
+    """
+
+    def __init__(self):
+        self.stairs = {}  # Condition cell (tuple) -> staircase
+        self.names = {}  # Staircase name -> condition cell
+        self.reversals_left = {}  # Condition cell -> reversals until the staircase is over
+        self.total_reversals_left = 0
+        self.total_trials = 0  # Trials and reversals of all staircases, for the pooled trials per reversal
+        self.total_reversals = 0
+        self.n_running = 0
+
+    def add(self, cell, stair):
+        """Register the staircase of a condition cell; a cell or name can only be registered once."""
+        cell = tuple(cell)
+        if cell in self.stairs:
+            raise ValueError(f'Condition {list(cell)} already has the staircase {self.stairs[cell].name!r}')
+        if stair.name in self.names:
+            raise ValueError(f'Staircase name {stair.name!r} is used by conditions {list(self.names[stair.name])} '
+                             f'and {list(cell)}')
+        self.stairs[cell] = stair
+        self.names[stair.name] = cell
+        self.reversals_left[cell] = 0 if stair.staircase_over else sum(stair.reversals) - stair.revn
+        self.total_reversals_left += self.reversals_left[cell]
+        self.total_trials += stair.trial_number
+        self.total_reversals += stair.revn
+        if not stair.staircase_over:
+            self.n_running += 1
+
+    def require(self, cells):
+        """Raise ValueError unless the registered cells are exactly cells."""
+        cells = set(tuple(x) for x in cells)
+        missing = cells - set(self.stairs)
+        extra = set(self.stairs) - cells
+        if missing or extra:
+            raise ValueError(f'Staircases missing for {sorted(missing)}, without condition for {sorted(extra)}')
+
+    def __getitem__(self, cell):
+        return self.stairs[tuple(cell)]
+
+    def __len__(self):
+        return len(self.stairs)
+
+    def items(self):
+        return self.stairs.items()
+
+    @property
+    def all_over(self):
+        return self.n_running == 0
+
+    def update(self, cell, is_correct, stim=True):
+        """Pass the response of a trial to the staircase of cell and update the summary."""
+        stair = self.stairs[tuple(cell)]
+        if stair.staircase_over:
+            return
+        trial_number, revn = stair.trial_number, stair.revn
+        stair.new_trial(is_correct=is_correct, stim=stim)
+        self.total_trials += stair.trial_number - trial_number
+        self.total_reversals += stair.revn - revn
+        self.set_reversals_left(tuple(cell), 0 if stair.staircase_over else sum(stair.reversals) - stair.revn)
+        if stair.staircase_over:
+            self.n_running -= 1
+
+    def set_reversals_left(self, cell, reversals_left):
+        self.total_reversals_left += reversals_left - self.reversals_left[cell]
+        self.reversals_left[cell] = reversals_left
+
+    def end(self, cell):
+        """End the staircase of cell, e.g. when its trials run out."""
+        stair = self.stairs[tuple(cell)]
+        if not stair.staircase_over:
+            stair.staircase_over = True
+            self.set_reversals_left(tuple(cell), 0)
+            self.n_running -= 1
+
+    def end_all(self):
+        """End every staircase that is still running, e.g. when the trial list runs out."""
+        for cell in self.stairs:
+            self.end(cell)
+
+    def trials_per_reversal(self, cell=None):
+        """Trials per reversal of the staircase of cell, or pooled over all staircases before its first reversal."""
+        if cell is not None:
+            stair = self.stairs[tuple(cell)]
+            if stair.revn:
+                return stair.trial_number / stair.revn
+        if self.total_reversals:
+            return self.total_trials / self.total_reversals
+        # SIAM at 75%: a response differs from the previous one on 2 * .75 * .25 of the trials
+        return 1 / (2 * .75 * .25)
+
+    def trials_left(self, cell=None):
+        """Estimated trials until the staircase of cell, or every staircase, is over."""
+        if cell is not None:
+            return self.reversals_left[tuple(cell)] * self.trials_per_reversal(cell)
+        return self.total_reversals_left * self.trials_per_reversal()
+
+    def summary(self):
+        return {'staircases_running': self.n_running,
+                'reversals_left': self.total_reversals_left,
+                'trials_left_estimate': round(self.trials_left(), 1)}
+
+
+# ==============================================================================
+# CONDITION SCHEDULER
+# ==============================================================================
+class ConditionScheduler:
+    """
+    Pick the condition of the next trial among the staircases that are still running, weighted by their
+    reversals left, and never the same condition more than max_repeats times in a row (unless it is the only one
+    left). Each condition runs its own planned trials, so the balanced colors, orientations and visual fields of
+    the trial plan are kept.
+    """
+
+    def __init__(self, stairs, trial_plan, max_repeats=3):
+        """
+
+        :param stairs: StaircaseRegistry of the conditions.
+        :param trial_plan: Planned trials (see config.make_trial_plan); their number per condition is the most
+                           trials its staircase can get.
+        :param max_repeats: Most trials of the same condition in a row.
+        """
+        self.stairs = stairs
+        self.max_repeats = max_repeats
+        self.queues = {}  # Condition cell -> planned trials left
+        for trial in trial_plan:
+            self.queues.setdefault(tuple(trial['condition']), []).append(trial)
+        self.last_cell = None
+        self.repeats = 0
+
+    def trials_left(self, cell):
+        return len(self.queues[tuple(cell)])
+
+    def active_cells(self):
+        return [x for x, queue in self.queues.items() if queue and not self.stairs[x].staircase_over]
+
+    def next_trial(self):
+        """Planned trial of the next condition, or None when no staircase is running."""
+        cells = self.active_cells()
+        if not cells:
+            return None
+        if self.repeats >= self.max_repeats and len(cells) > 1 and self.last_cell in cells:
+            cells.remove(self.last_cell)
+
+        # Staircases far from converging are drawn more often
+        weights = np.array([self.stairs.reversals_left[x] for x in cells], dtype=float)
+        if not weights.sum():
+            weights[:] = 1
+        cell = cells[np.random.choice(len(cells), p=weights / weights.sum())]
+
+        self.repeats = self.repeats + 1 if cell == self.last_cell else 1
+        self.last_cell = cell
+        return self.queues[cell].pop()
+
+
+# Function to log staircase
+def log_staircase_info(sink, stair):
+    sink.add('staircase_dv', stair.dv)
+    sink.add('staircase_trial_num', stair.trial_number)
+    sink.add('staircase_previous_correct', stair.previous_is_correct)
+    sink.add('staircase_phase', stair.phase)
+    sink.add('staircase_step_size', stair.current_step_size)
+    sink.add('staircase_powers_law', stair.powers_law)
+    sink.add('staircase_siam', stair.siam)
+    sink.add('staircase_over', stair.staircase_over)
+    sink.add('staircase_name', stair.name)
+    sink.add('staircase_conv_p', stair.p)
+    # Step sizes
+    sink.add('staircase_step_hit', stair.payoffs['hit'])
+    sink.add('staircase_step_miss', stair.payoffs['miss'])
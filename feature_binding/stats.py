@@ -0,0 +1,257 @@
+"""
+Statistics of the experiments (no PsychoPy needed).
+
+Runs the repeated-measures ANOVAs of the JASP analyses directly on the wide tables in data/: F tests with
+Mauchly's test and Greenhouse-Geisser and Huynh-Feldt corrections, Holm-corrected paired post-hoc comparisons
+of the main effects, a sign-flip permutation test of every effect and bootstrap confidence intervals of the effect
+sizes. Permutations and bootstrap samples are tested as one batch of arrays; rm_anova takes any number of leading
+data-set dimensions for that (and for the simulated studies of power).
+
+    python -m feature_binding.stats                 # every table
+    python -m feature_binding.stats exp3 --resamples 20000
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import csv
+import itertools
+import os
+import time
+
+import numpy as np
+from scipy import stats
+
+# Wide tables in data/: factors and their levels; columns join one level per factor with '_'
+tables = {
+    'exp1': {'table': 'exp1.csv', 'factors': ['SF', 'Cycles'],
+             'levels': [['Low', 'High'], ['1', '2', '3', '4', '8', '16', '32', '64']]},
+    'exp1_mask': {'table': 'exp1_mask.csv', 'factors': ['SF', 'Mask'],
+                  'levels': [['Low', 'High'], ['FALSE', 'TRUE']]},
+    'exp2': {'table': 'exp2.csv', 'factors': ['SF', 'Cycles'],
+             'levels': [['Low', 'High'], ['1', '2', '3', '4']]},
+    'exp3': {'table': 'exp3.csv', 'factors': ['SF', 'Cycles', 'Mask'],
+             'levels': [['Low', 'Medium', 'High'], ['1', '2', '3'], ['Low', 'High']]},
+}
+
+
+def read_table(name, data_dir):
+    """Values of the participants without missing cells (as na.omit in the analysis): participants x levels..."""
+    table = tables[name]
+    with open(os.path.join(data_dir, table['table']), newline='', encoding='utf-8-sig') as table_file:
+        rows = list(csv.DictReader(table_file))
+    columns = ['_'.join(x) for x in itertools.product(*table['levels'])]
+    data = np.array([[float(row[x]) if row[x] not in ('', 'NA') else np.nan for x in columns] for row in rows])
+    data = data[~np.isnan(data).any(axis=1)]
+    return data.reshape((len(data),) + tuple(len(x) for x in table['levels']))
+
+
+# ==============================================================================
+# REPEATED-MEASURES ANOVA
+# ==============================================================================
+def contrasts(levels):
+    """Orthonormal contrasts between levels (levels - 1 x levels)."""
+    helmert = np.zeros((levels - 1, levels))
+    for i in range(1, levels):
+        helmert[i - 1, :i] = 1
+        helmert[i - 1, i] = -i
+    return helmert / np.linalg.norm(helmert, axis=1, keepdims=True)
+
+
+def effect_scores(data, effect, n_factors):
+    """
+    Scores of every participant on the orthonormal contrasts of an effect; the other factors are summed with
+    weight 1 / sqrt(levels), so that sums of squares of the scores are those of the univariate ANOVA.
+
+    :param data: Array ... x participants x levels of factor 1 x ... x levels of factor n_factors.
+    :param effect: Tuple of factor indices, e.g. (0,) for the first main effect or (0, 1) for their interaction.
+    :return: Array ... x participants x degrees of freedom of the effect.
+    """
+    scores = data
+    for factor in range(n_factors):
+        axis = scores.ndim - n_factors + factor
+        levels = scores.shape[axis]
+        weights = contrasts(levels) if factor in effect else np.ones((1, levels)) / np.sqrt(levels)
+        scores = np.moveaxis(np.tensordot(scores, weights, axes=([axis], [1])), -1, axis)
+    return scores.reshape(scores.shape[:scores.ndim - n_factors] + (-1,))
+
+
+def effects(factors):
+    """Every effect of a full factorial design as (name, factor indices), main effects first."""
+    return [(':'.join(factors[x] for x in effect), effect)
+            for size in range(1, len(factors) + 1) for effect in itertools.combinations(range(len(factors)), size)]
+
+
+def f_statistic(scores):
+    """F, sums of squares and degrees of freedom of effect scores (... x participants x df)."""
+    n, df = scores.shape[-2:]
+    mean = scores.mean(axis=-2)
+    ss_effect = n * (mean ** 2).sum(axis=-1)
+    ss_error = ((scores - mean[..., None, :]) ** 2).sum(axis=(-2, -1))
+    df_error = df * (n - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = (ss_effect / df) / (ss_error / df_error)
+    return f, ss_effect, ss_error, df, df_error
+
+
+def sphericity(scores):
+    """
+    Mauchly's test and the Greenhouse-Geisser and Huynh-Feldt (Lecoutre) epsilons of effect scores.
+
+    :return: Dictionary with 'W', 'p_mauchly', 'gg' and 'hf' (arrays over the leading dimensions).
+    """
+    n, df = scores.shape[-2:]
+    centered = scores - scores.mean(axis=-2, keepdims=True)
+    covariance = np.swapaxes(centered, -1, -2) @ centered / (n - 1)
+    trace = np.trace(covariance, axis1=-2, axis2=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gg = trace ** 2 / (df * np.trace(covariance @ covariance, axis1=-2, axis2=-1))
+        hf = np.minimum(((n + 1) * df * gg - 2) / (df * (n - 1 - df * gg)), 1)
+        w = np.linalg.det(covariance) / (trace / df) ** df
+        chi2 = -(n - 1 - (2 * df ** 2 + df + 2) / (6 * df)) * np.log(w)
+    p_mauchly = stats.chi2.sf(chi2, df * (df + 1) / 2 - 1) if df > 1 else np.ones_like(w)
+    return {'W': w, 'p_mauchly': p_mauchly, 'gg': gg, 'hf': hf}
+
+
+def rm_anova(data, factors):
+    """
+    Repeated-measures ANOVA of a full within-participant design.
+
+    :param data: Array ... x participants x levels of every factor; leading dimensions are independent data sets.
+    :param factors: Names of the factors, one per level dimension.
+    :return: Dictionary effect name ('SF', 'SF:Cycles', ...) -> dictionary with 'F', 'df', 'df_error', 'p',
+             'eta_p2' (partial eta squared), Mauchly's 'W' and 'p_mauchly', the epsilons 'gg' and 'hf' and the
+             corrected 'p_gg' and 'p_hf' (arrays over the leading dimensions).
+    """
+    results = {}
+    for name, effect in effects(factors):
+        scores = effect_scores(data, effect, len(factors))
+        f, ss_effect, ss_error, df, df_error = f_statistic(scores)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = {'F': f, 'df': df, 'df_error': df_error, 'p': stats.f.sf(f, df, df_error),
+                      'eta_p2': ss_effect / (ss_effect + ss_error)}
+        result.update(sphericity(scores))
+        result['p_gg'] = stats.f.sf(f, df * result['gg'], df_error * result['gg'])
+        result['p_hf'] = stats.f.sf(f, df * result['hf'], df_error * result['hf'])
+        results[name] = result
+    return results
+
+
+# ==============================================================================
+# POST HOC
+# ==============================================================================
+def holm(p_values):
+    """Holm-Bonferroni adjusted p-values."""
+    p_values = np.asarray(p_values)
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate((len(p_values) - np.arange(len(p_values))) * p_values[order])
+    result = np.empty_like(adjusted)
+    result[order] = np.minimum(adjusted, 1)
+    return result
+
+
+def post_hoc(data, factors, levels):
+    """
+    Paired t-tests between the levels of every main effect, on participant means over the other factors,
+    Holm-corrected within each factor.
+
+    :return: List of dictionaries with 'factor', 'contrast', 'mean_difference', 't', 'df', 'p' and 'p_holm'.
+    """
+    rows = []
+    for factor, name in enumerate(factors):
+        other = tuple(1 + x for x in range(len(factors)) if x != factor)
+        means = data.mean(axis=other)  # participants x levels
+        factor_rows = []
+        for a, b in itertools.combinations(range(means.shape[1]), 2):
+            difference = means[:, a] - means[:, b]
+            t, p = stats.ttest_rel(means[:, a], means[:, b])
+            factor_rows.append({'factor': name, 'contrast': f'{levels[factor][a]} - {levels[factor][b]}',
+                                'mean_difference': difference.mean(), 't': t, 'df': len(difference) - 1, 'p': p})
+        for row, p_holm in zip(factor_rows, holm([x['p'] for x in factor_rows])):
+            row['p_holm'] = p_holm
+        rows += factor_rows
+    return rows
+
+
+# ==============================================================================
+# RESAMPLING
+# ==============================================================================
+def permutation_test(data, factors, resamples=10000, seed=0):
+    """
+    Sign-flip permutation test of every effect. Under the null hypothesis of an effect the contrast scores of a
+    participant are symmetric around zero, so flipping their sign per participant gives the null distribution of F.
+    All sign patterns are tested as one array.
+
+    :return: Dictionary effect name -> permutation p-value.
+    """
+    rng = np.random.default_rng(seed)
+    signs = rng.choice([-1.0, 1.0], size=(resamples, data.shape[0], 1))
+    p_values = {}
+    for name, effect in effects(factors):
+        scores = effect_scores(data, effect, len(factors))
+        observed = f_statistic(scores)[0]
+        permuted = f_statistic(signs * scores[None])[0]
+        p_values[name] = (1 + (permuted >= observed).sum()) / (resamples + 1)
+    return p_values
+
+
+def bootstrap(data, factors, resamples=10000, seed=0, confidence=0.95):
+    """
+    Percentile bootstrap over participants of the partial eta squared of every effect; all bootstrap samples are
+    tested as one array.
+
+    :return: Dictionary effect name -> (lower, upper) confidence limits.
+    """
+    rng = np.random.default_rng(seed)
+    samples = data[rng.integers(0, data.shape[0], size=(resamples, data.shape[0]))]
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name, effect in effects(factors):
+        _, ss_effect, ss_error, _, _ = f_statistic(effect_scores(samples, effect, len(factors)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            eta_p2 = ss_effect / (ss_effect + ss_error)
+        intervals[name] = tuple(np.nanpercentile(eta_p2, [tail, 100 - tail]))
+    return intervals
+
+
+# ==============================================================================
+# REPORT
+# ==============================================================================
+def analyse(name, data_dir, resamples=10000, seed=0):
+    """Every statistic of a table as printable lines."""
+    table = tables[name]
+    data = read_table(name, data_dir)
+    anova = rm_anova(data, table['factors'])
+    permutation = permutation_test(data, table['factors'], resamples, seed)
+    intervals = bootstrap(data, table['factors'], resamples, seed)
+
+    lines = [f'{name} ({table["table"]}, {len(data)} participants)',
+             f'  {"effect":<16}{"F":>8}{"df":>8}{"p":>9}{"p GG":>9}{"p HF":>9}{"GG eps":>8}{"Mauchly p":>11}'
+             f'{"p perm":>9}{"eta_p2":>8}{"95% CI":>16}']
+    for effect, result in anova.items():
+        lower, upper = intervals[effect]
+        lines.append(f'  {effect:<16}{result["F"]:>8.2f}{result["df"]:>3},{result["df_error"]:>4}'
+                     f'{result["p"]:>9.4f}{result["p_gg"]:>9.4f}{result["p_hf"]:>9.4f}{result["gg"]:>8.3f}'
+                     f'{result["p_mauchly"]:>11.4f}{permutation[effect]:>9.4f}{result["eta_p2"]:>8.3f}'
+                     f'   [{lower:.3f}, {upper:.3f}]')
+    lines.append('  post hoc (paired t-tests, Holm within factor)')
+    for row in post_hoc(data, table['factors'], table['levels']):
+        lines.append(f'    {row["factor"]:<8}{row["contrast"]:<16}{row["mean_difference"]:>9.3f}'
+                     f'  t({row["df"]}) = {row["t"]:>6.2f}  p = {row["p"]:.4f}  p_holm = {row["p_holm"]:.4f}')
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Repeated-measures statistics of the experiments.')
+    parser.add_argument('tables', nargs='*', default=list(tables), help='Tables to analyse')
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(__file__), '..', 'data'),
+                        help='Folder with the data tables')
+    parser.add_argument('--resamples', type=int, default=10000, help='Permutations and bootstrap samples')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.time()
+    for table_name in args.tables:
+        print('\n'.join(analyse(table_name, args.data, args.resamples, args.seed)) + '\n')
+    print(f'{len(args.tables)} tables in {time.time() - started:.1f} s')
@@ -0,0 +1,330 @@
+"""
+Stimulus bank: every visual component of the paradigm, created once per window.
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import os
+import time
+
+import numpy as np
+from psychopy import visual
+from psychopy.tools.colorspacetools import hsv2rgb
+from psychopy.tools.monitorunittools import deg2pix
+
+from feature_binding import design
+
+# Practice examples: name -> position of the image on the instruction screen
+example_positions = {'black_right_up': (-2.5, -2), 'white_left_up': (2.5, -2),
+                     'black_left_up': (-2.5, -2), 'white_right_up': (2.5, -2),
+                     'black_right_down': (-2.5, -2), 'white_left_down': (2.5, -2),
+                     'black_left_down': (-2.5, -2), 'white_right_down': (2.5, -2)}
+
+# Vertical position of the stimuli in each visual field
+field_positions = {'up': 0.3, 'down': -0.3}
+
+# Diameter of the gratings, of the discs the wedge covers are cut from and height of the fixation cross in deg
+grating_size = 2.178
+cover_size = 4
+fixation_height = 0.4
+
+# Pixels added around the rectangle of a composite for the cover outlines and antialiased edges
+bake_margin = 2
+
+# Texels per screen pixel of grating textures fitted to the monitor
+grating_texture_margin = 2
+
+# A component is still slow after warm-up when its second draw takes longer than this many times the median
+warm_up_outlier_ratio = 3
+warm_up_outlier_ms = 0.5  # ... and more than this
+
+
+def gl_finish():
+    """Wait until the GPU has executed every command, so a draw can be timed."""
+    try:
+        from pyglet import gl
+    except ImportError:
+        return
+    gl.glFinish()
+
+
+def grating_texture(grating, color):
+    """
+    RGB texture of a black or white square-wave grating on a gray background.
+
+    :param grating: Output of visual.filters.makeGrating, values between -1 and 1.
+    :param color: 'black' or 'white'.
+    """
+    hsv_texture = np.zeros(grating.shape + (3,))
+    if color == 'white':
+        hsv_texture[..., 0] = 1
+        hsv_texture[..., 2] = (grating + 1) / 2.0 * 0.5 + 0.5  # Saturation stays 0 for white
+    else:
+        hsv_texture[..., 2] = (grating + 1) / 2.0 * 0.5
+    return hsv2rgb(hsv_texture)
+
+
+def fitted_grating_res(mon, size, cycles, margin=grating_texture_margin):
+    """
+    Smallest power-of-two texture resolution for a grating of size deg on mon: margin texels per screen pixel, so
+    that nearest sampling keeps the bar edges within a pixel, and at least 2 * margin texels per grating cycle (the
+    Nyquist limit with the same margin).
+
+    :param mon: PsychoPy monitor of the window (width, distance and size in pixels).
+    :param size: Diameter of the grating in deg.
+    :param cycles: Largest number of grating cycles in the texture.
+    """
+    needed = max(deg2pix(size, mon), 2 * cycles) * margin
+    return int(2 ** np.ceil(np.log2(needed)))
+
+
+def texture_megabytes(res, count):
+    """Memory of count grating textures of res x res texels, uploaded by PsychoPy as 32-bit float RGB."""
+    return count * res ** 2 * 3 * 4 / 2 ** 20
+
+
+class StimulusBank:
+    """
+    Create the fixation cross, gratings, wedge covers, masks and text screens for one window and look the
+    gratings up by trial parameters instead of by variable name.
+    """
+
+    def __init__(self, win, stimulus_dir, spatial_frequencies, grating_res=512, mask=None, auto_log=True,
+                 procedural=False, fit_grating_res=False):
+        """
+
+        :param win: PsychoPy window to draw in.
+        :param stimulus_dir: Folder with the example images (and the mask images of image masks).
+        :param spatial_frequencies: Dictionary of SF name -> number of grating cycles in the texture
+                                    (e.g. {'low': 1, 'high': 5}).
+        :param grating_res: Resolution of the grating textures.
+        :param mask: Mask settings. {'kind': 'noise'} for the white noise masks above and below the stimuli,
+                     {'kind': 'image', 'directory': ..., 'size': ..., 'images': {mask_type: [names]}} for the
+                     texturized image masks.
+        :param auto_log: Let PsychoPy log every attribute change of the components drawn in the frame loops. The
+                         event journal logs the trial events instead.
+        :param procedural: Compute the gratings and their half-disc apertures in a shader (see procedural) instead
+                           of drawing grating_res textures behind the wedge covers.
+        :param fit_grating_res: Fit the resolution of the grating textures to the monitor of win (see
+                                fitted_grating_res) instead of using grating_res.
+        """
+        self.win = win
+        self.stimulus_dir = stimulus_dir
+        self.spatial_frequencies = spatial_frequencies
+        self.grating_res = grating_res
+        self.configured_grating_res = grating_res
+        self.procedural = procedural
+        if fit_grating_res and not procedural:
+            self.grating_res = fitted_grating_res(win.monitor, grating_size, max(spatial_frequencies.values()))
+        self.mask_settings = mask or {'kind': 'noise'}
+
+        # Fixation cross
+        self.fix = visual.TextStim(win, text="+", color='black', units='deg', height=fixation_height, pos=(0, 0))
+
+        self._make_wedge_covers()
+        if procedural:
+            self._make_procedural_gratings()
+        else:
+            self._make_gratings()
+        self._make_masks()
+        self._make_text()
+        self._make_examples()
+
+        for component in self.frame_components():
+            component.autoLog = auto_log
+
+    # ==============================================================================
+    # STIMULI CREATION
+    # ==============================================================================
+    def _make_wedge_covers(self):
+        # Covers in the color of the background used to cover one part of the circle and get a semicircle.
+        # The 'down' cover hides the upper half and the 'up' cover the lower half.
+        self.wedge_covers = {}
+        for visual_field, vertices in zip(['down', 'up'], [slice(65, 128), slice(None, 65)]):
+            cover = visual.Polygon(
+                win=self.win, name=f'wedge_cover_{visual_field}',
+                edges=128, size=(cover_size, cover_size),
+                ori=90.0, pos=(0, field_positions[visual_field]),
+                lineWidth=1.0, colorSpace='rgb', lineColor=[0, 0, 0], fillColor=[0, 0, 0],
+                opacity=None, interpolate=True)
+            cover.vertices = cover.vertices[vertices]
+            cover.needVertexUpdate = True
+            self.wedge_covers[visual_field] = cover
+
+    def _make_gratings(self):
+        # One grating per color, SF, orientation and visual field; each stimulus is the grating with its cover
+        self.gratings = {}
+        self.stimuli = {}
+        for sf, cycles in self.spatial_frequencies.items():
+            grating = visual.filters.makeGrating(res=self.grating_res, cycles=cycles, gratType='sqr')
+            for color in design.colors:
+                texture = grating_texture(grating, color)
+                for orientation in design.orientations:
+                    for visual_field in design.visual_fields:
+                        name = f'{color}_{sf}_{orientation}_{visual_field}'
+                        self.gratings[name] = visual.GratingStim(
+                            win=self.win, name=f'si_{name}', units="deg", ori=int(orientation), size=grating_size,
+                            mask='circle', pos=(0, field_positions[visual_field]), tex=texture)
+                        self.stimuli[name] = [self.gratings[name], self.wedge_covers[visual_field]]
+
+    def _make_procedural_gratings(self):
+        # The shader cuts the half disc itself, so a stimulus is its grating alone
+        from feature_binding.procedural import ProceduralGrating, grating_program
+        program = grating_program()
+        self.gratings = {}
+        self.stimuli = {}
+        for sf, cycles in self.spatial_frequencies.items():
+            for color in design.colors:
+                for orientation in design.orientations:
+                    for visual_field in design.visual_fields:
+                        name = f'{color}_{sf}_{orientation}_{visual_field}'
+                        self.gratings[name] = ProceduralGrating(
+                            self.win, program, name=f'si_{name}', color=color, cycles=cycles, ori=int(orientation),
+                            pos=(0, field_positions[visual_field]), size=grating_size, field=visual_field)
+                        self.stimuli[name] = [self.gratings[name]]
+
+    def _make_masks(self):
+        if self.mask_settings['kind'] == 'noise':
+            # White noise masks for both upper and lower visual fields
+            self.noise_masks = [
+                visual.NoiseStim(win=self.win, name=f"mask_{position}", pos=(0, y_pos), size=(3, 1.5),
+                                 color=[1, 1, 1], colorSpace='rgb', noiseType='White', noiseElementSize=[0.0625])
+                for position, y_pos in zip(['up', 'down'], [0.95, -0.95])
+            ]
+            for noise_mask in self.noise_masks:
+                noise_mask.buildNoise()
+        else:
+            # Texturized image masks, one list of images per mask type
+            mask_dir = os.path.join(self.stimulus_dir, self.mask_settings['directory'])
+            self.image_masks = {
+                mask_type: [visual.ImageStim(self.win, name=name, image=os.path.join(mask_dir, name + '.jpg'),
+                                             size=self.mask_settings['size'])
+                            for name in names]
+                for mask_type, names in self.mask_settings['images'].items()
+            }
+
+    def _make_text(self):
+        self.question = visual.TextStim(self.win, pos=(0, 0), text="Was black paired with left or right?",
+                                        height=.07, units='norm', color='black')
+        # Feedback as part of practice
+        self.correct_feedback = visual.TextStim(self.win, text="CORRECT!", height=0.07, units='norm',
+                                                color="green", pos=(0, 0))
+        self.incorrect_feedback = visual.TextStim(self.win, text="INCORRECT!", height=0.07, units='norm',
+                                                  color="red", pos=(0, 0))
+        self.instructions = visual.TextStim(self.win, text='', height=.06, units='norm', color='black')
+        self.blank = visual.TextStim(self.win, text="", pos=(0, 0), height=0)
+
+    def _make_examples(self):
+        self.examples = {
+            name: visual.ImageStim(self.win, size=(4.5, 4.5), pos=position,
+                                   image=os.path.join(self.stimulus_dir, name + '.jpg'))
+            for name, position in example_positions.items()
+        }
+
+    # ==============================================================================
+    # LOOK-UP
+    # ==============================================================================
+    def frame_components(self):
+        """Every component drawn or toggled during a trial."""
+        components = [self.fix, self.blank, self.question, self.correct_feedback, self.incorrect_feedback]
+        components += list(self.gratings.values()) + list(self.wedge_covers.values())
+        if self.mask_settings['kind'] == 'noise':
+            components += self.noise_masks
+        else:
+            components += [x for images in self.image_masks.values() for x in images]
+        return components
+
+    def texture_memory(self):
+        """
+        Memory of the grating textures.
+
+        :return: Dictionary with the number of 'textures', their 'resolution' and 'megabytes', and the
+                 'configured_megabytes' they would take at the configured grating_res.
+        """
+        textures = 0 if self.procedural else len(self.gratings)
+        return {'textures': textures, 'resolution': self.grating_res,
+                'megabytes': texture_megabytes(self.grating_res, textures),
+                'configured_megabytes': texture_megabytes(self.configured_grating_res, textures)}
+
+    def composite_rect(self, visual_field):
+        """
+        Rectangle [left, top, right, bottom] in norm units around a stimulus of visual_field, its wedge cover and
+        the fixation cross: the part of the window a composite of them has to hold.
+        """
+        radius = max(cover_size, grating_size) / 2
+        y = field_positions[visual_field]
+        left, right = -radius, radius
+        top, bottom = max(y + radius, fixation_height / 2), min(y - radius, -fixation_height / 2)
+        width, height = self.win.size
+        return [(deg2pix(left, self.win.monitor) - bake_margin) / (width / 2),
+                (deg2pix(top, self.win.monitor) + bake_margin) / (height / 2),
+                (deg2pix(right, self.win.monitor) + bake_margin) / (width / 2),
+                (deg2pix(bottom, self.win.monitor) - bake_margin) / (height / 2)]
+
+    def bake(self, components, rect=None):
+        """
+        Composite of components rendered once into a texture, drawn afterwards as a single textured quad. Rendering
+        uses and clears the back buffer, so call it right after a flip, before the next frame is drawn.
+
+        :param rect: Part of the window [left, top, right, bottom] in norm units the components are drawn in (see
+                     composite_rect); the whole window by default. The composite is drawn where it was captured.
+        """
+        if rect is None:
+            return visual.BufferImageStim(self.win, stim=components, interpolate=False)
+        width, height = self.win.size
+        center = ((rect[0] + rect[2]) / 2 * width / 2, (rect[1] + rect[3]) / 2 * height / 2)  # Pixels
+        return visual.BufferImageStim(self.win, stim=components, rect=rect, pos=center, interpolate=False)
+
+    def refresh_noise(self):
+        """Draw new noise for the noise masks."""
+        if self.mask_settings['kind'] == 'noise':
+            for noise_mask in self.noise_masks:
+                noise_mask.buildNoise()
+
+    def warm_up_groups(self):
+        """Everything drawn together on some frame of the session, by name."""
+        groups = {name: stim + [self.fix] for name, stim in self.stimuli.items()}
+        if self.mask_settings['kind'] == 'noise':
+            groups['noise_masks'] = self.noise_masks + [self.fix]
+        else:
+            groups.update({x.name: [x] for images in self.image_masks.values() for x in images})
+        groups.update({'question': [self.question], 'correct_feedback': [self.correct_feedback],
+                       'incorrect_feedback': [self.incorrect_feedback], 'instructions': [self.instructions],
+                       'blank': [self.blank]})
+        groups.update({f'example_{name}': [x] for name, x in self.examples.items()})
+        return groups
+
+    def warm_up(self, frame_rate):
+        """
+        Draw every stimulus, mask and text screen twice to the back buffer, which is cleared and never flipped, so
+        textures are uploaded and shaders compiled before the first timed frame. Each draw is timed up to
+        glFinish.
+
+        :param frame_rate: Refresh rate of the session; first draws longer than a frame would have dropped one.
+        :return: Dictionary with 'draws' (name -> (first ms, second ms)), 'slow_first' (names whose first draw
+                 took longer than a frame) and 'outliers' (names whose second draw is still slow).
+        """
+        draws = {}
+        for name, components in self.warm_up_groups().items():
+            times = []
+            for repeat in range(2):
+                gl_finish()
+                start = time.perf_counter()
+                for component in components:
+                    component.draw()
+                gl_finish()
+                times.append((time.perf_counter() - start) * 1000)
+            self.win.clearBuffer()
+            draws[name] = tuple(times)
+
+        frame_ms = 1000 / frame_rate
+        median_ms = np.median([x[1] for x in draws.values()])
+        limit_ms = max(warm_up_outlier_ratio * median_ms, warm_up_outlier_ms)
+        return {'draws': draws,
+                'slow_first': [name for name, x in draws.items() if x[0] > frame_ms],
+                'outliers': [name for name, x in draws.items() if x[1] > limit_ms]}
+
+    def stimulus_pair(self, first_color, first_orientation, visual_field, spatial_frequency):
+        """Names of the first and second stimulus of a trial."""
+        return design.stimulus_pair(first_color, first_orientation, visual_field, spatial_frequency)
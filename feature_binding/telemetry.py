@@ -0,0 +1,247 @@
+"""
+Per-frame telemetry (no PsychoPy needed).
+
+Every flip of a session is recorded as a fixed-size frame record: trial, phase of the trial, frame index in the
+phase, scheduled and actual flip time and the time spent on the frame before its flip. Records are packed into
+memory-mapped chunk files of a fixed number of records, so appending costs one struct.pack_into and a new chunk
+file is only created every chunk_records frames. Consecutive frames of one phase of one trial form a segment; the
+index file holds the first record of every segment, so the frames of a trial are found in the small index and read
+from the chunks that hold them, without reading the rest of the session.
+
+Frames of a trial, and the late frames of every phase:
+
+    python -m feature_binding.telemetry data/P1_exp2_2024.telemetry --trial 12 --phase stimulus
+    python -m feature_binding.telemetry data/P1_exp2_2024.telemetry --summary
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+# Index file: a 40-byte header, then the segments. Chunk files: the frame records
+magic = b'FBT1'
+header_struct = struct.Struct('<4sIIIdQQ')  # magic, record size, chunk records, segment capacity, frame period,
+#                                             records written, segments written
+counts_struct = struct.Struct('<QQ')
+counts_offset = 24
+segment_struct = struct.Struct('<iB3xQ')  # trial, phase, first record
+record_struct = struct.Struct('<iIB3xfdd')  # trial, frame, phase, draw time, scheduled time, actual time
+header_dtype = np.dtype([('magic', 'S4'), ('record_size', '<u4'), ('chunk_records', '<u4'),
+                         ('segment_capacity', '<u4'), ('period', '<f8'), ('records', '<u8'), ('segments', '<u8')])
+segment_dtype = np.dtype({'names': ['trial', 'phase', 'first'], 'formats': ['<i4', 'u1', '<u8'],
+                          'offsets': [0, 4, 8], 'itemsize': segment_struct.size})
+record_dtype = np.dtype({'names': ['trial', 'frame', 'phase', 'draw', 'scheduled', 'actual'],
+                         'formats': ['<i4', '<u4', 'u1', '<f4', '<f8', '<f8'],
+                         'offsets': [0, 4, 8, 12, 16, 24], 'itemsize': record_struct.size})
+
+# Phases of the frames
+phases = ['instructions', 'blank', 'fixation', 'stimulus', 'mask', 'question', 'feedback', 'break']
+phase_codes = {name: code for code, name in enumerate(phases)}
+# Screens waiting for a key flip once per screen, so their frames are not scheduled (scheduled is the flip time)
+unscheduled = {phase_codes[name] for name in ['instructions', 'question', 'feedback']}
+
+
+def chunk_path(path, chunk):
+    return os.path.join(path, f'{chunk:05d}.frames')
+
+
+class FrameTelemetry:
+    """Append-only store of frame records in memory-mapped chunk files, indexed by trial and phase."""
+
+    def __init__(self, path, frame_rate, chunk_records=2 ** 16, segment_capacity=2 ** 18, clock=time.perf_counter):
+        """
+
+        :param path: Folder of the index and chunk files.
+        :param frame_rate: Refresh rate of the session; frame k of a phase is scheduled k frame periods after its
+                           first frame.
+        :param chunk_records: Records per chunk file (32 bytes each).
+        :param segment_capacity: Phases of trials the index can hold (16 bytes each); frames of later segments are
+                                 not recorded.
+        :param clock: Clock of the draw times.
+        """
+        self.path = path
+        self.period = 1 / frame_rate
+        self.chunk_records = chunk_records
+        self.segment_capacity = segment_capacity
+        self.clock = clock
+        self.trial = -1  # Trial the next frames belong to; -1 before the experiment proper (practice)
+        self.count = 0
+        self.segments = 0
+        self.segment_trial = None
+        self.segment_phase = None
+        self.segment_start = 0.0
+        self.frame = 0
+        self.returned = clock()  # End of the previous flip
+
+        os.makedirs(path, exist_ok=True)
+        self.index_file = open(os.path.join(path, 'index'), 'w+b')
+        self.index_file.truncate(header_struct.size + segment_capacity * segment_struct.size)
+        self.index_map = mmap.mmap(self.index_file.fileno(), 0)
+        header_struct.pack_into(self.index_map, 0, magic, record_struct.size, chunk_records, segment_capacity,
+                                self.period, 0, 0)
+        self.chunk_file = None
+        self.chunk_map = None
+
+    def _open_chunk(self, chunk):
+        self._close_chunk()
+        self.chunk_file = open(chunk_path(self.path, chunk), 'w+b')
+        self.chunk_file.truncate(self.chunk_records * record_struct.size)  # Preallocate
+        self.chunk_map = mmap.mmap(self.chunk_file.fileno(), 0)
+
+    def _close_chunk(self, records=None):
+        if self.chunk_map is None:
+            return
+        self.chunk_map.flush()
+        self.chunk_map.close()
+        if records is not None:
+            self.chunk_file.truncate(records * record_struct.size)
+        self.chunk_file.close()
+        self.chunk_map = None
+
+    def record(self, phase, actual, draw):
+        """
+        Append a frame.
+
+        :param phase: Phase code (see phases and phase_codes).
+        :param actual: Flip time of the frame.
+        :param draw: Seconds spent on the frame between the end of the previous flip and this flip.
+        """
+        if phase != self.segment_phase or self.trial != self.segment_trial:
+            if self.segments == self.segment_capacity:
+                return
+            segment_struct.pack_into(self.index_map, header_struct.size + self.segments * segment_struct.size,
+                                     self.trial, phase, self.count)
+            self.segments += 1
+            self.segment_trial = self.trial
+            self.segment_phase = phase
+            self.segment_start = actual
+            self.frame = 0
+        slot = self.count % self.chunk_records
+        if slot == 0:
+            self._open_chunk(self.count // self.chunk_records)
+        scheduled = actual if phase in unscheduled else self.segment_start + self.frame * self.period
+        record_struct.pack_into(self.chunk_map, slot * record_struct.size, self.trial, self.frame, phase, draw,
+                                scheduled, actual)
+        self.count += 1
+        self.frame += 1
+        counts_struct.pack_into(self.index_map, counts_offset, self.count, self.segments)
+
+    def flip(self, win, phase):
+        """Flip win and record the frame with the flip time win.flip returns."""
+        called = self.clock()
+        actual = win.flip()
+        self.record(phase, actual, called - self.returned)
+        self.returned = self.clock()
+        return actual
+
+    def sync(self):
+        """Write the mapped records and index to disk."""
+        if self.chunk_map is not None:
+            self.chunk_map.flush()
+        self.index_map.flush()
+
+    def close(self):
+        self._close_chunk(records=(self.count - 1) % self.chunk_records + 1 if self.count else None)
+        self.index_map.flush()
+        self.index_map.close()
+        self.index_file.truncate(header_struct.size + self.segments * segment_struct.size)
+        self.index_file.close()
+
+
+# ==============================================================================
+# READING
+# ==============================================================================
+class TelemetryReader:
+    """Frames of a telemetry folder by trial and phase; only the chunks holding the requested frames are read."""
+
+    def __init__(self, path):
+        self.path = path
+        index_path = os.path.join(path, 'index')
+        header = np.fromfile(index_path, dtype=header_dtype, count=1)[0]
+        if header['magic'] != magic or header['record_size'] != record_dtype.itemsize:
+            raise ValueError(f'{path} is not a frame telemetry folder')
+        self.period = float(header['period'])
+        self.chunk_records = int(header['chunk_records'])
+        self.count = int(header['records'])
+        self.segments = np.fromfile(index_path, dtype=segment_dtype, offset=header_dtype.itemsize,
+                                    count=int(header['segments']))
+        self.ends = np.append(self.segments['first'][1:], self.count).astype(np.int64)
+        self.chunks = {}
+
+    def _chunk(self, chunk):
+        if chunk not in self.chunks:
+            self.chunks[chunk] = np.memmap(chunk_path(self.path, chunk), dtype=record_dtype, mode='r')
+        return self.chunks[chunk]
+
+    def _read(self, first, end):
+        parts = []
+        while first < end:
+            chunk, slot = divmod(first, self.chunk_records)
+            stop = min(end, (chunk + 1) * self.chunk_records)
+            parts.append(self._chunk(chunk)[slot:slot + stop - first])
+            first = stop
+        return np.concatenate(parts) if parts else np.empty(0, dtype=record_dtype)
+
+    def trials(self):
+        return np.unique(self.segments['trial'])
+
+    def frames(self, trial=None, phase=None):
+        """Frame records of a trial and/or phase (name or code), in the order they were shown."""
+        selected = np.ones(len(self.segments), dtype=bool)
+        if trial is not None:
+            selected &= self.segments['trial'] == trial
+        if phase is not None:
+            selected &= self.segments['phase'] == phase_codes.get(phase, phase)
+        return np.concatenate([self._read(int(self.segments['first'][i]), int(self.ends[i]))
+                               for i in np.flatnonzero(selected)] or [np.empty(0, dtype=record_dtype)])
+
+    def summary(self, late_fraction=0.5):
+        """
+        Frames of every phase of the whole session.
+
+        :param late_fraction: A frame is late when it flips this many frame periods after its scheduled time.
+        :return: Dictionary of phase name -> dictionary with 'frames', 'late', 'max_late_ms' and 'draw_ms' (mean).
+        """
+        result = {}
+        for code, name in enumerate(phases):
+            frames = self.frames(phase=code)
+            if not len(frames):
+                continue
+            lateness = frames['actual'] - frames['scheduled']
+            result[name] = {'frames': len(frames), 'late': int(np.sum(lateness > late_fraction * self.period)),
+                            'max_late_ms': float(lateness.max() * 1000), 'draw_ms': float(frames['draw'].mean() * 1000)}
+        return result
+
+
+def write_csv(frames, output):
+    writer = csv.writer(output)
+    writer.writerow(['trial', 'phase', 'frame', 'scheduled', 'actual', 'draw_ms'])
+    for frame in frames:
+        writer.writerow([frame['trial'], phases[frame['phase']], frame['frame'], f'{frame["scheduled"]:.6f}',
+                         f'{frame["actual"]:.6f}', f'{frame["draw"] * 1000:.3f}'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the frame telemetry of a session.')
+    parser.add_argument('telemetry', help='Telemetry folder written by a session')
+    parser.add_argument('--trial', type=int, default=None, help='Trial number (-1 for the practice)')
+    parser.add_argument('--phase', choices=phases, default=None, help='Phase of the trials')
+    parser.add_argument('--summary', action='store_true', help='Frames and late frames of every phase')
+    args = parser.parse_args()
+    reader = TelemetryReader(args.telemetry)
+    if args.summary:
+        print(f'{reader.count} frames, {len(reader.trials())} trials')
+        for phase_name, phase_summary in reader.summary().items():
+            print(f'{phase_name:<13} {phase_summary["frames"]:>8} frames {phase_summary["late"]:>6} late, '
+                  f'at most {phase_summary["max_late_ms"]:.2f} ms; draw {phase_summary["draw_ms"]:.3f} ms')
+    else:
+        write_csv(reader.frames(args.trial, args.phase), sys.stdout)
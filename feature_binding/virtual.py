@@ -0,0 +1,373 @@
+"""
+Virtual display: a window on a simulated vsync, for running the frame logic without a monitor.
+
+The module itself imports no PsychoPy; the trial engine it is used with does, so running trials on a virtual
+display (the command below, dry runs and tests/test_virtual.py) needs PsychoPy installed, but no window or GUI.
+
+A VirtualWindow implements the parts of a PsychoPy window the trial engine uses (flip, callOnFlip, timeOnFlip,
+clearBuffer, autoDraw) against a display refreshing at a fixed rate. Time only moves on when a flip waits for
+the next vsync or when the code waits, so a session runs as fast as Python can go through its frames and every
+flip time is exact. Flips can be made to miss their vsync, at given frames or at random. Every frame is recorded
+with its flip time, the components drawn and the vsyncs missed, so frame schedules can be checked exactly.
+
+VirtualBank, VirtualKeys, VirtualClock and VirtualEvents stand in for the stimulus bank, the key collector, the
+PsychoPy clocks and psychopy.event. Run a few trials of an experiment on a virtual display and print their frame
+schedules:
+
+    python -m feature_binding.virtual "paradigm/experiment 2/exp2.yaml" --trials 5 --drop-rate 0.01
+"""
+
+# ==============================================================================
+# IMPORT STATEMENTS
+# ==============================================================================
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from feature_binding import design, instructions
+
+
+class VirtualClock:
+    """PsychoPy Clock on the simulated time of a VirtualWindow."""
+
+    def __init__(self, win):
+        self.win = win
+        self.start = win.time
+
+    def getTime(self):
+        return self.win.time - self.start
+
+    def reset(self, newT=0.0):
+        self.start = self.win.time + newT
+
+    def getLastResetTime(self):
+        return self.start
+
+
+class VirtualTimer:
+    """The clocks and waits of psychopy.core on the simulated time of a VirtualWindow."""
+
+    def __init__(self, win):
+        self.win = win
+
+    def Clock(self):
+        return VirtualClock(self.win)
+
+    def wait(self, secs, hogCPUperiod=0.2):
+        self.win.time += secs
+
+    def getTime(self):
+        return self.win.time
+
+
+class VirtualEvents:
+    """psychopy.event on a VirtualWindow: instruction screens are read for read_s and answered with space."""
+
+    def __init__(self, win, read_s=1.0):
+        self.win = win
+        self.read_s = read_s
+
+    def clearEvents(self, eventType=None):
+        pass
+
+    def getKeys(self, keyList=None, **kwargs):
+        return []
+
+    def waitKeys(self, keyList=None, **kwargs):
+        self.win.time += self.read_s
+        return ['space'] if keyList is None or 'space' in keyList else [keyList[0]]
+
+
+class VirtualWindow:
+    """
+    Window on a simulated display. A flip returns at the next vsync after the current simulated time, or one
+    refresh later for every vsync it misses.
+    """
+
+    def __init__(self, frame_rate=120, drop_frames=(), drop_rate=0.0, seed=None, size=(2560, 1440)):
+        """
+
+        :param frame_rate: Refresh rate of the simulated display in Hz.
+        :param drop_frames: Indices of the flips (0 is the first) that miss their vsync.
+        :param drop_rate: Chance that any other flip misses its vsync.
+        :param seed: Seed of the random drops.
+        :param size: Window size in pixels.
+        """
+        self.frame_rate = frame_rate
+        self.drop_frames = set(drop_frames)
+        self.drop_rate = drop_rate
+        self.rng = np.random.default_rng(seed)
+        self.size = size
+        self.monitor = None
+        self.mouseVisible = True
+        self.time = 0.0  # Simulated seconds since the window opened
+        self.vsync = 0  # Refreshes of the display since the window opened
+        self.timer = VirtualTimer(self)  # Used by the trial engine instead of psychopy.core
+        self.events = VirtualEvents(self)  # ... and instead of psychopy.event
+        self.frame_clock = VirtualClock(self)  # Stands in for logging.defaultClock, the clock of the flip times
+        self.frames = []  # (flip time, names of the components drawn, vsyncs missed) of every flip
+        self.drawn = []
+        self._toDraw = []
+        self._toCall = []
+
+    def flip(self, clearBuffer=True):
+        """Show the frame at the next vsync, then call the functions queued with callOnFlip."""
+        names = tuple(self.drawn + [x.name for x in self._toDraw])
+        missed = int(len(self.frames) in self.drop_frames or
+                     (self.drop_rate > 0 and self.rng.random() < self.drop_rate))
+        # The next vsync after the current time; code between two flips that takes longer than a frame misses one
+        self.vsync = max(self.vsync + 1, int(np.floor(self.time * self.frame_rate + 1e-9)) + 1) + missed
+        self.time = self.vsync / self.frame_rate
+        flip_time = self.frame_clock.getTime()
+        self.frames.append((flip_time, names, missed))
+        if clearBuffer:
+            self.drawn = []
+        calls, self._toCall = self._toCall, []
+        for function, args, kwargs in calls:
+            function(*args, **kwargs)
+        return flip_time
+
+    def callOnFlip(self, function, *args, **kwargs):
+        self._toCall.append((function, args, kwargs))
+
+    def timeOnFlip(self, obj, attrib):
+        self.callOnFlip(self._assign_flip_time, obj, attrib)
+
+    def _assign_flip_time(self, obj, attrib):
+        if isinstance(obj, dict):
+            obj[attrib] = self.frame_clock.getTime()
+        else:
+            setattr(obj, attrib, self.frame_clock.getTime())
+
+    def clearBuffer(self):
+        self.drawn = []
+
+    def getActualFrameRate(self):
+        return self.frame_rate
+
+    def close(self):
+        pass
+
+    # ==============================================================================
+    # FRAME SCHEDULE
+    # ==============================================================================
+    def flip_times(self):
+        return np.array([x[0] for x in self.frames])
+
+    def dropped(self):
+        """Indices of the flips that missed their vsync."""
+        return [index for index, frame in enumerate(self.frames) if frame[2]]
+
+    def runs(self, name, start=0):
+        """
+        Consecutive frames on which the component name was drawn.
+
+        :param start: First flip to look at.
+        :return: List of (first flip, number of flips, seconds on screen) of every run.
+        """
+        found = []
+        run_start = None
+        for index in range(start, len(self.frames) + 1):
+            shown = index < len(self.frames) and name in self.frames[index][1]
+            if shown and run_start is None:
+                run_start = index
+            elif not shown and run_start is not None:
+                end_time = self.frames[index][0] if index < len(self.frames) else self.frame_clock.getTime()
+                found.append((run_start, index - run_start, end_time - self.frames[run_start][0]))
+                run_start = None
+        return found
+
+
+# ==============================================================================
+# STAND-INS FOR THE STIMULI AND KEYBOARD
+# ==============================================================================
+class VirtualStim:
+    """Component that only records on which frames it was drawn."""
+
+    def __init__(self, win, name):
+        self.win = win
+        self.name = name
+        self.autoLog = False
+        self.phase = 0.0
+        self.text = ''
+        self.pos = (0, 0)
+
+    def draw(self, win=None):
+        self.win.drawn.append(self.name)
+
+    def setAutoDraw(self, value, log=None):
+        if value and self not in self.win._toDraw:
+            self.win._toDraw.append(self)
+        elif not value and self in self.win._toDraw:
+            self.win._toDraw.remove(self)
+
+
+class VirtualBank:
+    """Stimulus bank of VirtualStim components with the names of the components of a StimulusBank."""
+
+    def __init__(self, win, spatial_frequencies, mask=None):
+        """
+
+        :param win: VirtualWindow to draw in.
+        :param spatial_frequencies: Dictionary of SF name -> number of grating cycles.
+        :param mask: Mask settings, as for StimulusBank.
+        """
+        self.win = win
+        self.mask_settings = mask or {'kind': 'noise'}
+        for name in ['fix', 'blank', 'question', 'correct_feedback', 'incorrect_feedback', 'instructions']:
+            setattr(self, name, VirtualStim(win, name))
+        self.wedge_covers = {x: VirtualStim(win, f'wedge_cover_{x}') for x in design.visual_fields}
+        self.gratings = {}
+        self.stimuli = {}
+        for sf in spatial_frequencies:
+            for color in design.colors:
+                for orientation in design.orientations:
+                    for visual_field in design.visual_fields:
+                        name = f'{color}_{sf}_{orientation}_{visual_field}'
+                        self.gratings[name] = VirtualStim(win, f'si_{name}')
+                        self.stimuli[name] = [self.gratings[name], self.wedge_covers[visual_field]]
+        if self.mask_settings['kind'] == 'noise':
+            self.noise_masks = [VirtualStim(win, f'mask_{x}') for x in ['up', 'down']]
+        else:
+            self.image_masks = {mask_type: [VirtualStim(win, x) for x in names]
+                                for mask_type, names in self.mask_settings['images'].items()}
+        self.examples = {x: VirtualStim(win, x) for page in instructions.instruction_pages for x in page[1:] if x}
+
+    def composite_rect(self, visual_field):
+        return [-1, 1, 1, -1]
+
+    def bake(self, components, rect=None):
+        return VirtualStim(self.win, '+'.join(x.name for x in components))
+
+    def refresh_noise(self):
+        pass
+
+    def warm_up(self, frame_rate):
+        """Nothing is uploaded to a virtual display."""
+        return {'draws': {}, 'slow_first': [], 'outliers': []}
+
+    def stimulus_pair(self, first_color, first_orientation, visual_field, spatial_frequency):
+        return design.stimulus_pair(first_color, first_orientation, visual_field, spatial_frequency)
+
+
+def random_responder(key_list, trial, correct_response):
+    """A random allowed key other than escape after 0.5 s."""
+    return str(np.random.choice([x for x in key_list if x != 'escape'])), 0.5
+
+
+class VirtualKeys:
+    """Key collector on the simulated time: a responder function gives the key and response time."""
+
+    def __init__(self, win, responder=random_responder):
+        """
+
+        :param win: VirtualWindow whose clock times the presses.
+        :param responder: Function of the allowed keys, the trial and its correct response (both None unless
+                          set with expect) returning (key, response time in s).
+        """
+        self.win = win
+        self.responder = responder
+        self.trial = None
+        self.correct_response = None
+        self.pressed = []  # (key, time) of every press
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def now(self):
+        return self.win.frame_clock.getTime()
+
+    def mark(self):
+        return len(self.pressed)
+
+    def presses(self, start, end=None, key_list=None):
+        return [x for x in self.pressed[start:end] if key_list is None or x[0] in key_list]
+
+    def expect(self, trial=None, correct_response=None):
+        """Tell the responder what the next question is about."""
+        if trial is not None:
+            self.trial = trial
+        if correct_response is not None:
+            self.correct_response = correct_response
+
+    def wait_for(self, key_list, start, idle=None):
+        """The response time passes on the simulated clock; idle work runs once."""
+        found = self.presses(start, key_list=key_list)
+        if found:
+            return found[0]
+        if idle is not None:
+            idle()
+        key, rt = self.responder(key_list, self.trial, self.correct_response)
+        self.win.time += rt
+        self.pressed.append((key, self.now()))
+        return self.pressed[-1]
+
+
+def trial_schedule(win, bank, data, start):
+    """
+    Frames of the phases of a trial run on win, from the flip start.
+
+    :param data: Trial data written by TrialEngine.run_trial.
+    :return: Dictionary with the runs (see VirtualWindow.runs) of the 'first' and 'second' stimulus and the 'mask',
+             and the flips that missed their vsync ('dropped').
+    """
+    mask = 'mask_up' if bank.mask_settings['kind'] == 'noise' else data.get('mask_images', '').split('-')[0]
+    return {'first': win.runs(f'si_{data["first_stim"]}', start),
+            'second': win.runs(f'si_{data["second_stim"]}', start),
+            'mask': win.runs(mask, start) if data['mask_present'] else [],
+            'dropped': [x - start for x in win.dropped() if x >= start]}
+
+
+if __name__ == '__main__':
+    from feature_binding.config import compile_config, load_config
+    from feature_binding.engine import TrialEngine
+    from feature_binding.idle import IdleScheduler
+    from feature_binding.journal import EventJournal
+    from feature_binding.realtime import RealtimeMode
+    from feature_binding.split import RowSink
+
+    parser = argparse.ArgumentParser(description='Run trials of an experiment on a virtual display and print '
+                                                 'their frame schedules.')
+    parser.add_argument('config', help='YAML configuration file')
+    parser.add_argument('--trials', type=int, default=5, help='Trials of the trial plan to run')
+    parser.add_argument('--frame-rate', type=float, default=None,
+                        help='Refresh rate in Hz (default: frame_rate of the session info)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Chance that a flip misses its vsync')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the dropped frames')
+    parser.add_argument('--frames', type=int, default=3,
+                        help='Stimulus frames of trials set by a staircase (default: 3)')
+    args = parser.parse_args()
+
+    raw_config = load_config(args.config)
+    config = compile_config(raw_config, args.frame_rate or raw_config['exp_info']['frame_rate'])
+    window = VirtualWindow(config['frame_rate'], drop_rate=args.drop_rate, seed=args.seed)
+    virtual_bank = VirtualBank(window, config['spatial_frequencies'], config['mask'])
+    sink = RowSink(IdleScheduler(config['idle_budget_s']))
+    journal_path = os.path.join(tempfile.mkdtemp(), 'virtual.journal')
+    journal = EventJournal(journal_path, capacity=2 ** 16, clock=window.frame_clock.getTime)
+    engine = TrialEngine(window, virtual_bank, VirtualKeys(window), sink, config, sink.idle,
+                         RealtimeMode(config['realtime']), journal)
+
+    for number, trial in enumerate(config['trial_plan'][:args.trials]):
+        first_flip = len(window.frames)
+        engine.run_trial(dict({'stimulus_frame_duration': args.frames}, **trial),
+                         randomize_phase=config['randomize_phase'])
+        trial_data = sink.take()
+        schedule = trial_schedule(window, virtual_bank, trial_data, first_flip)
+        print(f'trial {number}: {trial_data["first_stim"]} / {trial_data["second_stim"]}, '
+              f'{trial_data["stimulus_frame_duration"]} frames x {trial_data["cycle_number"]} cycles')
+        for phase in ['first', 'second', 'mask']:
+            if schedule[phase]:
+                frames = sorted({x[1] for x in schedule[phase]})
+                seconds = [x[2] for x in schedule[phase]]
+                print(f'  {phase:<7} {len(seconds)} x {frames} frames, {min(seconds) * 1000:.1f} to '
+                      f'{max(seconds) * 1000:.1f} ms on screen')
+        if 'mask_duration' in trial_data:
+            print(f'  mask_duration {trial_data["mask_duration"] * 1000:.2f} ms')
+        print(f'  dropped flips: {schedule["dropped"]}')
+    journal.close()
@@ -0,0 +1,8 @@
+"""
+The tests import feature_binding from the root of the repository, as the experiment scripts do.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,120 @@
+"""
+Shared-memory channels between two spawned processes: trial specs with numpy values make the round trip, a long
+stream arrives complete and in order, the other end attaches with the geometry of the channel, and a channel whose
+other process is gone raises ChannelClosed.
+"""
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from feature_binding.channel import Channel, ChannelClosed
+
+
+def echo(command_name, result_name):
+    """Other end: send every message back with its trial number doubled, until 'end'."""
+    commands = Channel(command_name)
+    results = Channel(result_name)
+    alive = multiprocessing.parent_process().is_alive
+    while True:
+        message = commands.receive(alive)
+        if message.get('op') == 'end':
+            break
+        message['doubled'] = 2 * message['trial']['number']
+        results.send(message, alive)
+    commands.close()
+    results.close()
+
+
+def count(result_name, n):
+    """Other end: send the numbers 0 to n - 1."""
+    results = Channel(result_name)
+    alive = multiprocessing.parent_process().is_alive
+    for number in range(n):
+        results.send(number, alive)
+    results.close()
+
+
+def exit_now(command_name):
+    Channel(command_name).close()
+
+
+def spawn(target, *args):
+    process = multiprocessing.get_context('spawn').Process(target=target, args=args, daemon=True)
+    process.start()
+    return process
+
+
+def test_round_trip():
+    # Fewer and smaller slots than the defaults, which the other end does not know
+    commands = Channel(slots=4, slot_size=1024)
+    results = Channel(slots=4, slot_size=1024)
+    process = spawn(echo, commands.name, results.name)
+    try:
+        for number in range(20):  # More messages than slots
+            trial = {'number': np.int64(number), 'cycle_number': np.int32(3), 'phase': np.float64(0.25),
+                     'mask_present': np.bool_(number % 2), 'condition': np.array(['low', '3']),
+                     'first_color': np.str_('black'), 'fixation_duration': 1.25}
+            commands.send({'op': 'trial', 'trial': trial}, process.is_alive)
+            reply = results.receive(process.is_alive)
+            assert reply['doubled'] == 2 * number
+            assert reply['trial'] == {'number': number, 'cycle_number': 3, 'phase': 0.25,
+                                      'mask_present': bool(number % 2), 'condition': ['low', '3'],
+                                      'first_color': 'black', 'fixation_duration': 1.25}
+        commands.send({'op': 'end'}, process.is_alive)
+        process.join(10)
+        assert process.exitcode == 0
+    finally:
+        commands.close()
+        results.close()
+
+
+def test_stream():
+    # Both counters move on with every message while the other process reads them
+    n = 20000
+    results = Channel(slots=4, slot_size=64, poll_interval=0)
+    process = spawn(count, results.name, n)
+    try:
+        assert [results.receive(process.is_alive) for number in range(n)] == list(range(n))
+        process.join(10)
+        assert process.exitcode == 0
+    finally:
+        results.close()
+
+
+def test_attach_reads_geometry():
+    channel = Channel(slots=4, slot_size=256)
+    other_end = Channel(channel.name)
+    try:
+        assert (other_end.slots, other_end.slot_size) == (4, 256)
+        for number in range(3):
+            channel.send({'number': number})
+        assert [other_end.poll() for number in range(4)] == [{'number': 0}, {'number': 1}, {'number': 2}, None]
+    finally:
+        other_end.close()
+        channel.close()
+
+
+def test_message_too_large():
+    channel = Channel(slots=2, slot_size=64)
+    try:
+        with pytest.raises(ValueError):
+            channel.send({'text': 'x' * 100})
+    finally:
+        channel.close()
+
+
+def test_closed():
+    channel = Channel(slots=2, slot_size=256)
+    process = spawn(exit_now, channel.name)
+    process.join(10)
+    try:
+        with pytest.raises(ChannelClosed):
+            channel.receive(process.is_alive)
+        channel.send({'number': 1}, process.is_alive)
+        channel.send({'number': 2}, process.is_alive)
+        with pytest.raises(ChannelClosed):
+            channel.send({'number': 3}, process.is_alive)  # Full, and nobody will read it
+    finally:
+        channel.close()
@@ -0,0 +1,54 @@
+"""
+Complete dry-run sessions of the three experiments: the session ends and its data file has the trials and the
+thresholds.
+"""
+
+import csv
+import os
+
+import pytest
+
+pytest.importorskip('psychopy')
+
+from feature_binding import design
+from feature_binding.config import compile_config, load_config
+from feature_binding.dryrun import ScriptedResponder, dry_run_info, run_dry_run
+
+repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+experiments = [os.path.join(repo, 'paradigm', f'experiment {x}', f'exp{x}.yaml') for x in [1, 2, 3]]
+
+# Columns every trial of the experiment proper writes (and config['fixation_column']), and the session info
+trial_columns = ['trial_number', 'trial_type', 'mask_present', 'cycle_number', 'first_color', 'first_orientation',
+                 'correct_response', 'visual_field', 'spatial_frequency', 'first_stim', 'second_stim',
+                 'stimulus_frame_duration', 'gc_critical', 'accuracy', 'rt']
+info_columns = ['participant', 'frame_rate', 'date', 'expName', 'psychopyVersion', 'frame_rate_detected',
+                'frame_rate_compiled']
+
+
+def threshold_columns(config):
+    if config['design'] != 'staircase':
+        return []
+    return [config['staircase']['threshold_column'].format(**design.as_trial(config['fields'], x))
+            for x in design.unique_conditions(config['conditions'])]
+
+
+@pytest.mark.parametrize('config_path', experiments, ids=['exp1', 'exp2', 'exp3'])
+def test_dry_run_session(config_path, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The session changes into the experiment folder; restored afterwards
+    raw_config = load_config(config_path)
+    result = run_dry_run(raw_config, str(tmp_path), responder=ScriptedResponder(0.8, seed=1), seed=1)
+    config = compile_config(raw_config, float(dry_run_info(raw_config)['frame_rate']))
+
+    assert result['filename'].startswith(str(tmp_path))
+    with open(result['filename'] + '.csv', newline='', encoding='utf-8-sig') as data_file:
+        rows = list(csv.DictReader(data_file))
+    assert not os.path.exists(result['filename'] + '.checkpoint')  # Removed when the session ends
+    for column in trial_columns + info_columns + [config['fixation_column']]:
+        assert column in rows[0], column
+
+    trials = [x for x in rows if x['trial_number']]
+    assert [int(x['trial_number']) for x in trials] == list(range(len(trials)))
+    assert 0 < len(trials) <= config['max_trials']
+    for column in threshold_columns(config):
+        assert rows[-1][column], column
+        assert float(rows[-1][column]) > 0
@@ -0,0 +1,46 @@
+"""
+Procedural gratings against the texture gratings: every stimulus of each experiment is rendered by both paths in
+the back buffer of a small window and no pixel may differ by more than a moved edge explains. Skipped where no
+window with a GL context can be opened.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip('psychopy')
+pytest.importorskip('pyglet')
+
+from psychopy import visual
+
+from feature_binding.config import load_config
+from feature_binding.procedural import compare_banks
+from feature_binding.session import make_monitor
+from feature_binding.stimuli import StimulusBank
+
+repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+experiments = [os.path.join(repo, 'paradigm', f'experiment {x}', f'exp{x}.yaml') for x in [1, 2, 3]]
+tolerance = 1  # 8-bit levels
+
+
+@pytest.mark.parametrize('config_path', experiments, ids=['exp1', 'exp2', 'exp3'])
+def test_procedural_matches_texture(config_path):
+    raw_config = load_config(config_path)
+    stimuli = raw_config['stimuli']
+    try:
+        win = visual.Window(size=[400, 400], fullscr=False, monitor=make_monitor(raw_config['monitor']),
+                            color=[0, 0, 0], units='deg', allowGUI=False)
+    except Exception as error:  # No display or no GL context
+        pytest.skip(f'No window with a GL context: {error}')
+    try:
+        banks = [StimulusBank(win, raw_config['config_dir'], stimuli['spatial_frequencies'],
+                              grating_res=stimuli['grating_res'], procedural=procedural,
+                              fit_grating_res=stimuli.get('fit_grating_res', False))
+                 for procedural in [False, True]]
+        comparison = compare_banks(win, *banks, tolerance=tolerance)
+    finally:
+        win.close()
+
+    assert comparison
+    failed = {name: result for name, result in comparison.items() if result['unexplained']}
+    assert not failed
@@ -0,0 +1,74 @@
+"""
+Two-process mode on a virtual display: the control process runs the trial loops of experiment 2 through
+ControlEngine, a spawned render process shows the trials on a VirtualWindow.
+"""
+
+import csv
+import multiprocessing
+import os
+
+import pytest
+
+pytest.importorskip('psychopy')
+
+from feature_binding import design
+from feature_binding.channel import Channel
+from feature_binding.config import compile_config, load_config
+from feature_binding.engine import TrialEngine
+from feature_binding.idle import IdleScheduler
+from feature_binding.journal import EventJournal, journal_capacity
+from feature_binding.realtime import RealtimeMode
+from feature_binding.recorder import TrialRecorder
+from feature_binding.sink import DataSink
+from feature_binding.split import ControlEngine, RowSink, serve
+from feature_binding.virtual import VirtualBank, VirtualKeys, VirtualWindow
+
+repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+config_path = os.path.join(repo, 'paradigm', 'experiment 2', 'exp2.yaml')
+frame_rate = 120
+
+
+def virtual_render(journal_path, command_name, result_name):
+    """Render process showing the trials on a virtual display."""
+    commands = Channel(command_name)
+    results = Channel(result_name)
+    config = compile_config(load_config(config_path), frame_rate)
+    win = VirtualWindow(frame_rate, seed=1)
+    sink = RowSink(IdleScheduler(config['idle_budget_s']))
+    journal = EventJournal(journal_path, capacity=journal_capacity(config), clock=win.frame_clock.getTime)
+    engine = TrialEngine(win, VirtualBank(win, config['spatial_frequencies'], config['mask']), VirtualKeys(win),
+                         sink, config, sink.idle, RealtimeMode(dict(config['realtime'], enabled=False)), journal)
+    serve(engine, sink, commands, results, multiprocessing.parent_process().is_alive)
+    journal.close()
+    commands.close()
+    results.close()
+
+
+def test_split_session(tmp_path):
+    config = compile_config(load_config(config_path), frame_rate)
+    commands = Channel()
+    results = Channel()
+    render = multiprocessing.get_context('spawn').Process(
+        target=virtual_render, args=(str(tmp_path / 'render.journal'), commands.name, results.name), daemon=True)
+    render.start()
+    try:
+        recorder = TrialRecorder(str(tmp_path / 'split'), {'participant': 'split'})
+        idle = IdleScheduler(config['idle_budget_s'])
+        sink = DataSink(recorder, idle=idle)
+        engine = ControlEngine(commands, results, render, sink, config, idle)
+        engine.run()
+        engine.stop()
+        sink.close()
+    finally:
+        commands.close()
+        results.close()
+    assert render.exitcode == 0
+
+    with open(tmp_path / 'split.csv', newline='', encoding='utf-8-sig') as data_file:
+        rows = list(csv.DictReader(data_file))
+    assert [int(x['trial_number']) for x in rows] == list(range(len(rows)))
+    assert all(x['first_stim'] and x['accuracy'] in ['0', '1'] for x in rows)  # Data of the render process
+    assert all(x['staircase_name'] for x in rows)  # Staircase bookkeeping of the control process
+    for condition in design.unique_conditions(config['conditions']):
+        column = config['staircase']['threshold_column'].format(**design.as_trial(config['fields'], condition))
+        assert rows[-1][column]
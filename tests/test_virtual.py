@@ -0,0 +1,108 @@
+"""
+Frame schedules of a trial run by the TrialEngine on a VirtualWindow, with and without dropped frames.
+"""
+
+import math
+import os
+
+import pytest
+
+pytest.importorskip('psychopy')
+
+from feature_binding.config import compile_config, load_config
+from feature_binding.engine import TrialEngine
+from feature_binding.idle import IdleScheduler
+from feature_binding.journal import EventJournal
+from feature_binding.realtime import RealtimeMode
+from feature_binding.split import RowSink
+from feature_binding.virtual import VirtualBank, VirtualKeys, VirtualWindow
+
+repo = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+config_path = os.path.join(repo, 'paradigm', 'experiment 2', 'exp2.yaml')
+
+trial = {'spatial_frequency': 'low', 'cycle_number': 2, 'stimulus_frame_duration': 3, 'mask_present': True,
+         'mask_type': None, 'first_color': 'black', 'first_orientation': '45', 'visual_field': 'up',
+         'fixation_duration': 0.5004}
+
+
+def run_trial(frame_rate, drop_frames, tmp_path):
+    config = compile_config(load_config(config_path), frame_rate)
+    win = VirtualWindow(frame_rate, drop_frames=drop_frames)
+    bank = VirtualBank(win, config['spatial_frequencies'], config['mask'])
+    sink = RowSink(IdleScheduler(config['idle_budget_s']))
+    journal = EventJournal(str(tmp_path / 'trial.journal'), capacity=2 ** 10, clock=win.frame_clock.getTime)
+    engine = TrialEngine(win, bank, VirtualKeys(win), sink, config, sink.idle,
+                         RealtimeMode(dict(config['realtime'], enabled=False)), journal)
+    engine.run_trial(trial)
+    journal.close()
+    return config, win, bank, sink.take()
+
+
+def fixation_frames(flength, frame_rate, first_flip, drop_frames):
+    """Flips of the fixation: it is shown until its clock, started on the last blank flip, reaches flength."""
+    frames, elapsed = 0, 0
+    while elapsed < flength * frame_rate - 1e-9:
+        elapsed += 1 + (first_flip + frames in drop_frames)
+        frames += 1
+    return frames
+
+
+def expected_schedule(config, bank, n_fixation):
+    """Components on every flip from the first blank to the end of the blank after the mask."""
+    first, second = bank.stimulus_pair(trial['first_color'], trial['first_orientation'], trial['visual_field'],
+                                       trial['spatial_frequency'])
+    cover = f'wedge_cover_{trial["visual_field"]}'
+    frames = [('blank',)] * config['blank_frames'] + [('fix',)] * n_fixation
+    for cycle in range(trial['cycle_number']):
+        for stimulus in [first, second]:
+            # The stimulus for stimulus_frame_duration flips, then one flip with only the fixation cross
+            frames += [(f'si_{stimulus}', cover, 'fix')] * trial['stimulus_frame_duration'] + [('fix',)]
+    frames += [('fix', 'mask_up', 'mask_down')] * config['mask']['frames']
+    frames += [('blank',)] * config['blank_frames']
+    return frames
+
+
+def check_trial(frame_rate, drops, tmp_path):
+    config = compile_config(load_config(config_path), frame_rate)
+    blank_frames = config['blank_frames']
+    # Drops are placed relative to the phases: (phase, flip in the phase)
+    n_fixation = fixation_frames(trial['fixation_duration'], frame_rate, blank_frames,
+                                 {blank_frames + x for phase, x in drops if phase == 'fixation'})
+    alternation = 2 * trial['cycle_number'] * (trial['stimulus_frame_duration'] + 1)
+    starts = {'blank': 0, 'fixation': blank_frames, 'stimulus': blank_frames + n_fixation,
+              'mask': blank_frames + n_fixation + alternation}
+    drop_frames = {starts[phase] + x for phase, x in drops}
+
+    config, win, bank, data = run_trial(frame_rate, drop_frames, tmp_path)
+    expected = expected_schedule(config, bank, n_fixation)
+    assert [x[1] for x in win.frames[:len(expected)]] == expected
+    assert win.dropped() == sorted(drop_frames)
+
+    # Blank, fixation and mask frames
+    names = [x[1] for x in win.frames[:len(expected)]]
+    assert names[:blank_frames + 1].count(('blank',)) == blank_frames
+    assert names[starts['mask']:].count(('blank',)) == blank_frames
+    assert names[blank_frames:starts['stimulus'] + 1].count(('fix',)) == n_fixation
+    # A missed vsync in the fixation costs it a flip, as its end is timed by its clock
+    fixation_drops = len([x for phase, x in drops if phase == 'fixation'])
+    assert n_fixation == math.ceil(trial['fixation_duration'] * frame_rate - 1e-9) - fixation_drops
+    assert names.count(('fix', 'mask_up', 'mask_down')) == config['mask']['frames']
+
+    # mask_start and mask_end are the flip times of the first mask frame and of the flip after the last one
+    mask_start = win.frames[starts['mask']][0]
+    mask_end = win.frames[starts['mask'] + config['mask']['frames']][0]
+    late = sum(starts['mask'] < x <= starts['mask'] + config['mask']['frames'] for x in drop_frames)
+    assert data['mask_duration'] == pytest.approx(mask_end - mask_start, abs=1e-12)
+    assert data['mask_duration'] == pytest.approx((config['mask']['frames'] + late) / frame_rate, abs=1e-12)
+
+
+@pytest.mark.parametrize('frame_rate', [120, 165])
+def test_schedule(frame_rate, tmp_path):
+    check_trial(frame_rate, [], tmp_path)
+
+
+@pytest.mark.parametrize('frame_rate', [120, 165])
+def test_schedule_with_drops(frame_rate, tmp_path):
+    # One missed vsync in the blank, fixation, alternation and mask: flip-counted phases keep their frames, the
+    # clock-timed fixation loses one, and the mask lasts a refresh longer
+    check_trial(frame_rate, [('blank', 5), ('fixation', 10), ('stimulus', 1), ('mask', 4)], tmp_path)